@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import re
 import matplotlib.pyplot as plt
@@ -5,6 +6,11 @@ import seaborn as sns
 import numpy as np
 from matplotlib.ticker import FuncFormatter
 
+from analytics_cube import AnalyticsCube, batch_id_for_file
+from hp_catalog import catalog_version, get_matcher
+from magazine_scraper import clean_price
+from outlier_detection import PriceOutlierDetector
+
 # Etapa 0: Configuração de Estilo para os Gráficos
 def setup_visual_style():
     sns.set_style("whitegrid")
@@ -26,17 +32,11 @@ def load_and_clean_data(filepath):
         print(f"Erro: Arquivo '{filepath}' não encontrado. Certifique-se de que ele está na mesma pasta que o script.")
         return None
 
-    def parse_brazilian_price(price_str):
-        if pd.isna(price_str): return np.nan
-        try:
-            s = str(price_str).replace('R$', '').strip()
-            s = s.replace('.', '').replace(',', '.')
-            return float(s)
-        except (ValueError, TypeError): return np.nan
+    # Preço como texto ("R$ 1.234,56", ou o texto original quando o scraper não conseguiu ler) vira número;
+    # o que não for preço fica NaN e a linha sai no dropna abaixo
+    if 'preco' in df.columns and not pd.api.types.is_numeric_dtype(df['preco']):
+        df['preco'] = pd.to_numeric(df['preco'].map(lambda p: p if isinstance(p, (int, float)) else clean_price(p)), errors='coerce')
 
-    if 'preco' in df.columns:
-        df['preco'] = df['preco'] 
-    
 
     if 'avaliacao_nota' in df.columns:
         df['avaliacao_nota'] = pd.to_numeric(df['avaliacao_nota'].astype(str).str.replace(',', '.'), errors='coerce')
@@ -56,48 +56,73 @@ def load_and_clean_data(filepath):
     return df
 
 # Etapa 2: Enriquecimento da Base de Dados
+# Suba ENRICHMENT_VERSION ao mudar enrich_data ou os grupos dos limites de preço:
+# a versão entra na chave do lote no cubo e nos limites, junto com o hash do hp_catalog.json.
+ENRICHMENT_VERSION = 4
+
+def analysis_version():
+    return f"{ENRICHMENT_VERSION}-{catalog_version()}"
+
+def extract_yield(text):
+    if not isinstance(text, str): return np.nan
+    match = re.search(r'(\d+)\s*p[aá]ginas', text, re.IGNORECASE)
+    return int(match.group(1)) if match else np.nan
+
 def enrich_data(df):
     """Cria novas colunas analíticas para aprofundar a análise."""
     print("\nIniciando o enriquecimento dos dados...")
 
-    def categorize_product(title):
-        title_lower = title.lower()
-        if 'notebook' in title_lower or 'laptop' in title_lower:
-            return 'Notebook'
-        if 'impressora' in title_lower:
-            return 'Impressora'
-        return 'Suprimento de Impressão'
-    df['categoria_produto'] = df['titulo'].apply(categorize_product)
-
-    df['compatibilidade'] = np.where(df['titulo'].str.contains('compativel', case=False, na=False), 'Compatível', 'Original')
-    df['capacidade'] = np.where(df['titulo'].str.contains('XL', case=False, na=False), 'XL (Alto Rendimento)', 'Padrão')
-    df['modelo_cartucho'] = df['titulo'].str.extract(r'\b(662|664|667|954|122)\b', expand=False).fillna('Outro')
-    
-    def extract_yield(text):
-        if not isinstance(text, str): return np.nan
-        match = re.search(r'(\d+)\s*p[aá]ginas', text, re.IGNORECASE)
-        return int(match.group(1)) if match else np.nan
+    # Modelos, cores, capacidade e categorias vêm do hp_catalog.json: cada título é lido uma única vez
+    matcher = get_matcher()
+    tags = [matcher.tag(titulo, descricao) for titulo, descricao in zip(df['titulo'], df['descricao'])]
+    df['categoria_produto'] = [t['categoria'] for t in tags]
+    df['compatibilidade'] = [t['compatibilidade'] for t in tags]
+    df['capacidade'] = [t['capacidade'] for t in tags]
+    df['modelo_cartucho'] = [t['modelo'] or 'Outro' for t in tags]
+    df['impressora_compativel'] = [t['impressora'] for t in tags]
+
+    # Rendimento informado na descrição; sem ele, o rendimento nominal do catálogo
     df['rendimento_paginas'] = df['descricao'].apply(extract_yield)
+    nominal = pd.Series([matcher.nominal_yield(t) for t in tags], index=df.index, dtype='float64')
+    df['rendimento_fonte'] = np.where(df['rendimento_paginas'].notna(), 'descricao', np.where(nominal.notna(), 'catalogo', None))
+    df['rendimento_paginas'] = df['rendimento_paginas'].fillna(nominal)
     
     df['custo_por_pagina'] = np.where(df['rendimento_paginas'] > 0, df['preco'] / df['rendimento_paginas'], np.nan)
     
     print("Enriquecimento concluído.")
     return df
 
+# Etapa 2.1: Preços Fora da Curva por Grupo
+def flag_price_outliers(df, detector, batch_id=None):
+    """Soma o lote às estatísticas de cada grupo e marca os suprimentos com preço fora da curva."""
+    suprimentos = df['categoria_produto'] == 'Suprimento de Impressão'
+    detector.update(df[suprimentos], batch_id=batch_id)
+    df = detector.flag(df)
+    df.loc[~suprimentos, 'preco_outlier'] = False
+    print(f"Preços fora da curva: {int(df['preco_outlier'].sum())} de {int(suprimentos.sum())} suprimentos.")
+    return df
+
 # Etapa 3: Análise e Geração de Gráficos
-def generate_visualizations(df):
-    """Gera e salva os gráficos para a análise exploratória."""
+def generate_visualizations(df, cube):
+    """Gera e salva os gráficos para a análise exploratória. Agregados e quantis vêm do cubo analítico."""
     print("\nIniciando a geração das visualizações...")
 
     df_suprimentos = df[df['categoria_produto'] == 'Suprimento de Impressão'].copy()
     
-    price_limit = df_suprimentos['preco'].quantile(0.95)
-    df_filtered_price = df_suprimentos[df_suprimentos['preco'] <= price_limit]
+    # Preços fora da curva já foram marcados por grupo (modelo, capacidade, compatibilidade)
+    df_filtered_price = df_suprimentos[~df_suprimentos['preco_outlier'].astype(bool)]
     
-    # Gráfico 1: Análise de Preços
-    plt.figure()
-    sns.boxplot(x='compatibilidade', y='preco', data=df_filtered_price, hue='compatibilidade', palette='viridis', order=['Original', 'Compatível'], legend=False)
-    plt.title('Distribuição de Preços de Suprimentos')
+    # Gráfico 1: Análise de Preços (quartis do cubo; bigodes nos percentis 5 e 95)
+    caixas = cube.query(['compatibilidade'], where={'categoria_produto': 'Suprimento de Impressão'},
+                        quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)).set_index('compatibilidade')
+    ordem = [c for c in ['Original', 'Compatível'] if c in caixas.index]
+    box_stats = [{'label': c, 'whislo': caixas.at[c, 'preco_p05'], 'q1': caixas.at[c, 'preco_p25'], 'med': caixas.at[c, 'preco_p50'],
+                  'q3': caixas.at[c, 'preco_p75'], 'whishi': caixas.at[c, 'preco_p95'], 'fliers': []} for c in ordem]
+    fig, ax = plt.subplots()
+    boxes = ax.bxp(box_stats, showfliers=False, patch_artist=True)
+    for patch, color in zip(boxes['boxes'], sns.color_palette('viridis', len(box_stats))):
+        patch.set_facecolor(color)
+    plt.title('Distribuição de Preços de Suprimentos\n(histórico acumulado no cubo)')
     plt.xlabel('Tipo de Cartucho')
     plt.ylabel('Preço')
     plt.tight_layout()
@@ -108,7 +133,7 @@ def generate_visualizations(df):
     # Gráfico 2: Relação entre Preço e Avaliação
     plt.figure()
     sns.scatterplot(x='preco', y='avaliacao_nota', hue='compatibilidade', data=df_filtered_price.dropna(subset=['avaliacao_nota']), palette='magma', s=100, alpha=0.8)
-    plt.title('Relação entre Preço e Nota de Avaliação')
+    plt.title('Relação entre Preço e Nota de Avaliação\n(coleta atual)')
     plt.xlabel('Preço')
     plt.ylabel('Nota Média de Avaliação')
     plt.legend(title='Compatibilidade')
@@ -118,10 +143,9 @@ def generate_visualizations(df):
     plt.close()
 
     # Gráfico 3: Popularidade vs. Qualidade
-    modelo_analysis = df.groupby('modelo_cartucho').agg(
-        popularidade_total=('avaliacao_numero', 'max'),
-        qualidade_media=('avaliacao_nota', 'mean')
-    ).sort_values(by='popularidade_total', ascending=False).dropna()
+    modelo_analysis = cube.query(['modelo_cartucho']).set_index('modelo_cartucho').rename(
+        columns={'avaliacoes_max': 'popularidade_total', 'nota_media': 'qualidade_media'}
+    )[['popularidade_total', 'qualidade_media']].sort_values(by='popularidade_total', ascending=False).dropna()
     modelo_analysis = modelo_analysis[modelo_analysis.index != 'Outro']
 
     modelo_analysis['Popularidade Normalizada'] = (modelo_analysis['popularidade_total'] - modelo_analysis['popularidade_total'].min()) / (modelo_analysis['popularidade_total'].max() - modelo_analysis['popularidade_total'].min())
@@ -129,7 +153,7 @@ def generate_visualizations(df):
 
     plt.figure()
     ax = modelo_analysis[['Popularidade Normalizada', 'Qualidade Normalizada']].plot(kind='bar', width=0.8, colormap='coolwarm', alpha=0.8)
-    ax.set_title('Popularidade vs. Qualidade por Modelo')
+    ax.set_title('Popularidade vs. Qualidade por Modelo\n(histórico acumulado no cubo)')
     ax.set_xlabel('Modelo do Cartucho')
     ax.set_ylabel('Valor Normalizado (0 a 1)')
     ax.set_xticklabels(ax.get_xticklabels(), rotation=0)
@@ -143,7 +167,7 @@ def generate_visualizations(df):
     custo_beneficio_df = df_suprimentos.dropna(subset=['custo_por_pagina']).sort_values(by='custo_por_pagina').head(15)
     plt.figure()
     barplot = sns.barplot(x='custo_por_pagina', y='titulo', data=custo_beneficio_df, hue='capacidade', dodge=False, palette='coolwarm')
-    plt.title('Top 15 Produtos com Melhor Custo-Benefício')
+    plt.title('Top 15 Produtos com Melhor Custo-Benefício\n(coleta atual)')
     plt.xlabel('Custo por Página')
     plt.ylabel('Produto')
     plt.legend(title='Capacidade')
@@ -155,13 +179,24 @@ def generate_visualizations(df):
 
 # Etapa 7: Execução Principal
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Análise exploratória do CSV unificado da coleta.")
+    parser.add_argument('--csv', default='scraping_unificado.csv')
+    parser.add_argument('--reconstruir', action='store_true',
+                        help="Apaga o cubo e os limites de preço e recarrega só este CSV "
+                             "(use depois de mudar o enriquecimento ou o hp_catalog.json)")
+    args = parser.parse_args()
     setup_visual_style()
     
-    csv_filepath = 'scraping_unificado.csv'
+    csv_filepath = args.csv
     df_cleaned = load_and_clean_data(csv_filepath)
     
     if df_cleaned is not None:
         df_enriched = enrich_data(df_cleaned.copy())
+        batch_id = batch_id_for_file(csv_filepath, analysis_version())
+        detector = PriceOutlierDetector()
+        if args.reconstruir: detector.reset()
+        df_enriched = flag_price_outliers(df_enriched, detector, batch_id)
+        detector.close()
         
         print("\n--- Amostra da Tabela Enriquecida ---")
         colunas_para_exibir = [
@@ -181,6 +216,11 @@ if __name__ == '__main__':
         except Exception as e:
             print(f"\nErro ao salvar o CSV enriquecido: {e}")
         
-        generate_visualizations(df_enriched)
+        # Só o lote novo é somado ao cubo; o mesmo CSV não é contado duas vezes
+        cube = AnalyticsCube()
+        if args.reconstruir: cube.reset()
+        cube.add_batch(df_enriched, batch_id=batch_id)
+        generate_visualizations(df_enriched, cube)
+        cube.close()
         
         print("\nAnálise concluída com sucesso!")
\ No newline at end of file
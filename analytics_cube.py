@@ -0,0 +1,205 @@
+import hashlib
+import sqlite3
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from quantile_sketch import QuantileSketch
+
+# ========== Cubo analítico ==========
+# Agregados por plataforma x categoria x modelo x compatibilidade x capacidade
+# x vendedor x dia, guardados em SQLite. Cada lote novo de dados só atualiza
+# as células que ele toca (somas, mínimos/máximos e sketches de quantis se
+# juntam sem reler o histórico), e os gráficos leem do cubo em vez de
+# refazer groupbys sobre as linhas brutas.
+
+DEFAULT_DB = 'cubo_analitico.sqlite'
+DIMENSIONS = ['plataforma', 'categoria_produto', 'modelo_cartucho', 'compatibilidade', 'capacidade', 'vendedor', 'dia']
+MISSING_DIMENSION = 'Não informado'
+
+
+def batch_id_for_file(path, version=None):
+    """
+    Identifica um lote pelo conteúdo do arquivo: reprocessar o mesmo CSV não conta em dobro.
+    version (enriquecimento + catálogo) entra na chave como sufixo 'sha1:versao'.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest() + (f':{version}' if version else '')
+
+
+def stale_batches(conn, batch_id):
+    """Lotes do mesmo arquivo carregados com outra versão de enriquecimento/catálogo."""
+    source = batch_id.split(':')[0]
+    return [row[0] for row in conn.execute(
+        "SELECT batch_id FROM batches WHERE batch_id LIKE ? AND batch_id != ?", (source + '%', batch_id))]
+
+
+def _sketch_of(values):
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(float(value))
+    return sketch
+
+
+class AnalyticsCube:
+    def __init__(self, db_path=DEFAULT_DB):
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        dims = ', '.join(f'{d} TEXT NOT NULL' for d in DIMENSIONS)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS cube (
+                {dims},
+                n INTEGER NOT NULL,
+                preco_sum REAL NOT NULL, preco_min REAL, preco_max REAL,
+                nota_sum REAL NOT NULL, nota_n INTEGER NOT NULL,
+                avaliacoes_total INTEGER NOT NULL, avaliacoes_max INTEGER NOT NULL,
+                preco_sketch TEXT, custo_sketch TEXT,
+                PRIMARY KEY ({', '.join(DIMENSIONS)})
+            );
+            CREATE INDEX IF NOT EXISTS idx_cube_dia ON cube (dia);
+            CREATE TABLE IF NOT EXISTS batches (batch_id TEXT PRIMARY KEY, rows INTEGER, loaded_at REAL);
+        """)
+
+    def has_batch(self, batch_id):
+        return self.conn.execute("SELECT 1 FROM batches WHERE batch_id = ?", (batch_id,)).fetchone() is not None
+
+    def add_batch(self, df, batch_id=None):
+        """
+        Soma um lote de linhas enriquecidas (saída de analise.enrich_data) ao cubo.
+        Retorna quantas células foram atualizadas; 0 se o lote já tinha sido carregado.
+        """
+        if batch_id and self.has_batch(batch_id):
+            print(f"Lote {batch_id[:10]} já está no cubo, nada a atualizar.")
+            return 0
+        if batch_id and stale_batches(self.conn, batch_id):
+            # Somar de novo contaria o CSV em dobro; os agregados antigos só saem reconstruindo o cubo
+            print(f"Lote {batch_id[:10]} está no cubo com outra versão de enriquecimento/catálogo. "
+                  f"Rode com --reconstruir para refazer os agregados.")
+            return 0
+        frame = df.copy()
+        if 'dia' not in frame.columns:
+            today = datetime.now().strftime('%Y-%m-%d')
+            frame['dia'] = frame['data_coleta'].fillna(today) if 'data_coleta' in frame.columns else today
+        for dim in DIMENSIONS:
+            if dim not in frame.columns: frame[dim] = None
+            frame[dim] = frame[dim].fillna(MISSING_DIMENSION).astype(str)
+
+        cells = 0
+        with self.conn:
+            for key, group in frame.groupby(DIMENSIONS, sort=False):
+                precos = group['preco'].dropna()
+                notas = group['avaliacao_nota'].dropna() if 'avaliacao_nota' in group else pd.Series(dtype=float)
+                avaliacoes = group['avaliacao_numero'].fillna(0) if 'avaliacao_numero' in group else pd.Series(dtype=int)
+                custos = group['custo_por_pagina'].dropna() if 'custo_por_pagina' in group else pd.Series(dtype=float)
+                self._merge_cell(key, {
+                    'n': len(group),
+                    'preco_sum': float(precos.sum()),
+                    'preco_min': float(precos.min()) if len(precos) else None,
+                    'preco_max': float(precos.max()) if len(precos) else None,
+                    'nota_sum': float(notas.sum()), 'nota_n': len(notas),
+                    'avaliacoes_total': int(avaliacoes.sum()),
+                    'avaliacoes_max': int(avaliacoes.max()) if len(avaliacoes) else 0,
+                    'preco_sketch': _sketch_of(precos),
+                    'custo_sketch': _sketch_of(custos),
+                })
+                cells += 1
+            if batch_id:
+                self.conn.execute("INSERT INTO batches (batch_id, rows, loaded_at) VALUES (?, ?, ?)",
+                                  (batch_id, len(frame), time.time()))
+        return cells
+
+    def _merge_cell(self, key, new):
+        where = ' AND '.join(f'{d} = ?' for d in DIMENSIONS)
+        row = self.conn.execute(
+            f"SELECT n, preco_sum, preco_min, preco_max, nota_sum, nota_n, avaliacoes_total, avaliacoes_max, "
+            f"preco_sketch, custo_sketch FROM cube WHERE {where}", key).fetchone()
+        if row:
+            n, preco_sum, preco_min, preco_max, nota_sum, nota_n, av_total, av_max, preco_sk, custo_sk = row
+            new['n'] += n
+            new['preco_sum'] += preco_sum
+            if preco_min is not None:
+                new['preco_min'] = preco_min if new['preco_min'] is None else min(preco_min, new['preco_min'])
+                new['preco_max'] = preco_max if new['preco_max'] is None else max(preco_max, new['preco_max'])
+            new['nota_sum'] += nota_sum
+            new['nota_n'] += nota_n
+            new['avaliacoes_total'] += av_total
+            new['avaliacoes_max'] = max(new['avaliacoes_max'], av_max)
+            if preco_sk: new['preco_sketch'].merge(QuantileSketch.from_json(preco_sk))
+            if custo_sk: new['custo_sketch'].merge(QuantileSketch.from_json(custo_sk))
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO cube ({', '.join(DIMENSIONS)}, n, preco_sum, preco_min, preco_max, nota_sum, nota_n, "
+            f"avaliacoes_total, avaliacoes_max, preco_sketch, custo_sketch) VALUES ({', '.join('?' * (len(DIMENSIONS) + 10))})",
+            (*key, new['n'], new['preco_sum'], new['preco_min'], new['preco_max'], new['nota_sum'], new['nota_n'],
+             new['avaliacoes_total'], new['avaliacoes_max'], new['preco_sketch'].to_json(), new['custo_sketch'].to_json()))
+
+    def query(self, group_by=(), where=None, since=None, until=None, quantiles=(0.5,)):
+        """
+        Consolida o cubo nas dimensões de group_by. where filtra por dimensão
+        (valor único ou lista) e since/until por dia ('AAAA-MM-DD').
+        Retorna um DataFrame com contagem, preço mín/máx/médio, nota média,
+        total e máximo de avaliações e os quantis pedidos de preço e custo por página.
+        """
+        group_by = list(group_by)
+        unknown = [d for d in group_by + list(where or {}) if d not in DIMENSIONS]
+        if unknown: raise ValueError(f"Dimensões desconhecidas no cubo: {unknown}")
+        clauses, params = [], []
+        for dim, value in (where or {}).items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            clauses.append(f"{dim} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        if since: clauses.append("dia >= ?"); params.append(since)
+        if until: clauses.append("dia <= ?"); params.append(until)
+        sql = (f"SELECT {''.join(d + ', ' for d in group_by)}n, preco_sum, preco_min, preco_max, nota_sum, nota_n, "
+               f"avaliacoes_total, avaliacoes_max, preco_sketch, custo_sketch FROM cube")
+        if clauses: sql += " WHERE " + ' AND '.join(clauses)
+
+        groups = {}
+        for row in self.conn.execute(sql, params):
+            key, (n, preco_sum, preco_min, preco_max, nota_sum, nota_n, av_total, av_max, preco_sk, custo_sk) = \
+                row[:len(group_by)], row[len(group_by):]
+            acc = groups.get(key)
+            if acc is None:
+                acc = groups[key] = {'n': 0, 'preco_sum': 0.0, 'preco_min': None, 'preco_max': None, 'nota_sum': 0.0,
+                                     'nota_n': 0, 'avaliacoes_total': 0, 'avaliacoes_max': 0,
+                                     'preco': QuantileSketch(), 'custo': QuantileSketch()}
+            acc['n'] += n
+            acc['preco_sum'] += preco_sum
+            if preco_min is not None:
+                acc['preco_min'] = preco_min if acc['preco_min'] is None else min(acc['preco_min'], preco_min)
+                acc['preco_max'] = preco_max if acc['preco_max'] is None else max(acc['preco_max'], preco_max)
+            acc['nota_sum'] += nota_sum
+            acc['nota_n'] += nota_n
+            acc['avaliacoes_total'] += av_total
+            acc['avaliacoes_max'] = max(acc['avaliacoes_max'], av_max)
+            if preco_sk: acc['preco'].merge(QuantileSketch.from_json(preco_sk))
+            if custo_sk: acc['custo'].merge(QuantileSketch.from_json(custo_sk))
+
+        rows = []
+        for key, acc in groups.items():
+            row = dict(zip(group_by, key))
+            row.update({
+                'n': acc['n'],
+                'preco_min': acc['preco_min'], 'preco_max': acc['preco_max'],
+                'preco_medio': acc['preco_sum'] / acc['preco'].count if acc['preco'].count else None,
+                'nota_media': acc['nota_sum'] / acc['nota_n'] if acc['nota_n'] else None,
+                'avaliacoes_total': acc['avaliacoes_total'], 'avaliacoes_max': acc['avaliacoes_max'],
+            })
+            for q in quantiles:
+                row[f'preco_p{round(q * 100):02d}'] = acc['preco'].quantile(q)
+                row[f'custo_p{round(q * 100):02d}'] = acc['custo'].quantile(q)
+            rows.append(row)
+        columns = group_by + ['n', 'preco_min', 'preco_max', 'preco_medio', 'nota_media', 'avaliacoes_total', 'avaliacoes_max'] + \
+            [f'{m}_p{round(q * 100):02d}' for q in quantiles for m in ('preco', 'custo')]
+        return pd.DataFrame(rows, columns=columns)
+
+    def reset(self):
+        """Apaga todas as células e lotes (para recarregar depois de mudar o enriquecimento ou o catálogo)."""
+        with self.conn:
+            self.conn.execute("DELETE FROM cube")
+            self.conn.execute("DELETE FROM batches")
+
+    def close(self):
+        self.conn.close()
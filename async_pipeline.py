@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from circuit_breaker import CircuitBreakerBoard
+from page_guard import UnusablePageError
+from price_alerts import create_alert_engine
+from product_ids import canonical_product_id
+from proxy_pool import NoHealthyExitError, configure_proxy_pool, get_proxy_pool, report_page
+from rate_limit import RateLimiter
+from run_stats import RunStats
+from scraping import PLATFORMS, CSV_COLUMNS, pause_without_exit, queries, start_driver, stop_driver
+
+# ========= Coleta assíncrona em estágios =========
+# busca -> página do produto -> pós-processamento -> gravação, ligados por
+# filas com tamanho máximo. A busca do próximo termo roda enquanto os produtos
+# do termo atual ainda estão carregando, e a gravação do CSV acontece em
+# paralelo com a navegação. As chamadas do Selenium (que bloqueiam) rodam num
+# pool de threads, uma por navegador; a leitura do DOM fica junto com o
+# carregamento porque precisa do mesmo driver. Quando um estágio atrasa, a
+# fila dele enche e o anterior espera (backpressure), então a memória não
+# cresce com o tamanho da coleta: os registros vão direto para o CSV.
+# Com --proxies, cada navegador fica preso a uma saída e o intervalo mínimo
+# vale por saída, então mais saídas (e navegadores) aumentam a vazão.
+
+DRIVERS_PER_PLATFORM = {'magalu': 2, 'mercado_livre': 2}
+LINK_QUEUE_SIZE = 20
+RECORD_QUEUE_SIZE = 50
+PAGES_PER_DRIVER = 40
+
+
+class DriverPool:
+    """
+    Navegadores de uma plataforma, iniciados sob demanda; cada um atende uma tarefa por vez.
+    O semáforo conta navegadores em uso: quem aposenta um navegador (quebrado ou
+    no limite de páginas) devolve a vaga, e a próxima tarefa inicia outro.
+    """
+
+    def __init__(self, plataforma, size, executor, use_profiles=False):
+        self.plataforma = plataforma
+        self.size = size
+        self.executor = executor
+        self.use_profiles = use_profiles
+        self.idle = []
+        self.slots = asyncio.Semaphore(size)
+
+    async def acquire(self):
+        await self.slots.acquire()
+        if self.idle:
+            return self.idle.pop()
+        try:
+            driver = await asyncio.get_running_loop().run_in_executor(
+                self.executor, lambda: start_driver(PLATFORMS[self.plataforma][0], plataforma=self.plataforma, use_profile=self.use_profiles))
+        except BaseException:
+            self.slots.release()
+            raise
+        driver.paginas = 0
+        return driver
+
+    async def release(self, driver, broken=False):
+        driver.paginas += 1
+        try:
+            if broken or driver.paginas >= PAGES_PER_DRIVER:
+                await asyncio.get_running_loop().run_in_executor(self.executor, stop_driver, driver)
+            else:
+                self.idle.append(driver)
+        finally:
+            self.slots.release()
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        while self.idle:
+            await loop.run_in_executor(self.executor, stop_driver, self.idle.pop())
+
+
+class IncrementalCsvWriter:
+    """Grava os registros à medida que chegam, no mesmo formato de scraping.save_to_csv."""
+
+    def __init__(self, filename):
+        self.file = open(filename, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file, delimiter=';')
+        self.writer.writerow(CSV_COLUMNS)
+        self.rows = 0
+
+    def write(self, record):
+        self.writer.writerow(['' if record.get(c) is None else record.get(c) for c in CSV_COLUMNS])
+        self.rows += 1
+        if self.rows % 20 == 0: self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def finalize_record(item, plataforma):
+    """Pós-processamento fora do navegador: plataforma, data da coleta e limpeza dos textos."""
+    item['plataforma'] = plataforma
+    item.setdefault('data_coleta', datetime.now().strftime('%Y-%m-%d'))
+    for key, value in item.items():
+        if isinstance(value, str): item[key] = ' '.join(value.split())
+    return item
+
+
+class AsyncCrawl:
+    def __init__(self, platforms, terms, per_term, include_description=True, use_profiles=False,
+                 drivers_per_platform=None, on_record=None):
+        self.platforms = platforms
+        self.terms = terms
+        self.per_term = per_term
+        self.include_description = include_description
+        self.use_profiles = use_profiles
+        self.drivers = {p: (drivers_per_platform or DRIVERS_PER_PLATFORM).get(p, 1) for p in platforms}
+        self.on_record = on_record
+        self.limiter, self.board, self.stats = RateLimiter(), CircuitBreakerBoard(), RunStats()
+        self.seen = set()
+
+    async def _pace(self, plataforma, driver):
+        proxy_exit = getattr(driver, 'saida', None)
+        wait = get_proxy_pool().reserve(proxy_exit) if proxy_exit else self.limiter.reserve(plataforma)
+        if wait > 0: await asyncio.sleep(wait)
+
+    def _blocked(self, plataforma, driver, page_class):
+        """Bloqueio com proxy conta para a saída (e o navegador é trocado); sem proxy, para a plataforma."""
+        if report_page(driver, page_class): return True
+        self.board.record_failure(plataforma, page_class)
+        return False
+
+    async def _search(self, plataforma, pool, links):
+        loop = asyncio.get_running_loop()
+        search_func = PLATFORMS[plataforma][1]
+        try:
+            for termo in self.terms:
+                if not self.board.allow(plataforma):
+                    self.stats.record_skip(plataforma, 1 + self.per_term)
+                    continue
+                try:
+                    driver = await pool.acquire()
+                except NoHealthyExitError as e:
+                    pause_without_exit(plataforma, self.board, e)
+                    self.stats.record_skip(plataforma, 1 + self.per_term)
+                    continue
+                except Exception as e:
+                    print(f"[{plataforma}] Não foi possível iniciar o navegador: {e}")
+                    continue
+                await self._pace(plataforma, driver)
+                start, broken, found = time.time(), False, []
+                try:
+                    found = await loop.run_in_executor(pool.executor, search_func, termo, driver, self.per_term)
+                    self.stats.record_page(plataforma, time.time() - start)
+                    report_page(driver)
+                    self.board.record_success(plataforma)
+                except UnusablePageError as e:
+                    self.stats.record_page(plataforma, time.time() - start, e.page_class)
+                    if e.is_block: broken = self._blocked(plataforma, driver, e.page_class)
+                except Exception as e:
+                    print(f"[{plataforma}] Erro na busca '{termo}': {type(e).__name__} - {e}")
+                    broken = True
+                finally:
+                    await pool.release(driver, broken)
+                new = 0
+                for link in found or []:
+                    product_id = canonical_product_id(link, plataforma)
+                    if product_id in self.seen: continue
+                    self.seen.add(product_id)
+                    await links.put(link)  # espera se os produtos estiverem atrasados
+                    new += 1
+                print(f"[{plataforma}] '{termo}': {new} produtos novos na fila")
+        finally:
+            for _ in range(self.drivers[plataforma]):
+                await links.put(None)
+
+    async def _fetch_products(self, plataforma, pool, links, records):
+        loop = asyncio.get_running_loop()
+        scrape_func = PLATFORMS[plataforma][2]
+        while True:
+            link = await links.get()
+            if link is None: return
+            if not self.board.allow(plataforma):
+                self.stats.record_skip(plataforma)
+                continue
+            try:
+                driver = await pool.acquire()
+            except NoHealthyExitError as e:
+                pause_without_exit(plataforma, self.board, e)
+                self.stats.record_skip(plataforma)
+                continue
+            except Exception as e:
+                print(f"[{plataforma}] Não foi possível iniciar o navegador: {e}")
+                continue
+            await self._pace(plataforma, driver)
+            start, broken = time.time(), False
+            try:
+                item = await loop.run_in_executor(pool.executor, scrape_func, link, driver, self.include_description)
+                self.stats.record_page(plataforma, time.time() - start)
+                report_page(driver)
+                self.board.record_success(plataforma)
+                await records.put((plataforma, item))  # espera se a gravação estiver atrasada
+            except UnusablePageError as e:
+                self.stats.record_page(plataforma, time.time() - start, e.page_class)
+                if e.is_block: broken = self._blocked(plataforma, driver, e.page_class)
+            except Exception as e:
+                print(f"[{plataforma}] Erro ao raspar {link}: {type(e).__name__} - {e}")
+                broken = True
+            finally:
+                await pool.release(driver, broken)
+
+    async def _sink(self, records, writer, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = await records.get()
+            if entry is None: return
+            record = await loop.run_in_executor(executor, finalize_record, entry[1], entry[0])
+            await loop.run_in_executor(executor, writer.write, record)
+            if not self.on_record: continue
+            # Alertas gravam em SQLite e podem chamar webhook: rodam fora do loop, e uma
+            # falha neles não pode parar a gravação (os produtores ficariam presos na fila)
+            try:
+                await loop.run_in_executor(executor, self.on_record, record)
+            except Exception as e:
+                print(f"Erro ao processar alertas do registro: {type(e).__name__} - {e}")
+
+    async def run(self, output):
+        selenium_executor = ThreadPoolExecutor(max_workers=sum(self.drivers.values()), thread_name_prefix='selenium')
+        sink_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gravacao')
+        writer = IncrementalCsvWriter(output)
+        records = asyncio.Queue(maxsize=RECORD_QUEUE_SIZE)
+        pools = {p: DriverPool(p, self.drivers[p], selenium_executor, self.use_profiles) for p in self.platforms}
+        stages = []
+        for plataforma in self.platforms:
+            links = asyncio.Queue(maxsize=LINK_QUEUE_SIZE)
+            stages.append(self._search(plataforma, pools[plataforma], links))
+            stages += [self._fetch_products(plataforma, pools[plataforma], links, records)
+                       for _ in range(self.drivers[plataforma])]
+
+        async def produce():
+            await asyncio.gather(*stages)
+            await records.put(None)
+
+        try:
+            await asyncio.gather(produce(), self._sink(records, writer, sink_executor))
+        finally:
+            for pool in pools.values():
+                await pool.close()
+            selenium_executor.shutdown(wait=True)
+            sink_executor.shutdown(wait=True)
+            writer.close()
+        return writer.rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Coleta assíncrona: busca, produtos e gravação em paralelo com filas limitadas.")
+    parser.add_argument('--por-termo', type=int, default=2, help="Produtos por termo de busca")
+    parser.add_argument('--plataformas', nargs='+', default=list(PLATFORMS), choices=list(PLATFORMS))
+    parser.add_argument('--navegadores', type=int, default=None, help="Navegadores por plataforma (padrão: DRIVERS_PER_PLATFORM)")
+    parser.add_argument('--sem-descricao', action='store_true', help="Não coleta a descrição (ver description_stage.py)")
+    parser.add_argument('--perfis', action='store_true')
+    parser.add_argument('--alertas', nargs='?', const='regras_alertas.json', default=None, metavar='REGRAS')
+    parser.add_argument('--proxies', nargs='?', const='proxies.json', default=None, metavar='CONFIG',
+                        help="Um navegador por saída de proxy (proxy_pool.py), salvo --navegadores")
+    parser.add_argument('--saida', default='scraping_unificado.csv')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    alerts = create_alert_engine(args.alertas) if args.alertas else None
+    proxies = configure_proxy_pool(args.proxies)
+    drivers = {p: args.navegadores for p in args.plataformas} if args.navegadores else None
+    if proxies and not args.navegadores:
+        drivers = {p: proxies.size(p) or DRIVERS_PER_PLATFORM.get(p, 1) for p in args.plataformas}
+    crawl = AsyncCrawl(args.plataformas, queries, args.por_termo, include_description=not args.sem_descricao,
+                       use_profiles=args.perfis, drivers_per_platform=drivers, on_record=alerts.process if alerts else None)
+    rows = asyncio.run(crawl.run(args.saida))
+    if alerts: alerts.close()
+    print(crawl.stats.summary())
+    if proxies: print(proxies.report())
+    print(f"{rows} registros salvos em {args.saida}")
+    print(f"Processo finalizado em {(time.time() - start_time)/60:.2f} minutos")
@@ -0,0 +1,189 @@
+import argparse
+import contextlib
+import io
+import math
+import os
+import sqlite3
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')
+
+from analise import enrich_data, flag_price_outliers, generate_visualizations, load_and_clean_data, setup_visual_style
+from analytics_cube import AnalyticsCube
+from outlier_detection import PriceOutlierDetector
+from synthetic_data import write_synthetic_csv
+
+# ========== Benchmark de escala do analise.py ==========
+# Gera CSVs sintéticos (synthetic_data.py) de vários tamanhos e mede tempo e
+# pico de memória de cada etapa do analise.py. Os resultados ficam em
+# benchmark_resultados.sqlite com o commit atual, para comparar versões.
+# O expoente de escala entre dois tamanhos, log(t2/t1) / log(n2/n1), fica
+# perto de 1 numa etapa linear; acima de SUPERLINEAR_EXPONENT a etapa é
+# marcada, porque vai piorar mais rápido que o volume de dados.
+
+DEFAULT_DB = 'benchmark_resultados.sqlite'
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+SUPERLINEAR_EXPONENT = 1.2
+STAGES = ['geracao_csv', 'load_and_clean_data', 'enrich_data', 'flag_price_outliers', 'cubo_add_batch', 'generate_visualizations']
+
+
+def current_version():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecida'
+
+
+def run_stages(rows, workdir, seed=0, price_format='numerico'):
+    """Etapas do analise.py como [(nome, função)], na ordem, compartilhando o DataFrame e gravando em workdir."""
+    csv_path = os.path.join(workdir, 'scraping_sintetico.csv')
+    state = {}
+
+    def stage_generate():
+        write_synthetic_csv(csv_path, rows, seed=seed, price_format=price_format)
+
+    def stage_load():
+        state['df'] = load_and_clean_data(csv_path)
+
+    def stage_enrich():
+        state['df'] = enrich_data(state['df'])
+
+    def stage_outliers():
+        detector = PriceOutlierDetector(os.path.join(workdir, 'outliers.sqlite'))
+        state['df'] = flag_price_outliers(state['df'], detector)
+        detector.close()
+
+    def stage_cube():
+        state['cube'] = AnalyticsCube(os.path.join(workdir, 'cubo.sqlite'))
+        state['cube'].add_batch(state['df'], batch_id=f'benchmark-{rows}')
+
+    def stage_charts():
+        generate_visualizations(state['df'], state['cube'])
+        state['cube'].close()
+
+    return list(zip(STAGES, [stage_generate, stage_load, stage_enrich, stage_outliers, stage_cube, stage_charts]))
+
+
+def measure(rows, seed=0, memory=True, price_format='numerico'):
+    """Tempo (s) e pico de memória (MB) de cada etapa para um CSV sintético de `rows` linhas."""
+    results = {stage: {'segundos': None, 'pico_mb': None} for stage in STAGES}
+    passes = [False, True] if memory else [False]
+    previous_dir = os.getcwd()
+    for traced in passes:
+        # Os gráficos são salvos no diretório atual; o benchmark roda numa pasta temporária
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            try:
+                for stage, func in run_stages(rows, workdir, seed, price_format):
+                    # O tracemalloc deixa tudo mais lento, então o tempo vem da passada sem ele
+                    if traced: tracemalloc.start()
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        func()
+                    elapsed = time.perf_counter() - start
+                    if traced:
+                        results[stage]['pico_mb'] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+                        tracemalloc.stop()
+                    else:
+                        results[stage]['segundos'] = elapsed
+            finally:
+                os.chdir(previous_dir)
+    return results
+
+
+class BenchmarkStore:
+    def __init__(self, db_path=DEFAULT_DB):
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                run_id TEXT, versao TEXT, etapa TEXT, linhas INTEGER,
+                segundos REAL, pico_mb REAL, criado_em TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_versao ON results (versao, etapa, linhas);
+        """)
+
+    def save(self, run_id, versao, rows, results):
+        criado_em = datetime.now().isoformat(timespec='seconds')
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO results (run_id, versao, etapa, linhas, segundos, pico_mb, criado_em) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, versao, stage, rows, r['segundos'], r['pico_mb'], criado_em) for stage, r in results.items()])
+
+    def latest(self, versao):
+        """{(etapa, linhas): (segundos, pico_mb)} da rodada mais recente da versão."""
+        row = self.conn.execute("SELECT run_id FROM results WHERE versao = ? ORDER BY criado_em DESC LIMIT 1", (versao,)).fetchone()
+        if row is None: return {}
+        return {(etapa, linhas): (segundos, pico_mb) for etapa, linhas, segundos, pico_mb in self.conn.execute(
+            "SELECT etapa, linhas, segundos, pico_mb FROM results WHERE run_id = ?", (row[0],))}
+
+    def close(self):
+        self.conn.close()
+
+
+def scaling_exponent(n1, t1, n2, t2):
+    if not t1 or not t2 or t1 <= 0 or t2 <= 0 or n1 == n2: return None
+    return math.log(t2 / t1) / math.log(n2 / n1)
+
+
+def report(all_results, baseline=None, baseline_version=None):
+    sizes = sorted(all_results)
+    print(f"\n{'Etapa':<26}{'Linhas':>10}{'Tempo (s)':>12}{'Pico (MB)':>12}{'Expoente':>10}"
+          + (f"{'vs ' + baseline_version:>16}" if baseline else ''))
+    flagged = []
+    for stage in STAGES:
+        for i, rows in enumerate(sizes):
+            r = all_results[rows][stage]
+            exponent = scaling_exponent(sizes[i - 1], all_results[sizes[i - 1]][stage]['segundos'], rows, r['segundos']) if i else None
+            mark = ''
+            if exponent is not None and exponent > SUPERLINEAR_EXPONENT:
+                mark = ' *'
+                flagged.append((stage, sizes[i - 1], rows, exponent))
+            line = (f"{stage:<26}{rows:>10}{r['segundos']:>12.3f}"
+                    f"{'' if r['pico_mb'] is None else format(r['pico_mb'], '.1f'):>12}"
+                    f"{'' if exponent is None else format(exponent, '.2f') + mark:>10}")
+            if baseline:
+                before = baseline.get((stage, rows), (None, None))[0]
+                line += f"{format(100 * (r['segundos'] / before - 1), '+.0f') + '%' if before else '-':>16}"
+            print(line)
+    if flagged:
+        print(f"\nEtapas com crescimento acima de n^{SUPERLINEAR_EXPONENT}:")
+        for stage, n1, n2, exponent in flagged:
+            print(f"  {stage}: {n1} -> {n2} linhas, expoente {exponent:.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mede tempo e memória de cada etapa do analise.py com dados sintéticos.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=DEFAULT_SIZES, help="Número de linhas de cada rodada")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--sem-memoria', action='store_true', help="Pula a passada com tracemalloc (mais rápido)")
+    parser.add_argument('--preco-br', action='store_true',
+                        help="Gera o preço como texto 'R$ 1.234,56' (a versão recebe o sufixo +preco-br)")
+    parser.add_argument('--versao', default=None, help="Rótulo da versão (padrão: commit atual)")
+    parser.add_argument('--comparar', metavar='VERSAO', help="Compara com a rodada mais recente de outra versão")
+    parser.add_argument('--db', default=DEFAULT_DB)
+    args = parser.parse_args()
+
+    versao = (args.versao or current_version()) + ('+preco-br' if args.preco_br else '')
+    price_format = 'br' if args.preco_br else 'numerico'
+    run_id = f"{versao}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    store = BenchmarkStore(args.db)
+    baseline = store.latest(args.comparar) if args.comparar else None
+    if args.comparar and not baseline:
+        print(f"Nenhum resultado salvo para a versão {args.comparar}.")
+
+    setup_visual_style()
+    all_results = {}
+    for rows in sorted(args.tamanhos):
+        print(f"Medindo {rows} linhas...")
+        all_results[rows] = measure(rows, args.semente, memory=not args.sem_memoria, price_format=price_format)
+        store.save(run_id, versao, rows, all_results[rows])
+    store.close()
+
+    report(all_results, baseline, args.comparar)
+    print(f"\nResultados salvos em {args.db} (versão {versao})")
@@ -0,0 +1,228 @@
+import json
+import os
+import shutil
+import time
+
+# ========== Perfis de navegador persistentes ==========
+# Cada plataforma tem alguns "slots" de perfil do Chrome (--user-data-dir) que
+# guardam cookies, consentimento de cookies e cache HTTP entre sessões. Assim
+# o banner de cookies só precisa ser tratado na primeira vez e as páginas não
+# começam com cache frio. Os perfis são rotacionados (vários slots, o menos
+# usado recentemente primeiro) e expiram depois de alguns dias.
+
+PROFILES_DIR = 'perfis_navegador'
+DEFAULT_SLOTS = 4
+DEFAULT_MAX_AGE_DAYS = 7
+STALE_LOCK_SECONDS = 6 * 3600
+HOME_URLS = {
+    'magalu': 'https://www.magazineluiza.com.br/',
+    'mercado_livre': 'https://www.mercadolivre.com.br/',
+}
+
+# Tempo gasto tratando banners de cookies (perfil sem consentimento) e
+# quantas vezes esse passo foi pulado porque o consentimento já estava salvo.
+# Os contadores ficam no próprio driver (cada um é usado por uma thread só) e,
+# ao liberar o slot, são somados ao perfil_meta.json do perfil, que só um
+# processo usa por vez (lock do slot). Assim o relatório vale também para os
+# workers do sharded_crawl.py.
+BANNER_KEYS = ('banner_segundos', 'banner_medicoes', 'banners_pulados')
+
+
+def consent_stored(driver):
+    return getattr(driver, 'consentimento_salvo', False)
+
+
+def mark_consent(driver):
+    """Chamado pelos scrapers depois de fechar o banner: o perfil passa a ter o consentimento salvo."""
+    try: driver.consentimento_salvo = True
+    except Exception: pass
+
+
+def record_banner_time(driver, seconds):
+    try:
+        driver.banner_segundos = getattr(driver, 'banner_segundos', 0.0) + seconds
+        driver.banner_medicoes = getattr(driver, 'banner_medicoes', 0) + 1
+    except Exception: pass
+
+
+def record_banner_skip(driver):
+    try: driver.banners_pulados = getattr(driver, 'banners_pulados', 0) + 1
+    except Exception: pass
+
+
+def banner_report(platforms, base_dir=PROFILES_DIR):
+    """Resumo (somado sobre os perfis atuais) do tempo por página economizado ao pular o banner."""
+    lines = []
+    for plataforma in sorted(platforms):
+        totals = ProfileManager(plataforma, base_dir).banner_totals()
+        if not totals['banner_medicoes'] and not totals['banners_pulados']: continue
+        per_page = totals['banner_segundos'] / totals['banner_medicoes'] if totals['banner_medicoes'] else None
+        skips = totals['banners_pulados']
+        if per_page is None:
+            lines.append(f"  {plataforma}: banner pulado {skips}x (sem medição de perfil novo)")
+        else:
+            lines.append(f"  {plataforma}: banner custa {per_page:.1f}s por página; pulado {skips}x "
+                         f"-> ~{per_page * skips / 60:.1f} min economizados")
+    return '\n'.join(lines) if lines else "  Nenhum banner de cookies tratado ou pulado."
+
+
+def _pid_alive(pid):
+    if os.name != 'posix': return True  # no Windows conta só a idade do lock
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class Profile:
+    def __init__(self, plataforma, path):
+        self.plataforma = plataforma
+        self.path = os.path.abspath(path)
+        self.meta_file = os.path.join(self.path, 'perfil_meta.json')
+        self.cookies_file = os.path.join(self.path, 'cookies.json')
+        self.meta = self._load_meta()
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'criado_em': time.time(), 'consentimento': False, 'sessoes': 0}
+
+    def save_meta(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.meta_file, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+
+    @property
+    def chrome_dir(self):
+        return os.path.join(self.path, 'chrome')
+
+    @property
+    def consent(self):
+        return bool(self.meta.get('consentimento'))
+
+    def age_days(self):
+        return (time.time() - self.meta.get('criado_em', time.time())) / 86400
+
+    def save_cookies(self, driver):
+        try:
+            cookies = driver.get_cookies()
+        except Exception:
+            return
+        with open(self.cookies_file, 'w', encoding='utf-8') as f:
+            json.dump(cookies, f)
+
+    def restore_cookies(self, driver):
+        """
+        Restaura o cookie jar numa sessão sem o diretório do perfil. Usa o
+        Network.setCookie do DevTools, que grava os cookies sem abrir o domínio:
+        nenhuma requisição extra (fora do RateLimiter) por navegador iniciado.
+        """
+        try:
+            with open(self.cookies_file, encoding='utf-8') as f:
+                cookies = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        restored = 0
+        for cookie in cookies:
+            params = {key: cookie[key] for key in ('name', 'value', 'domain', 'path', 'secure', 'httpOnly') if key in cookie}
+            if cookie.get('sameSite') in ('Strict', 'Lax', 'None'): params['sameSite'] = cookie['sameSite']
+            if 'expiry' in cookie: params['expires'] = cookie['expiry']
+            if 'domain' not in params: params['url'] = HOME_URLS[self.plataforma]
+            try:
+                driver.execute_cdp_cmd('Network.setCookie', params)
+                restored += 1
+            except Exception:
+                continue
+        return restored
+
+
+class ProfileManager:
+    def __init__(self, plataforma, base_dir=PROFILES_DIR, slots=DEFAULT_SLOTS, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.plataforma = plataforma
+        self.dir = os.path.join(base_dir, plataforma)
+        self.slots = slots
+        self.max_age_days = max_age_days
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _lock_path(self, slot):
+        return os.path.join(self.dir, f'slot{slot}.lock')
+
+    def _try_lock(self, slot):
+        path = self._lock_path(slot)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(path) as f:
+                    pid = int(f.read().strip() or 0)
+                stale = time.time() - os.path.getmtime(path) > STALE_LOCK_SECONDS or not _pid_alive(pid)
+            except (OSError, ValueError):
+                stale = True
+            if not stale: return False
+            try: os.remove(path)
+            except OSError: return False
+            return self._try_lock(slot)
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+
+    def acquire(self):
+        """Reserva o slot livre usado há mais tempo. Retorna None se todos estiverem em uso."""
+        candidates = []
+        for slot in range(self.slots):
+            profile = Profile(self.plataforma, os.path.join(self.dir, f'slot{slot}'))
+            candidates.append((profile.meta.get('ultimo_uso', 0), slot, profile))
+        for _, slot, profile in sorted(candidates, key=lambda c: c[0]):
+            if not self._try_lock(slot): continue
+            if profile.age_days() > self.max_age_days:
+                print(f"[{self.plataforma}] Perfil slot{slot} expirado, recriando...")
+                shutil.rmtree(profile.path, ignore_errors=True)
+                profile = Profile(self.plataforma, profile.path)
+            profile.slot = slot
+            profile.meta['sessoes'] = profile.meta.get('sessoes', 0) + 1
+            profile.save_meta()
+            return profile
+        return None
+
+    def release(self, profile, driver=None):
+        """Salva cookies e consentimento do driver no perfil e libera o slot."""
+        if driver is not None:
+            profile.save_cookies(driver)
+            if consent_stored(driver): profile.meta['consentimento'] = True
+            for key in BANNER_KEYS:
+                profile.meta[key] = profile.meta.get(key, 0) + getattr(driver, key, 0)
+        profile.meta['ultimo_uso'] = time.time()
+        profile.save_meta()
+        try: os.remove(self._lock_path(profile.slot))
+        except OSError: pass
+
+    def banner_totals(self):
+        totals = dict.fromkeys(BANNER_KEYS, 0)
+        for slot in range(self.slots):
+            meta = Profile(self.plataforma, os.path.join(self.dir, f'slot{slot}')).meta
+            for key in BANNER_KEYS: totals[key] += meta.get(key, 0)
+        return totals
+
+    def latest_cookie_jar(self):
+        """Perfil com o cookie jar mais recente (para sessões que não conseguiram um slot livre)."""
+        best = None
+        for slot in range(self.slots):
+            profile = Profile(self.plataforma, os.path.join(self.dir, f'slot{slot}'))
+            if os.path.exists(profile.cookies_file):
+                if best is None or os.path.getmtime(profile.cookies_file) > os.path.getmtime(best.cookies_file):
+                    best = profile
+        return best
+
+
+_managers = {}
+
+
+def get_profile_manager(plataforma, **kwargs):
+    if plataforma not in _managers:
+        _managers[plataforma] = ProfileManager(plataforma, **kwargs)
+    return _managers[plataforma]
@@ -0,0 +1,227 @@
+import argparse
+import json
+import random
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+
+from circuit_breaker import CircuitBreakerBoard
+from hp_catalog import expand_search_queries
+from magazine_scraper import fetch_magalu_results_page
+from mercado_scraper import fetch_mercado_livre_results_page
+from page_guard import UnusablePageError
+from product_ids import canonical_product_id
+from rate_limit import RateLimiter
+from recrawl_scheduler import RecrawlScheduler
+from run_stats import RunStats
+from scraping import PLATFORMS, start_driver, stop_driver, save_to_csv
+
+# ========= Coleta do catálogo completo =========
+# Cada modelo do hp_catalog.json vira vários termos de busca (XL, cores, kit,
+# original/compatível). Em vez de percorrer os termos em ordem, a próxima página
+# carregada é sempre a do termo que mais tem trazido anúncios novos; termos
+# que só devolvem repetidos por algumas páginas seguidas são encerrados. Assim uma atualização completa
+# cabe num orçamento fixo de páginas/tempo.
+
+RESULTS_PAGE = {
+    'magalu': fetch_magalu_results_page,
+    'mercado_livre': fetch_mercado_livre_results_page,
+}
+DEFAULT_DB = 'catalogo_crawl.sqlite'
+OPTIMISTIC_PRIOR = 25.0  # termo nunca visto: tenta ao menos a primeira página
+EMA_ALPHA = 0.6
+EMPTY_PAGES_TO_EXHAUST = 2  # páginas seguidas sem anúncio novo para encerrar um termo
+MAX_JOB_ERRORS = 3
+PAGES_PER_DRIVER = 40
+
+
+class CatalogCrawlState:
+    def __init__(self, db_path=DEFAULT_DB):
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, started REAL, finished REAL);
+            CREATE TABLE IF NOT EXISTS jobs (
+                run_id TEXT, plataforma TEXT, termo TEXT, modelo TEXT,
+                cursor TEXT, pages INTEGER DEFAULT 0, new_total INTEGER DEFAULT 0,
+                score REAL, errors INTEGER DEFAULT 0, exhausted INTEGER DEFAULT 0,
+                empty_streak INTEGER DEFAULT 0,
+                PRIMARY KEY (run_id, plataforma, termo)
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_score ON jobs (run_id, exhausted, score DESC);
+            CREATE TABLE IF NOT EXISTS yield_history (plataforma TEXT, termo TEXT, rate REAL, PRIMARY KEY (plataforma, termo));
+            CREATE TABLE IF NOT EXISTS listings (
+                run_id TEXT, product_id TEXT, plataforma TEXT, termo TEXT, record TEXT,
+                PRIMARY KEY (run_id, product_id)
+            );
+        """)
+        # Bancos criados antes da contagem de páginas vazias seguidas
+        if 'empty_streak' not in [c[1] for c in self.conn.execute("PRAGMA table_info(jobs)")]:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN empty_streak INTEGER DEFAULT 0")
+
+    def start_run(self, platforms, queries, resume=False):
+        if resume:
+            row = self.conn.execute("SELECT run_id FROM runs WHERE finished IS NULL ORDER BY started DESC LIMIT 1").fetchone()
+            if row: return row[0]
+        # Sufixo aleatório: duas rodadas no mesmo segundo não colidem na chave
+        run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.conn.execute("INSERT INTO runs (run_id, started) VALUES (?, ?)", (run_id, time.time()))
+        history = {(p, t): r for p, t, r in self.conn.execute("SELECT plataforma, termo, rate FROM yield_history")}
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO jobs (run_id, plataforma, termo, modelo, score) VALUES (?, ?, ?, ?, ?)",
+            [(run_id, p, termo, modelo, history.get((p, termo), OPTIMISTIC_PRIOR))
+             for p in platforms for termo, modelo in queries]
+        )
+        self.conn.commit()
+        return run_id
+
+    def next_job(self, run_id, platforms):
+        if not platforms: return None
+        row = self.conn.execute(
+            f"SELECT plataforma, termo, modelo, cursor, pages, new_total, score, errors, empty_streak FROM jobs "
+            f"WHERE run_id = ? AND exhausted = 0 AND plataforma IN ({','.join('?' * len(platforms))}) "
+            f"ORDER BY score DESC LIMIT 1", [run_id, *platforms]).fetchone()
+        if not row: return None
+        keys = ['plataforma', 'termo', 'modelo', 'cursor', 'pages', 'new_total', 'score', 'errors', 'empty_streak']
+        job = dict(zip(keys, row))
+        job['cursor'] = json.loads(job['cursor']) if job['cursor'] else None
+        return job
+
+    def add_listings(self, run_id, plataforma, termo, records):
+        """Guarda os registros ainda não vistos nesta rodada. Retorna quantos eram novos."""
+        new = 0
+        for record in records:
+            product_id = canonical_product_id(record.get('link_anuncio'), plataforma)
+            if not product_id: continue
+            record['plataforma'] = plataforma
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO listings (run_id, product_id, plataforma, termo, record) VALUES (?, ?, ?, ?, ?)",
+                (run_id, product_id, plataforma, termo, json.dumps(record, ensure_ascii=False, default=str)))
+            new += cur.rowcount
+        return new
+
+    def update_job(self, run_id, job, new, next_cursor):
+        score = EMA_ALPHA * new + (1 - EMA_ALPHA) * min(job['score'], OPTIMISTIC_PRIOR)
+        # Uma página só de repetidos pode ser acaso (patrocinados, reordenação):
+        # o termo só acaba depois de algumas seguidas; o score já o manda para o fim da fila
+        empty_streak = 0 if new else (job.get('empty_streak') or 0) + 1
+        exhausted = next_cursor is None or empty_streak >= EMPTY_PAGES_TO_EXHAUST
+        self.conn.execute(
+            "UPDATE jobs SET cursor = ?, pages = pages + 1, new_total = new_total + ?, score = ?, exhausted = ?, empty_streak = ? "
+            "WHERE run_id = ? AND plataforma = ? AND termo = ?",
+            (json.dumps(next_cursor) if next_cursor is not None else None, new, score, int(exhausted), empty_streak,
+             run_id, job['plataforma'], job['termo']))
+        self.conn.commit()
+
+    def job_error(self, run_id, job):
+        self.conn.execute(
+            "UPDATE jobs SET errors = errors + 1, exhausted = CASE WHEN errors + 1 >= ? THEN 1 ELSE 0 END, score = score / 2 "
+            "WHERE run_id = ? AND plataforma = ? AND termo = ?",
+            (MAX_JOB_ERRORS, run_id, job['plataforma'], job['termo']))
+        self.conn.commit()
+
+    def finish_run(self, run_id):
+        # A taxa de novos por página desta rodada vira a prioridade inicial da próxima
+        self.conn.execute(
+            "INSERT OR REPLACE INTO yield_history (plataforma, termo, rate) "
+            "SELECT plataforma, termo, CAST(new_total AS REAL) / pages FROM jobs WHERE run_id = ? AND pages > 0",
+            (run_id,))
+        self.conn.execute("UPDATE runs SET finished = ? WHERE run_id = ?", (time.time(), run_id))
+        self.conn.commit()
+
+    def progress(self, run_id):
+        return self.conn.execute(
+            "SELECT COUNT(*), SUM(exhausted), SUM(pages), SUM(new_total) FROM jobs WHERE run_id = ?", (run_id,)).fetchone()
+
+    def records(self, run_id):
+        return [json.loads(r[0]) for r in self.conn.execute("SELECT record FROM listings WHERE run_id = ?", (run_id,))]
+
+    def close(self):
+        self.conn.close()
+
+
+def crawl_catalog(state, run_id, platforms, max_pages=300, max_minutes=120, use_profiles=False, on_links=None):
+    deadline = time.time() + max_minutes * 60
+    limiter, board, stats = RateLimiter(), CircuitBreakerBoard(), RunStats()
+    drivers, driver_pages = {}, {}
+    pages = 0
+    try:
+        while pages < max_pages and time.time() < deadline:
+            paused = set(board.open_platforms())
+            job = state.next_job(run_id, [p for p in platforms if p not in paused])
+            if job is None:
+                if paused and time.time() < deadline:
+                    time.sleep(min(60, min(board.seconds_until_retry(p) for p in paused) + 1))
+                    continue
+                break
+            plataforma = job['plataforma']
+            if not board.allow(plataforma): continue
+
+            if plataforma in drivers and driver_pages[plataforma] >= PAGES_PER_DRIVER:
+                stop_driver(drivers.pop(plataforma))
+            if plataforma not in drivers:
+                drivers[plataforma] = start_driver(PLATFORMS[plataforma][0], plataforma=plataforma, use_profile=use_profiles)
+                driver_pages[plataforma] = 0
+
+            limiter.acquire(plataforma)
+            start = time.time()
+            pages += 1
+            driver_pages[plataforma] += 1
+            try:
+                records, next_cursor = RESULTS_PAGE[plataforma](job['termo'], drivers[plataforma], job['cursor'])
+            except UnusablePageError as e:
+                stats.record_page(plataforma, time.time() - start, e.page_class)
+                # Bloqueio também pesa no termo: senão ele continua no topo da fila
+                # e a coleta volta sempre para a mesma busca barrada.
+                if e.is_block: board.record_failure(plataforma, e.page_class)
+                state.job_error(run_id, job)
+                continue
+            except Exception as e:
+                print(f"Erro em '{job['termo']}' ({plataforma}): {type(e).__name__} - {e}")
+                state.job_error(run_id, job)
+                stop_driver(drivers.pop(plataforma))
+                continue
+            stats.record_page(plataforma, time.time() - start)
+            board.record_success(plataforma)
+
+            new = state.add_listings(run_id, plataforma, job['termo'], records)
+            if on_links and records: on_links([r['link_anuncio'] for r in records], plataforma)
+            state.update_job(run_id, job, new, next_cursor)
+            print(f"[{pages}/{max_pages}] {plataforma} '{job['termo']}' pág. {job['pages'] + 1}: "
+                  f"{len(records)} anúncios, {new} novos (prioridade {job['score']:.1f})")
+            time.sleep(random.uniform(1, 3))
+    finally:
+        for driver in drivers.values():
+            stop_driver(driver)
+    print(stats.summary())
+    return pages
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Coleta de todo o catálogo de cartuchos HP (hp_catalog.json).")
+    parser.add_argument('--plataformas', nargs='+', default=list(PLATFORMS), choices=list(PLATFORMS))
+    parser.add_argument('--max-paginas', type=int, default=300, help="Orçamento de páginas de busca nesta execução")
+    parser.add_argument('--max-minutos', type=float, default=120)
+    parser.add_argument('--retomar', action='store_true', help="Continua a última rodada não finalizada")
+    parser.add_argument('--perfis', action='store_true')
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--saida', default='catalogo_hp.csv')
+    parser.add_argument('--recoleta', nargs='?', const='recoleta.sqlite', default=None, metavar='DB',
+                        help="Registra os anúncios achados como novos na recoleta priorizada (recrawl_scheduler.py)")
+    args = parser.parse_args()
+
+    queries = expand_search_queries()
+    state = CatalogCrawlState(args.db)
+    run_id = state.start_run(args.plataformas, queries, resume=args.retomar)
+    print(f"Rodada {run_id}: {len(queries)} termos x {len(args.plataformas)} plataformas")
+
+    recrawl = RecrawlScheduler(args.recoleta) if args.recoleta else None
+    on_links = (lambda links, plataforma: [recrawl.discover(link, plataforma) for link in links]) if recrawl else None
+    crawl_catalog(state, run_id, args.plataformas, args.max_paginas, args.max_minutos, args.perfis, on_links)
+    if recrawl: recrawl.close()
+    total, exhausted, pages, new_total = state.progress(run_id)
+    print(f"Termos encerrados: {exhausted or 0}/{total} | páginas: {pages or 0} | anúncios únicos: {new_total or 0}")
+    if exhausted == total:
+        state.finish_run(run_id)
+    save_to_csv(state.records(run_id), args.saida)
+    state.close()
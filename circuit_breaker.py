@@ -0,0 +1,125 @@
+import sqlite3
+import time
+
+# ========== Circuit breaker por plataforma ==========
+# Depois de N páginas bloqueadas seguidas a plataforma fica "aberta": nenhum
+# job novo é enviado até passar o tempo de espera (que dobra a cada nova
+# abertura). Passado o tempo, um único job de teste ("meio aberto") decide se
+# a plataforma volta ao normal ou se espera de novo.
+# Com db_path o estado fica em SQLite e vale para todos os processos.
+
+CLOSED, OPEN, HALF_OPEN = 'fechado', 'aberto', 'meio_aberto'
+
+
+class CircuitBreakerBoard:
+    def __init__(self, db_path=':memory:', failure_threshold=3, base_cooldown=120.0, max_cooldown=3600.0, probe_timeout=600.0):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_timeout = probe_timeout
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        if db_path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS breakers (
+                plataforma TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                failures INTEGER NOT NULL DEFAULT 0,
+                openings INTEGER NOT NULL DEFAULT 0,
+                reopen_at REAL NOT NULL DEFAULT 0,
+                probe_owner TEXT,
+                probe_expires REAL,
+                last_class TEXT
+            )
+        """)
+
+    def _row(self, plataforma):
+        row = self.conn.execute(
+            "SELECT state, failures, openings, reopen_at, probe_owner, probe_expires FROM breakers WHERE plataforma = ?",
+            (plataforma,)).fetchone()
+        return row or (CLOSED, 0, 0, 0.0, None, None)
+
+    def _save(self, plataforma, state, failures, openings, reopen_at, probe_owner=None, probe_expires=None, last_class=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO breakers (plataforma, state, failures, openings, reopen_at, probe_owner, probe_expires, last_class) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (plataforma, state, failures, openings, reopen_at, probe_owner, probe_expires, last_class))
+
+    def allow(self, plataforma, owner='local'):
+        """True se o job pode ser enviado. No estado meio aberto só o dono do teste passa."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            state, failures, openings, reopen_at, probe_owner, probe_expires = self._row(plataforma)
+            allowed = True
+            if state == OPEN:
+                if now < reopen_at:
+                    allowed = False
+                else:
+                    print(f"[{plataforma}] Tempo de espera encerrado, enviando página de teste...")
+                    self._save(plataforma, HALF_OPEN, failures, openings, reopen_at, owner, now + self.probe_timeout)
+            elif state == HALF_OPEN and probe_owner != owner:
+                if probe_expires and probe_expires < now:
+                    self._save(plataforma, HALF_OPEN, failures, openings, reopen_at, owner, now + self.probe_timeout)
+                else:
+                    allowed = False
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def record_success(self, plataforma):
+        state = self._row(plataforma)[0]
+        if state != CLOSED:
+            print(f"[{plataforma}] Página de teste OK, plataforma liberada.")
+        self._save(plataforma, CLOSED, 0, 0, 0.0)
+
+    def record_failure(self, plataforma, page_class=None):
+        """Registra página bloqueada. Retorna quantos segundos a plataforma ficará fechada (0 se ainda não abriu)."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            state, failures, openings, reopen_at, _, _ = self._row(plataforma)
+            failures += 1
+            cooldown = 0.0
+            if state == HALF_OPEN or failures >= self.failure_threshold:
+                cooldown = min(self.base_cooldown * (2 ** openings), self.max_cooldown)
+                self._save(plataforma, OPEN, failures, openings + 1, now + cooldown, last_class=page_class)
+                print(f"[{plataforma}] Circuit breaker aberto ({page_class}): pausando por {cooldown/60:.1f} min.")
+            else:
+                self._save(plataforma, state, failures, openings, reopen_at, last_class=page_class)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return cooldown
+
+    def pause(self, plataforma, seconds, reason=None):
+        """
+        Fecha a plataforma por um tempo já conhecido (ex: nenhuma saída de proxy
+        disponível), sem contar como página bloqueada nem dobrar a próxima espera.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            state, failures, openings, reopen_at, _, _ = self._row(plataforma)
+            reopen_at = max(reopen_at if state == OPEN else 0.0, now + seconds)
+            self._save(plataforma, OPEN, failures, openings, reopen_at, last_class=reason)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        print(f"[{plataforma}] Plataforma pausada ({reason}) por {(reopen_at - now)/60:.1f} min.")
+
+    def seconds_until_retry(self, plataforma):
+        state, _, _, reopen_at, _, _ = self._row(plataforma)
+        if state != OPEN: return 0.0
+        return max(0.0, reopen_at - time.time())
+
+    def open_platforms(self):
+        now = time.time()
+        return [p for p, in self.conn.execute("SELECT plataforma FROM breakers WHERE state = ? AND reopen_at > ?", (OPEN, now))]
+
+    def close(self):
+        self.conn.close()
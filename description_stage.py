@@ -0,0 +1,154 @@
+import argparse
+import os
+import random
+import sqlite3
+import time
+
+import pandas as pd
+
+from circuit_breaker import CircuitBreakerBoard
+from hp_catalog import get_matcher
+from magazine_scraper import scrape_magalu_description
+from mercado_scraper import scrape_mercado_livre_description
+from page_guard import UnusablePageError
+from product_ids import canonical_product_id
+from rate_limit import RateLimiter
+from scraping import PLATFORMS, start_driver, stop_driver, save_to_csv
+
+# ========= Etapa de descrição (adiada e com cache) =========
+# A descrição é a parte mais cara da página de produto e quase só serve para
+# descobrir o rendimento em páginas. Esta etapa roda separada da coleta de
+# preços, só para anúncios em que o modelo ou o rendimento ainda são
+# desconhecidos, e guarda o resultado por ID canônico do produto.
+
+DESCRIPTION_FETCHERS = {
+    'magalu': scrape_magalu_description,
+    'mercado_livre': scrape_mercado_livre_description,
+}
+DEFAULT_CACHE = 'descricoes_cache.sqlite'
+DEFAULT_TTL_DAYS = 90
+EMPTY_TTL_DAYS = 7  # páginas sem descrição são tentadas de novo antes
+
+
+class DescriptionCache:
+    def __init__(self, db_path=DEFAULT_CACHE, ttl_days=DEFAULT_TTL_DAYS):
+        self.ttl = ttl_days * 86400
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS descriptions (
+                product_id TEXT PRIMARY KEY,
+                descricao TEXT,
+                fetched_at REAL NOT NULL
+            )
+        """)
+
+    def get(self, product_id):
+        """Retorna (encontrado, descricao). Entradas vencidas contam como não encontradas."""
+        row = self.conn.execute("SELECT descricao, fetched_at FROM descriptions WHERE product_id = ?", (product_id,)).fetchone()
+        if not row: return False, None
+        descricao, fetched_at = row
+        ttl = self.ttl if descricao else EMPTY_TTL_DAYS * 86400
+        if time.time() - fetched_at > ttl: return False, None
+        return True, descricao
+
+    def put(self, product_id, descricao):
+        self.conn.execute("INSERT OR REPLACE INTO descriptions (product_id, descricao, fetched_at) VALUES (?, ?, ?)",
+                          (product_id, descricao, time.time()))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and pd.isna(value)) or (isinstance(value, str) and not value.strip())
+
+
+def needs_description(record):
+    """Só vale buscar a descrição se ela falta e o modelo ou o rendimento ainda são desconhecidos."""
+    if not _is_missing(record.get('descricao')):
+        return False
+    # O rendimento nominal do catálogo dispensa a descrição quando modelo, cor e capacidade estão no título
+    tags = get_matcher().tag(record.get('titulo'))
+    return tags['modelo'] is None or get_matcher().nominal_yield(tags) is None
+
+
+def run_description_stage(records, cache, max_pages=None):
+    """
+    Preenche 'descricao' nos registros que precisam, usando o cache primeiro.
+    max_pages limita quantas páginas de produto são abertas nesta execução.
+    """
+    stats = {'candidatos': 0, 'cache': 0, 'paginas': 0, 'preenchidos': 0}
+    limiter = RateLimiter()
+    board = CircuitBreakerBoard()
+    drivers = {}
+    try:
+        for record in records:
+            if not needs_description(record): continue
+            plataforma = record.get('plataforma')
+            product_id = canonical_product_id(record.get('link_anuncio'), plataforma)
+            if not product_id or plataforma not in DESCRIPTION_FETCHERS: continue
+            stats['candidatos'] += 1
+
+            found, descricao = cache.get(product_id)
+            if found:
+                stats['cache'] += 1
+            else:
+                if max_pages is not None and stats['paginas'] >= max_pages: continue
+                if not board.allow(plataforma): continue
+                if plataforma not in drivers:
+                    drivers[plataforma] = start_driver(PLATFORMS[plataforma][0], plataforma=plataforma, use_profile=True)
+                limiter.acquire(plataforma)
+                try:
+                    descricao = DESCRIPTION_FETCHERS[plataforma](record['link_anuncio'], drivers[plataforma])
+                    board.record_success(plataforma)
+                except UnusablePageError as e:
+                    print(f"Página descartada: {e}")
+                    if e.is_block: board.record_failure(plataforma, e.page_class)
+                    else: cache.put(product_id, None)
+                    continue
+                except Exception as e:
+                    print(f"Erro ao buscar descrição de {record['link_anuncio']}: {e}")
+                    continue
+                stats['paginas'] += 1
+                cache.put(product_id, descricao)
+                time.sleep(random.uniform(2, 4))
+
+            if descricao:
+                record['descricao'] = descricao
+                stats['preenchidos'] += 1
+    finally:
+        for driver in drivers.values():
+            stop_driver(driver)
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Busca descrições pendentes (etapa separada da coleta de preços).")
+    parser.add_argument('arquivo', nargs='?', default='scraping_unificado.csv')
+    parser.add_argument('--saida', default=None, help="CSV de saída (padrão: substitui o arquivo de entrada)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE)
+    parser.add_argument('--ttl-dias', type=float, default=DEFAULT_TTL_DAYS)
+    parser.add_argument('--max-paginas', type=int, default=None, help="Máximo de páginas de produto nesta execução")
+    parser.add_argument('--baixa-prioridade', action='store_true', help="Roda com prioridade reduzida no sistema (nice)")
+    args = parser.parse_args()
+
+    if args.baixa_prioridade and hasattr(os, 'nice'):
+        os.nice(10)
+
+    start_time = time.time()
+    df = pd.read_csv(args.arquivo, sep=';')
+    records = df.to_dict('records')
+    cache = DescriptionCache(args.cache, args.ttl_dias)
+    stats = run_description_stage(records, cache, args.max_paginas)
+    cache.close()
+    print(f"Descrições: {stats}")
+    # Grava num temporário e só então renomeia: se a escrita falhar no meio,
+    # o CSV de entrada continua inteiro
+    saida = args.saida or args.arquivo
+    temp = saida + '.tmp'
+    save_to_csv(records, temp)
+    if os.path.exists(temp):
+        os.replace(temp, saida)
+        print(f"CSV final: {saida}")
+    print(f"Etapa finalizada em {(time.time() - start_time)/60:.2f} minutos")
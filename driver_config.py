@@ -2,7 +2,7 @@ from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 
-def setup_driver():
+def setup_driver(extra_arguments=None, proxy=None):
     options = webdriver.ChromeOptions()
     options.add_argument("start-maximized")
     options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36')
@@ -13,6 +13,11 @@ def setup_driver():
     options.add_argument('--disable-dev-shm-usage')
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_argument("--headless")
+    if proxy:
+        # Saída de rede fixa para a sessão inteira (ver proxy_pool.py)
+        options.add_argument(f"--proxy-server={proxy}")
+    for arg in extra_arguments or []:
+        options.add_argument(arg)
     
     s = Service(ChromeDriverManager().install())
     driver = webdriver.Chrome(service=s, options=options)
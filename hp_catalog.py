@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from collections import deque
+
+# ========== Catálogo de modelos HP ==========
+# A lista de modelos fica em hp_catalog.json para ser mantida sem mexer no
+# código: basta incluir um modelo novo lá para ele entrar na coleta.
+
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hp_catalog.json')
+
+
+def load_catalog(path=CATALOG_FILE):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def catalog_version(path=CATALOG_FILE):
+    """Hash curto do hp_catalog.json: muda sempre que o catálogo muda."""
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+
+def expand_search_queries(catalog=None):
+    """
+    Expande cada modelo do catálogo em termos de busca: modelo base, XL, cada
+    cor e cada tipo (kit, original, compatível). Retorna lista de (termo, modelo)
+    sem repetições, na ordem do catálogo.
+    """
+    catalog = catalog or load_catalog()
+    marca = catalog.get('marca', 'HP').lower()
+    tipos = catalog.get('variantes_tipo', [])
+    queries, seen = [], set()
+
+    def add(term, modelo):
+        term = ' '.join(term.split())
+        if term not in seen:
+            seen.add(term)
+            queries.append((term, modelo))
+
+    for entry in catalog['modelos']:
+        modelo = entry['modelo']
+        produto = entry.get('produto', 'cartucho')
+        capacidades = ['', 'xl'] if entry.get('xl') else ['']
+        for capacidade in capacidades:
+            base = f"{produto} {marca} {modelo} {capacidade}"
+            add(base, modelo)
+            if len(entry.get('cores', [])) > 1:
+                for cor in entry['cores']:
+                    add(f"{base} {cor}", modelo)
+            for tipo in tipos:
+                if tipo == 'kit' and len(entry.get('cores', [])) < 2: continue
+                add(f"kit {produto} {marca} {modelo} {capacidade}" if tipo == 'kit' else f"{base} {tipo}", modelo)
+    return queries
+
+
+# ========== Identificação de modelos nos títulos ==========
+# Todos os modelos, códigos de peça, impressoras e palavras-chave do catálogo
+# são compilados num único autômato Aho-Corasick sobre palavras. Cada título é
+# percorrido uma vez só, então o custo por linha não cresce com o catálogo.
+
+DEFAULT_CATEGORY = 'Suprimento de Impressão'
+DEFAULT_COMPATIBILITY = 'Original'
+DEFAULT_CAPACITY = 'Padrão'
+XL_CAPACITY = 'XL (Alto Rendimento)'
+
+# Força de cada forma de citar o modelo: o código de peça e "HP 662" valem
+# mais que um número solto, que pode ser outra coisa no título.
+CODE_MATCH, BRAND_MATCH, BARE_MATCH = 3, 2, 1
+# Um modelo só numérico ("60", "21") nunca casa sozinho: precisa vir depois da
+# marca ou de uma palavra de contexto ("cartucho 60", "kit 21") ou antes de
+# "XL" ("60xl"), e é descartado se vier seguido de unidade ("60 ml", "60 páginas").
+
+
+def normalize_tokens(text):
+    """Minúsculas, sem acentos, separando letras de números ("662XL" -> ["662", "xl"])."""
+    if not isinstance(text, str): return []
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r'(?<=\d)(?=[a-z])|(?<=[a-z])(?=\d)', ' ', text)
+    return re.findall(r'[a-z0-9]+', text)
+
+
+class CatalogMatcher:
+    def __init__(self, catalog=None):
+        catalog = catalog or load_catalog()
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        self.yields = {}
+        self.units = set(catalog.get('unidades', []))
+        marca = normalize_tokens(catalog.get('marca', 'HP'))
+        context = [normalize_tokens(word) for word in catalog.get('contexto_modelo', [])]
+
+        for entry in catalog['modelos']:
+            modelo = entry['modelo']
+            self.yields[modelo] = entry.get('rendimento', {})
+            for name in [modelo] + entry.get('aliases', []):
+                tokens = normalize_tokens(name)
+                if len(tokens) == 1 and tokens[0].isdigit():
+                    for words in context:
+                        self._add(words + tokens, ('modelo', modelo, BARE_MATCH))
+                    self._add(tokens + ['xl'], ('modelo', modelo, BARE_MATCH))
+                else:
+                    self._add(tokens, ('modelo', modelo, BARE_MATCH))
+                self._add(marca + tokens, ('modelo', modelo, BRAND_MATCH))
+            for code in entry.get('codigos', []):
+                tokens = normalize_tokens(code['codigo'])
+                self._add(tokens, ('modelo', modelo, CODE_MATCH))
+                if code.get('cor'): self._add(tokens, ('cor', code['cor'], CODE_MATCH))
+                if code.get('xl'): self._add(tokens, ('capacidade', XL_CAPACITY, CODE_MATCH))
+        for printer in catalog.get('impressoras', []):
+            self._add(normalize_tokens(printer['nome']), ('impressora', printer['nome'], tuple(printer['cartuchos'])))
+
+        # A ordem das categorias no JSON define a prioridade (Notebook antes de Impressora)
+        for field, labels in catalog.get('palavras_chave', {}).items():
+            for rank, (label, words) in enumerate(labels.items()):
+                for word in words:
+                    self._add(normalize_tokens(word), (field, label, rank))
+        self._build()
+
+    def _add(self, tokens, payload):
+        if not tokens: return
+        state = 0
+        for token in tokens:
+            if token not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+                self.goto[state][token] = len(self.goto) - 1
+            state = self.goto[state][token]
+        self.out[state].append(payload)
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, child in self.goto[state].items():
+                queue.append(child)
+                f = self.fail[state]
+                while f and token not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(token, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def scan(self, text):
+        """Percorre o texto uma vez e devolve (posição, payload) de cada ocorrência do catálogo."""
+        tokens = normalize_tokens(text)
+        state = 0
+        for pos, token in enumerate(tokens):
+            while state and token not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(token, 0)
+            following = tokens[pos + 1] if pos + 1 < len(tokens) else None
+            for payload in self.out[state]:
+                if payload[0] == 'modelo' and payload[1].isdigit() and token == payload[1] and following in self.units:
+                    continue  # "tinta 60 ml": o número é a quantidade, não o modelo
+                yield pos, payload
+
+    def tag(self, title, descricao=None):
+        """
+        Classifica um anúncio a partir do título. A descrição só é consultada
+        para descobrir o modelo quando o título não o cita, e apenas com
+        menções fortes ("HP 664", código de peça ou impressora).
+        """
+        tags = {'categoria': DEFAULT_CATEGORY, 'compatibilidade': DEFAULT_COMPATIBILITY,
+                'capacidade': DEFAULT_CAPACITY, 'modelo': None, 'cores': set(), 'kit': False, 'impressora': None}
+        best_model, category_rank = None, None
+        for _, (field, value, extra) in self.scan(title):
+            if field == 'modelo':
+                if best_model is None or extra > best_model[0]:
+                    best_model = (extra, value)
+            elif field == 'categoria':
+                if category_rank is None or extra < category_rank:
+                    category_rank, tags['categoria'] = extra, value
+            elif field in ('compatibilidade', 'capacidade'):
+                tags[field] = value
+            elif field == 'cor':
+                tags['cores'].add(value)
+            elif field == 'tipo':
+                tags['kit'] = True
+            elif field == 'impressora' and tags['impressora'] is None:
+                tags['impressora'] = (value, extra)
+
+        if best_model is None and descricao is not None:
+            for _, (field, value, extra) in self.scan(descricao):
+                if field == 'modelo' and extra >= BRAND_MATCH:
+                    if best_model is None or extra > best_model[0]:
+                        best_model = (extra, value)
+                elif field == 'impressora' and tags['impressora'] is None:
+                    tags['impressora'] = (value, extra)
+
+        if best_model is not None:
+            tags['modelo'] = best_model[1]
+        elif tags['impressora'] and len(tags['impressora'][1]) == 1 and tags['categoria'] == DEFAULT_CATEGORY:
+            # "Cartucho para DeskJet 2774" -> modelo usado por essa impressora
+            tags['modelo'] = tags['impressora'][1][0]
+        if tags['impressora']:
+            tags['impressora'] = tags['impressora'][0]
+        return tags
+
+    def nominal_yield(self, tags):
+        """Rendimento nominal (páginas) do catálogo para o modelo/cor/capacidade identificados."""
+        if tags['modelo'] is None or tags['kit']: return None
+        table = self.yields.get(tags['modelo'], {})
+        table = table.get('xl' if tags['capacidade'] == XL_CAPACITY else 'padrao', {})
+        colors = [c for c in tags['cores'] if c in table]
+        if len(colors) == 1:
+            return table[colors[0]]
+        if not tags['cores'] and len(table) == 1:
+            return next(iter(table.values()))
+        return None
+
+
+_matcher = None
+
+
+def get_matcher():
+    global _matcher
+    if _matcher is None:
+        _matcher = CatalogMatcher()
+    return _matcher
@@ -0,0 +1,329 @@
+import argparse
+import math
+import re
+import sqlite3
+import time
+
+import pandas as pd
+
+from hp_catalog import normalize_tokens
+from product_ids import canonical_product_id
+
+# ========== Índice invertido de anúncios ==========
+# Cada palavra de título e descrição (sem acento, minúscula, com "664XL"
+# separado em "664" e "xl") aponta para os anúncios onde aparece e as posições
+# dentro do texto. A lista de cada palavra fica em SQLite ordenada por palavra,
+# então uma consulta lê só as listas das palavras pedidas, começando pela mais
+# rara, em vez de varrer todas as linhas com str.contains. Os filtros de preço,
+# nota e plataforma entram já na leitura da primeira lista; consultas que casam
+# com boa parte do índice ("cartucho") são resolvidas direto no SQL, percorrendo
+# os anúncios em ordem de preço até completar o limite.
+#
+# Sintaxe das consultas: palavras seguidas = E; OR = OU; -palavra ou NOT = NÃO;
+# "frase entre aspas" = palavras em sequência; parênteses agrupam.
+#   compativel 664 xl "tri color" OR tricolor
+
+DEFAULT_DB = 'indice_anuncios.sqlite'
+SMALL_CANDIDATE_SET = 500  # até aqui os candidatos vão num IN; acima, numa tabela temporária
+COMMON_QUERY_DOCS = 5000  # consultas estimadas acima disso vão direto para o SQL, sem listas em memória
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _number(value):
+    if value is None: return None
+    try:
+        number = float(str(value).replace('R$', '').strip()) if not isinstance(value, (int, float)) else float(value)
+    except ValueError:
+        return None
+    return None if math.isnan(number) else number
+
+
+def parse_query(text):
+    """Converte a consulta em árvore: ('and'|'or', [filhos]), ('not', filho), ('term', t), ('phrase', [t...])."""
+    tokens = re.findall(r'"[^"]*"|\(|\)|(?<![^\s(])-|[^\s()"]+', text)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        children = [parse_and()]
+        while peek() == 'OR':
+            take()
+            children.append(parse_and())
+        return children[0] if len(children) == 1 else ('or', children)
+
+    def parse_and():
+        children = []
+        while peek() not in (None, ')', 'OR'):
+            node = parse_unary()
+            if node is not None: children.append(node)
+        if not children: raise QueryError(f"Consulta incompleta: {text!r}")
+        return children[0] if len(children) == 1 else ('and', children)
+
+    def parse_unary():
+        token = peek()
+        if token in ('-', 'NOT'):
+            take()
+            return ('not', parse_unary())
+        if token == '(':
+            take()
+            node = parse_or()
+            if take() != ')': raise QueryError(f"Parêntese sem fechamento: {text!r}")
+            return node
+        take()
+        words = normalize_tokens(token.strip('"'))
+        if not words: return None
+        if token.startswith('"') or len(words) > 1:
+            return ('phrase', words) if len(words) > 1 else ('term', words[0])
+        return ('term', words[0])
+
+    try:
+        tree = parse_or()
+    except IndexError:
+        raise QueryError(f"Consulta incompleta: {text!r}")
+    if peek() is not None: raise QueryError(f"Trecho inesperado na consulta: {peek()!r}")
+    return tree
+
+
+class ListingIndex:
+    def __init__(self, db_path=DEFAULT_DB):
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        if db_path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id INTEGER PRIMARY KEY,
+                product_id TEXT UNIQUE NOT NULL,
+                plataforma TEXT, titulo TEXT, link_anuncio TEXT, vendedor TEXT,
+                preco REAL, avaliacao_nota REAL, avaliacao_numero INTEGER,
+                atualizado_em REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_docs_preco ON docs (preco);
+            CREATE INDEX IF NOT EXISTS idx_docs_nota ON docs (avaliacao_nota);
+            CREATE TABLE IF NOT EXISTS postings (
+                token TEXT NOT NULL, doc_id INTEGER NOT NULL, positions TEXT NOT NULL,
+                PRIMARY KEY (token, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc_id);
+            CREATE TABLE IF NOT EXISTS tokens (token TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+        """)
+
+    # ----- Indexação -----
+    def add_records(self, records):
+        """Indexa (ou reindexa) os anúncios pelo ID canônico. Retorna quantos foram indexados."""
+        added = 0
+        with self.conn:
+            for record in records:
+                product_id = canonical_product_id(record.get('link_anuncio'), record.get('plataforma'))
+                if not product_id: continue
+                row = self.conn.execute("SELECT doc_id FROM docs WHERE product_id = ?", (product_id,)).fetchone()
+                if row:
+                    self._remove_postings(row[0])
+                values = (record.get('plataforma'), record.get('titulo'), record.get('link_anuncio'), record.get('vendedor'),
+                          _number(record.get('preco')), _number(record.get('avaliacao_nota')),
+                          int(_number(record.get('avaliacao_numero')) or 0), time.time())
+                if row:
+                    doc_id = row[0]
+                    self.conn.execute(
+                        "UPDATE docs SET plataforma = ?, titulo = ?, link_anuncio = ?, vendedor = ?, preco = ?, "
+                        "avaliacao_nota = ?, avaliacao_numero = ?, atualizado_em = ? WHERE doc_id = ?", (*values, doc_id))
+                else:
+                    doc_id = self.conn.execute(
+                        "INSERT INTO docs (product_id, plataforma, titulo, link_anuncio, vendedor, preco, avaliacao_nota, "
+                        "avaliacao_numero, atualizado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (product_id, *values)).lastrowid
+
+                # Título e descrição formam um só texto; a posição do título vem antes
+                text_tokens = normalize_tokens(record.get('titulo')) + [''] + normalize_tokens(record.get('descricao'))
+                positions = {}
+                for i, token in enumerate(text_tokens):
+                    if token: positions.setdefault(token, []).append(i)
+                self.conn.executemany("INSERT INTO postings (token, doc_id, positions) VALUES (?, ?, ?)",
+                                      [(t, doc_id, ' '.join(map(str, p))) for t, p in positions.items()])
+                self.conn.executemany("INSERT INTO tokens (token, df) VALUES (?, 1) ON CONFLICT(token) DO UPDATE SET df = df + 1",
+                                      [(t,) for t in positions])
+                added += 1
+        return added
+
+    def _remove_postings(self, doc_id):
+        self.conn.execute("UPDATE tokens SET df = df - 1 WHERE token IN (SELECT token FROM postings WHERE doc_id = ?)", (doc_id,))
+        self.conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+
+    # ----- Consulta -----
+    def _df(self, token):
+        row = self.conn.execute("SELECT df FROM tokens WHERE token = ?", (token,)).fetchone()
+        return row[0] if row else 0
+
+    def _cost(self, node):
+        """Estimativa do tamanho do resultado, para avaliar primeiro o ramo mais seletivo."""
+        kind = node[0]
+        if kind == 'term': return self._df(node[1])
+        if kind == 'phrase': return min(self._df(t) for t in node[1])
+        if kind == 'and': return min(self._cost(c) for c in node[1])
+        if kind == 'or': return sum(self._cost(c) for c in node[1])
+        return math.inf  # 'not' só restringe, nunca gera candidatos
+
+    def _postings(self, token, candidates=None, positions=True, doc_filter=None):
+        """
+        {doc_id: posições} da palavra, restrito aos candidatos. O cruzamento é feito
+        no SQLite, então só saem do banco as linhas que estão nos candidatos, mesmo
+        para palavras comuns. Sem candidatos, doc_filter (sql, params) aplica os filtros
+        de docs na própria leitura. Com positions=False as posições nem são lidas.
+        """
+        column = 'p.positions' if positions else 'NULL'
+        if candidates is None and doc_filter:
+            rows = self.conn.execute(
+                f"SELECT p.doc_id, {column} FROM postings p JOIN docs ON docs.doc_id = p.doc_id WHERE p.token = ? AND {doc_filter[0]}",
+                [token, *doc_filter[1]])
+        elif candidates is None:
+            rows = self.conn.execute(f"SELECT p.doc_id, {column} FROM postings p WHERE p.token = ?", (token,))
+        elif len(candidates) <= SMALL_CANDIDATE_SET:
+            ids = list(candidates)
+            if not ids: return {}
+            rows = self.conn.execute(
+                f"SELECT p.doc_id, {column} FROM postings p WHERE p.token = ? AND p.doc_id IN ({','.join('?' * len(ids))})",
+                [token, *ids])
+        else:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS candidates (doc_id INTEGER PRIMARY KEY)")
+            self.conn.execute("DELETE FROM candidates")
+            self.conn.executemany("INSERT INTO candidates VALUES (?)", ((d,) for d in candidates))
+            rows = self.conn.execute(
+                f"SELECT p.doc_id, {column} FROM candidates c JOIN postings p ON p.token = ? AND p.doc_id = c.doc_id", (token,))
+        return {doc_id: value for doc_id, value in rows}
+
+    def _evaluate(self, node, candidates=None, doc_filter=None):
+        kind = node[0]
+        if kind == 'term':
+            return set(self._postings(node[1], candidates, positions=False, doc_filter=doc_filter))
+        if kind == 'phrase':
+            words = node[1]
+            order = sorted(range(len(words)), key=lambda i: self._df(words[i]))
+            lists = {}
+            for i in order:
+                lists[i] = self._postings(words[i], candidates, doc_filter=doc_filter)
+                candidates = set(lists[i])
+                if not candidates: return set()
+            matches = set()
+            for doc_id in candidates:
+                starts = {int(p) for p in lists[0][doc_id].split()}
+                for i in range(1, len(words)):
+                    starts &= {int(p) - i for p in lists[i][doc_id].split()}
+                    if not starts: break
+                if starts: matches.add(doc_id)
+            return matches
+        if kind == 'and':
+            positives = sorted((c for c in node[1] if c[0] != 'not'), key=self._cost)
+            negatives = [c for c in node[1] if c[0] == 'not']
+            if not positives and candidates is None:
+                raise QueryError("A consulta precisa de pelo menos uma palavra que não seja negada.")
+            result = candidates
+            for child in positives:
+                result = self._evaluate(child, result, doc_filter)
+                if not result: return set()
+            for child in negatives:
+                result = self._evaluate(child, result)
+            return result
+        if kind == 'or':
+            result = set()
+            for child in node[1]:
+                result |= self._evaluate(child, candidates, doc_filter)
+            return result
+        if kind == 'not':
+            if candidates is None:
+                raise QueryError("A consulta precisa de pelo menos uma palavra que não seja negada.")
+            return set(candidates) - self._evaluate(node[1], candidates)
+        raise QueryError(f"Nó desconhecido: {kind}")
+
+    def _sql_condition(self, node):
+        """Condição SQL sobre docs equivalente à consulta (EXISTS nas listas), ou None se houver frase."""
+        kind = node[0]
+        if kind == 'term':
+            return "EXISTS (SELECT 1 FROM postings p WHERE p.token = ? AND p.doc_id = docs.doc_id)", [node[1]]
+        if kind == 'not':
+            inner = self._sql_condition(node[1])
+            return None if inner is None else (f"NOT {inner[0]}", inner[1])
+        if kind in ('and', 'or'):
+            children = sorted(node[1], key=self._cost) if kind == 'and' else node[1]
+            parts = [self._sql_condition(c) for c in children]
+            if any(part is None for part in parts): return None
+            return f"({f' {kind.upper()} '.join(sql for sql, _ in parts)})", [p for _, params in parts for p in params]
+        return None
+
+    def search(self, query=None, preco_min=None, preco_max=None, nota_min=None, plataforma=None, limit=50):
+        """
+        Busca anúncios pela consulta de texto combinada com filtros de preço,
+        nota mínima e plataforma. Retorna DataFrame ordenado por preço.
+        """
+        filters, params = [], []
+        if preco_min is not None: filters.append("preco >= ?"); params.append(preco_min)
+        if preco_max is not None: filters.append("preco <= ?"); params.append(preco_max)
+        if nota_min is not None: filters.append("avaliacao_nota >= ?"); params.append(nota_min)
+        if plataforma: filters.append("plataforma = ?"); params.append(plataforma)
+        columns = ['product_id', 'plataforma', 'titulo', 'preco', 'avaliacao_nota', 'avaliacao_numero', 'vendedor', 'link_anuncio']
+        select = f"SELECT {', '.join(columns)} FROM docs"
+
+        if query and query.strip():
+            tree = parse_query(query)
+            cost = self._cost(tree)
+            condition = self._sql_condition(tree) if COMMON_QUERY_DOCS <= cost < math.inf else None
+            if condition:
+                # Consulta comum: o SQLite percorre os anúncios em ordem de preço e para no limite
+                sql = select + " WHERE " + ' AND '.join([condition[0], *filters]) + " ORDER BY preco LIMIT ?"
+                return pd.DataFrame(self.conn.execute(sql, [*condition[1], *params, limit]).fetchall(), columns=columns)
+            doc_filter = (' AND '.join(filters), params) if filters else None
+            doc_ids = self._evaluate(tree, doc_filter=doc_filter)
+            if not doc_ids: return pd.DataFrame(columns=columns)
+            # Ids ficam numa tabela temporária para o filtro numérico não depender do limite de parâmetros
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS hits (doc_id INTEGER PRIMARY KEY)")
+            self.conn.execute("DELETE FROM hits")
+            self.conn.executemany("INSERT INTO hits VALUES (?)", [(d,) for d in doc_ids])
+            filters.insert(0, "doc_id IN (SELECT doc_id FROM hits)")
+        sql = select + (" WHERE " + ' AND '.join(filters) if filters else '') + " ORDER BY preco LIMIT ?"
+        return pd.DataFrame(self.conn.execute(sql, [*params, limit]).fetchall(), columns=columns)
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Índice invertido de anúncios (títulos e descrições).")
+    parser.add_argument('--db', default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest='comando', required=True)
+    indexar = sub.add_parser('indexar', help="Adiciona os anúncios de um CSV da coleta ao índice")
+    indexar.add_argument('arquivos', nargs='+')
+    buscar = sub.add_parser('buscar', help='Ex: buscar \'compativel 664 xl tricolor\' --preco-max 80')
+    buscar.add_argument('consulta', nargs='?', default='')
+    buscar.add_argument('--preco-min', type=float)
+    buscar.add_argument('--preco-max', type=float)
+    buscar.add_argument('--nota-min', type=float)
+    buscar.add_argument('--plataforma')
+    buscar.add_argument('--limite', type=int, default=50)
+    args = parser.parse_args()
+
+    index = ListingIndex(args.db)
+    if args.comando == 'indexar':
+        for arquivo in args.arquivos:
+            df = pd.read_csv(arquivo, sep=';')
+            start = time.time()
+            added = index.add_records(df.where(df.notna(), None).to_dict('records'))
+            print(f"{arquivo}: {added} anúncios indexados em {time.time() - start:.1f}s (total no índice: {index.count()})")
+    else:
+        start = time.time()
+        try:
+            results = index.search(args.consulta, args.preco_min, args.preco_max, args.nota_min, args.plataforma, args.limite)
+        except QueryError as e:
+            parser.error(str(e))
+        print(results.to_string(index=False) if len(results) else "Nenhum anúncio encontrado.")
+        print(f"\n{len(results)} resultado(s) em {(time.time() - start) * 1000:.1f} ms")
+    index.close()
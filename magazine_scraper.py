@@ -13,6 +13,7 @@ from selenium.webdriver.common.action_chains import ActionChains
 # ========== Configuração do WebDriver ==========
 
 from driver_config import setup_driver
+from page_guard import ensure_usable_page, check_results_page
 
 # ========== Funções auxiliares ==========
 def clean_price(price_str):
@@ -63,6 +64,9 @@ def search_magalu_and_get_links(search_term, driver, max_links=10):
     url = f"https://www.magazineluiza.com.br/busca/{search_term.replace(' ', '%20')}/"
     driver.get(url)
     time.sleep(random.uniform(4, 6))
+    if not check_results_page(driver, 'magalu', 1):
+        print(f"Nenhum resultado para '{search_term}'.")
+        return []
     simulate_human_behavior(driver)
 
     links = set()
@@ -82,10 +86,88 @@ def search_magalu_and_get_links(search_term, driver, max_links=10):
         print(f"Erro ao coletar links Magalu: {e}")
     return list(links)
 
-def scrape_magalu_product(url, driver):
+# ========== Modo listagem (dados direto dos cards de busca) ==========
+def parse_magalu_card(card):
+    """Extrai um registro parcial de um card de resultado. Campos ausentes no card ficam None."""
+    from scraping import LISTING_FIELDS  # scraping importa este módulo
+    data = dict.fromkeys(LISTING_FIELDS)
+    href = card.get_attribute('href')
+    if not href:
+        links = card.find_elements(By.XPATH, ".//a[@href]")
+        href = links[0].get_attribute('href') if links else None
+    if not href: return None
+    data['link_anuncio'] = href.split('?')[0]
+
+    titles = card.find_elements(By.CSS_SELECTOR, "[data-testid='product-title'], h2, h3")
+    data['titulo'] = titles[0].text.strip() if titles and titles[0].text.strip() else None
+
+    prices = card.find_elements(By.CSS_SELECTOR, "[data-testid='price-value']")
+    if prices: data['preco'] = clean_price(prices[0].text)
+
+    reviews = card.find_elements(By.CSS_SELECTOR, "[data-testid='review'], span[format='score-count']")
+    if reviews:
+        score = reviews[0].text.strip()
+        nota_match = re.search(r'(\d+(?:[\.,]\d+)?)', score)
+        qtd_match = re.search(r'\((\d+)\)', score)
+        data['avaliacao_nota'] = nota_match.group(1).replace(',', '.') if nota_match else None
+        data['avaliacao_numero'] = int(qtd_match.group(1)) if qtd_match else None
+
+    sellers = card.find_elements(By.CSS_SELECTOR, "[data-testid='seller-info-label'], [data-testid='seller-name']")
+    if sellers and sellers[0].text.strip():
+        data['vendedor'] = sellers[0].text.strip().replace("Vendido por", "").strip()
+    return data
+
+def fetch_magalu_results_page(search_term, driver, cursor=None):
+    """
+    Lê uma única página de resultados. cursor é o número da página (None = primeira).
+    Retorna (registros, próximo cursor) — o próximo cursor é None no fim da paginação.
+    """
+    page = cursor or 1
+    base_url = f"https://www.magazineluiza.com.br/busca/{search_term.replace(' ', '%20')}/"
+    driver.get(base_url if page == 1 else f"{base_url}?page={page}")
+    time.sleep(random.uniform(3, 5))
+    if not check_results_page(driver, 'magalu', page): return [], None
+    try:
+        cards = WebDriverWait(driver, 15).until(
+            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "[data-testid='product-card-container']"))
+        )
+    except Exception:
+        return [], None  # sem resultados nesta página: fim da paginação
+
+    records = []
+    for card in cards:
+        try: record = parse_magalu_card(card)
+        except Exception: continue
+        if record: records.append(record)
+    return records, (page + 1 if records else None)
+
+def search_magalu_listings(search_term, driver, max_items=50, max_pages=5):
+    """
+    Versão "modo listagem" da busca: devolve registros parciais (título, preço,
+    avaliação, link) lidos dos cards de resultado, seguindo a paginação.
+    """
+    records, seen, cursor = [], set(), None
+    for _ in range(max_pages):
+        page_records, cursor = fetch_magalu_results_page(search_term, driver, cursor)
+        new_on_page = 0
+        for record in page_records:
+            if record['link_anuncio'] in seen: continue
+            seen.add(record['link_anuncio'])
+            records.append(record)
+            new_on_page += 1
+            if len(records) >= max_items: return records
+        if new_on_page == 0 or cursor is None: break
+    return records
+
+def scrape_magalu_product(url, driver, include_description=True):
     driver.get(url)
     simulate_human_behavior(driver)
     time.sleep(random.uniform(3, 5))
+    return extract_magalu_product(url, driver, include_description)
+
+def extract_magalu_product(url, driver, include_description=True):
+    """Extrai os campos de uma página de produto que já está carregada na aba atual."""
+    ensure_usable_page(driver, 'magalu', 'produto')
     wait = WebDriverWait(driver, 15)
     data = {'link_anuncio': url}
 
@@ -108,12 +190,25 @@ def scrape_magalu_product(url, driver):
         data['avaliacao_numero'] = int(qtd_match.group(1)) if qtd_match else None
     except: data['avaliacao_nota'], data['avaliacao_numero'] = None, None
 
+    data['descricao'] = extract_magalu_description(driver) if include_description else None
+
+    return data
+
+def extract_magalu_description(driver):
     try:
         desc_el = driver.find_element(By.CSS_SELECTOR, "div[data-testid='product-detail-description']")
-        data['descricao'] = re.sub(r'\s+', ' ', desc_el.text).strip()
-    except: data['descricao'] = None
+        return re.sub(r'\s+', ' ', desc_el.text).strip()
+    except: return None
 
-    return data
+def scrape_magalu_description(url, driver):
+    """Abre o produto e coleta apenas a descrição (etapa de enriquecimento adiada)."""
+    driver.get(url)
+    time.sleep(random.uniform(3, 5))
+    ensure_usable_page(driver, 'magalu', 'produto')
+    try:
+        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div[data-testid='product-detail-description']")))
+    except Exception: pass
+    return extract_magalu_description(driver)
 
 # ========== Salvamento ==========
 def save_to_csv(data, filename):
@@ -12,6 +12,8 @@ from webdriver_manager.chrome import ChromeDriverManager
 # --- Configuração do WebDriver ---
 
 from driver_config import setup_driver
+from browser_profiles import consent_stored, mark_consent, record_banner_skip, record_banner_time
+from page_guard import ensure_usable_page, check_results_page, UnusablePageError
 
 
 # --- Funções de Limpeza e Extração de Dados Específicos ---
@@ -82,12 +84,130 @@ def extract_review_count(count_text):
     match = re.search(r'(\d+)', count_text) 
     return int(match.group(1)) if match else None
 
+# --- Extração da Descrição (com tentativa de expandir) ---
+def extract_mercado_livre_description(driver, wait):
+    """
+    Extrai a descrição da página de produto já carregada. É a parte mais cara da
+    página (banner de cookies, clique em "Ver descrição completa" e várias pausas),
+    por isso pode ser pulada na coleta de preços e feita depois (description_stage.py).
+    """
+    descricao = None
+    try:
+        # Tenta fechar overlays/cookies ANTES de interagir com "Ver descrição"
+        cookie_banner_interceptor_xpath = "//p[@data-testid='text:main-text' and contains(@class, 'cookie-consent-banner-opt-out__message')]"
+        cookie_close_xpaths = [
+            "//button[@data-testid='cookie-banner-close-button']",
+            "//div[contains(@class,'cookie-consent-banner-actions')]//button[contains(@class,'andes-button--loud')]",
+            "//button[contains(translate(normalize-space(text()), 'ACEPTRÁÉÍÓÚ', 'aceptráéíóú'), 'aceitar') and (contains(@class, 'cookie') or contains(@class, 'consent'))]",
+            "//button[contains(translate(normalize-space(text()), 'ENTDIÁÉÍÓÚ', 'entdiáéíóú'), 'entendi') and (contains(@class, 'cookie') or contains(@class, 'consent'))]",
+            "//div[contains(@class, 'cookie-consent')]//button[contains(translate(normalize-space(text()), 'FECHRÁÉÍÓÚ', 'fechráéíóú'), 'fechar') or contains(@aria-label, 'Fechar') or contains(@class, 'close')]",
+        ]
+        banner_closed_this_time = False
+        if consent_stored(driver):
+            # Perfil persistente já tem o consentimento salvo: não procura o banner
+            record_banner_skip(driver)
+        else:
+            banner_start = time.time()
+            for ck_xpath_idx, ck_xpath in enumerate(cookie_close_xpaths):
+                try:
+                    cookie_buttons = driver.find_elements(By.XPATH, ck_xpath)
+                    if cookie_buttons and cookie_buttons[0].is_displayed() and cookie_buttons[0].is_enabled():
+                        # print(f"Tentando fechar overlay/cookie com XPath {ck_xpath_idx+1}...") # Debug
+                        driver.execute_script("arguments[0].click();", cookie_buttons[0])
+                        time.sleep(random.uniform(1.0, 1.5)) 
+                        # print("Possível overlay/cookie fechado.") # Debug
+                        try: 
+                            WebDriverWait(driver, 2).until_not(EC.visibility_of_element_located((By.XPATH, cookie_banner_interceptor_xpath)))
+                            # print("Banner de cookie que interceptava não está mais visível.") # Debug
+                            banner_closed_this_time = True; break 
+                        except: pass 
+                except Exception: continue
+            if banner_closed_this_time: mark_consent(driver)
+            record_banner_time(driver, time.time() - banner_start)
+        # if not banner_closed_this_time: print("Não foi possível confirmar o fechamento do banner de cookie interceptador ou ele não estava presente.") # Debug
+        
+        desc_container_xpath = "//div[contains(@class, 'ui-pdp-description__content')] | //div[contains(@class, 'ui-pdp-description') and not(contains(@class,'ui-pdp-description__title'))][normalize-space()]"
+        
+        # XPath para o link "Ver descrição completa" baseado no HTML fornecido pelo usuário
+        see_more_xpath_specific = "//a[@data-testid='action-collapsable-target' and contains(@class, 'ui-pdp-collapsable__action') and (contains(translate(normalize-space(@title), 'VERDESCÃOCOMPLTÁÉÍÓÚ', 'verdescãocompltáéíóú'), 'ver descrição completa') or contains(translate(normalize-space(text()), 'VERDESCÃOCOMPLTÁÉÍÓÚ', 'verdescãocompltáéíóú'), 'ver descrição completa'))]"
+        
+        see_more_elements = []
+        try: 
+            # Espera que o elemento esteja presente e potencialmente clicável
+            see_more_elements = WebDriverWait(driver, 5).until(
+                EC.presence_of_all_elements_located((By.XPATH, see_more_xpath_specific))
+            )
+        except Exception: 
+            # print("Botão/link 'Ver descrição completa' (específico) não encontrado inicialmente ou não pronto.") # Debug
+            pass 
+
+        if see_more_elements and see_more_elements[0].is_displayed() and see_more_elements[0].is_enabled():
+            # print("Botão/link 'Ver descrição completa' encontrado. Tentando clicar...") # Debug
+            clicked_successfully = False
+            try:
+                # Espera o elemento ser clicável antes de tentar a interação
+                button_to_click = wait.until(EC.element_to_be_clickable((By.XPATH, see_more_xpath_specific)))
+                driver.execute_script("arguments[0].scrollIntoView({behavior: 'auto', block: 'center'});", button_to_click)
+                time.sleep(0.7) # Pausa após scroll
+                # Tenta clicar com JavaScript primeiro, pois pode ser mais robusto contra interceptações
+                driver.execute_script("arguments[0].click();", button_to_click)
+                # print("'Ver descrição completa' clicado via JavaScript.") # Debug
+                time.sleep(random.uniform(1.5, 2.5)) # Espera para o conteúdo carregar/expandir
+                clicked_successfully = True
+            except Exception as e_js_click: 
+                print(f"Erro ao clicar em 'Ver descrição completa' (JS): {e_js_click}. Tentando clique Selenium.")
+                try: 
+                    # Fallback para clique normal do Selenium se o JS falhar
+                    button_to_click = wait.until(EC.element_to_be_clickable((By.XPATH, see_more_xpath_specific))) # Re-localiza para garantir estado
+                    button_to_click.click()
+                    # print("'Ver descrição completa' clicado via Selenium.") # Debug
+                    time.sleep(random.uniform(1.5, 2.5))
+                    clicked_successfully = True
+                except Exception as e_selenium_click:
+                     print(f"Erro ao clicar em 'Ver descrição completa' (Selenium): {e_selenium_click}")
+            
+            # if not clicked_successfully: print("Falha ao clicar no botão 'Ver descrição completa'.") # Debug
+        # else:  # Debug
+            # print("Botão/link 'Ver descrição completa' (específico) não encontrado ou não interagível.")
+            
+        # Após a tentativa de clique (ou se não havia botão), coleta a descrição
+        # É importante re-localizar o container da descrição pois seu conteúdo pode ter mudado
+        desc_container_elements = driver.find_elements(By.XPATH, desc_container_xpath)
+        if desc_container_elements:
+            descricao_bruta = desc_container_elements[0].get_attribute('innerText').strip()
+            # Remove quebras de linha e substitui por um espaço, depois remove espaços múltiplos
+            descricao = re.sub(r'\s+', ' ', descricao_bruta.replace('\n', ' ').replace('\r', ' ')).strip()
+        else:
+            # print("Container da descrição não encontrado.") # Debug
+            descricao = None
+
+    except Exception as e_desc: 
+        print(f"Erro Descrição: {type(e_desc).__name__} - {e_desc}")
+        descricao = None
+    return descricao
+
+def scrape_mercado_livre_description(url, driver):
+    """Abre o produto e coleta apenas a descrição (etapa de enriquecimento adiada)."""
+    driver.get(url)
+    time.sleep(random.uniform(2.5, 4.0))
+    ensure_usable_page(driver, 'mercado_livre', 'produto')
+    return extract_mercado_livre_description(driver, WebDriverWait(driver, 20))
+
 # --- Função Principal de Scraping da Página do Produto ---
-def scrape_mercado_livre_product(url, driver):
-    """Coleta dados de uma página de produto específica do Mercado Livre."""
+def scrape_mercado_livre_product(url, driver, include_description=True):
+    """
+    Coleta dados de uma página de produto específica do Mercado Livre.
+    Com include_description=False a descrição não é expandida nem coletada.
+    """
     driver.get(url)
     # Pausa aleatória para simular comportamento humano e permitir carregamento
     time.sleep(random.uniform(3.5, 5.5)) 
+    return extract_mercado_livre_product(url, driver, include_description)
+
+def extract_mercado_livre_product(url, driver, include_description=True):
+    """Extrai os dados de uma página de produto que já está carregada na aba atual."""
+    # Captcha/login/404 são detectados aqui, antes de esperar o timeout de cada campo
+    ensure_usable_page(driver, 'mercado_livre', 'produto')
     wait = WebDriverWait(driver, 20) # Tempo máximo de espera para elementos
 
     data = {'link_anuncio': url} # Inicializa dicionário de dados com o link
@@ -245,94 +365,9 @@ def scrape_mercado_livre_product(url, driver):
                     if extracted_count is not None: data['avaliacao_numero'] = extracted_count; break
     except Exception as e: print(f"Erro Avaliações: {type(e).__name__}")
 
-    # --- Extração da Descrição (com tentativa de expandir) ---
-    data['descricao'] = None
-    try:
-        # Tenta fechar overlays/cookies ANTES de interagir com "Ver descrição"
-        cookie_banner_interceptor_xpath = "//p[@data-testid='text:main-text' and contains(@class, 'cookie-consent-banner-opt-out__message')]"
-        cookie_close_xpaths = [
-            "//button[@data-testid='cookie-banner-close-button']",
-            "//div[contains(@class,'cookie-consent-banner-actions')]//button[contains(@class,'andes-button--loud')]",
-            "//button[contains(translate(normalize-space(text()), 'ACEPTRÁÉÍÓÚ', 'aceptráéíóú'), 'aceitar') and (contains(@class, 'cookie') or contains(@class, 'consent'))]",
-            "//button[contains(translate(normalize-space(text()), 'ENTDIÁÉÍÓÚ', 'entdiáéíóú'), 'entendi') and (contains(@class, 'cookie') or contains(@class, 'consent'))]",
-            "//div[contains(@class, 'cookie-consent')]//button[contains(translate(normalize-space(text()), 'FECHRÁÉÍÓÚ', 'fechráéíóú'), 'fechar') or contains(@aria-label, 'Fechar') or contains(@class, 'close')]",
-        ]
-        banner_closed_this_time = False
-        for ck_xpath_idx, ck_xpath in enumerate(cookie_close_xpaths):
-            try:
-                cookie_buttons = driver.find_elements(By.XPATH, ck_xpath)
-                if cookie_buttons and cookie_buttons[0].is_displayed() and cookie_buttons[0].is_enabled():
-                    # print(f"Tentando fechar overlay/cookie com XPath {ck_xpath_idx+1}...") # Debug
-                    driver.execute_script("arguments[0].click();", cookie_buttons[0])
-                    time.sleep(random.uniform(1.0, 1.5)) 
-                    # print("Possível overlay/cookie fechado.") # Debug
-                    try: 
-                        WebDriverWait(driver, 2).until_not(EC.visibility_of_element_located((By.XPATH, cookie_banner_interceptor_xpath)))
-                        # print("Banner de cookie que interceptava não está mais visível.") # Debug
-                        banner_closed_this_time = True; break 
-                    except: pass 
-            except Exception: continue
-        # if not banner_closed_this_time: print("Não foi possível confirmar o fechamento do banner de cookie interceptador ou ele não estava presente.") # Debug
-        
-        desc_container_xpath = "//div[contains(@class, 'ui-pdp-description__content')] | //div[contains(@class, 'ui-pdp-description') and not(contains(@class,'ui-pdp-description__title'))][normalize-space()]"
-        
-        # XPath para o link "Ver descrição completa" baseado no HTML fornecido pelo usuário
-        see_more_xpath_specific = "//a[@data-testid='action-collapsable-target' and contains(@class, 'ui-pdp-collapsable__action') and (contains(translate(normalize-space(@title), 'VERDESCÃOCOMPLTÁÉÍÓÚ', 'verdescãocompltáéíóú'), 'ver descrição completa') or contains(translate(normalize-space(text()), 'VERDESCÃOCOMPLTÁÉÍÓÚ', 'verdescãocompltáéíóú'), 'ver descrição completa'))]"
-        
-        see_more_elements = []
-        try: 
-            # Espera que o elemento esteja presente e potencialmente clicável
-            see_more_elements = WebDriverWait(driver, 5).until(
-                EC.presence_of_all_elements_located((By.XPATH, see_more_xpath_specific))
-            )
-        except Exception: 
-            # print("Botão/link 'Ver descrição completa' (específico) não encontrado inicialmente ou não pronto.") # Debug
-            pass 
-
-        if see_more_elements and see_more_elements[0].is_displayed() and see_more_elements[0].is_enabled():
-            # print("Botão/link 'Ver descrição completa' encontrado. Tentando clicar...") # Debug
-            clicked_successfully = False
-            try:
-                # Espera o elemento ser clicável antes de tentar a interação
-                button_to_click = wait.until(EC.element_to_be_clickable((By.XPATH, see_more_xpath_specific)))
-                driver.execute_script("arguments[0].scrollIntoView({behavior: 'auto', block: 'center'});", button_to_click)
-                time.sleep(0.7) # Pausa após scroll
-                # Tenta clicar com JavaScript primeiro, pois pode ser mais robusto contra interceptações
-                driver.execute_script("arguments[0].click();", button_to_click)
-                # print("'Ver descrição completa' clicado via JavaScript.") # Debug
-                time.sleep(random.uniform(1.5, 2.5)) # Espera para o conteúdo carregar/expandir
-                clicked_successfully = True
-            except Exception as e_js_click: 
-                print(f"Erro ao clicar em 'Ver descrição completa' (JS): {e_js_click}. Tentando clique Selenium.")
-                try: 
-                    # Fallback para clique normal do Selenium se o JS falhar
-                    button_to_click = wait.until(EC.element_to_be_clickable((By.XPATH, see_more_xpath_specific))) # Re-localiza para garantir estado
-                    button_to_click.click()
-                    # print("'Ver descrição completa' clicado via Selenium.") # Debug
-                    time.sleep(random.uniform(1.5, 2.5))
-                    clicked_successfully = True
-                except Exception as e_selenium_click:
-                     print(f"Erro ao clicar em 'Ver descrição completa' (Selenium): {e_selenium_click}")
-            
-            # if not clicked_successfully: print("Falha ao clicar no botão 'Ver descrição completa'.") # Debug
-        # else:  # Debug
-            # print("Botão/link 'Ver descrição completa' (específico) não encontrado ou não interagível.")
-            
-        # Após a tentativa de clique (ou se não havia botão), coleta a descrição
-        # É importante re-localizar o container da descrição pois seu conteúdo pode ter mudado
-        desc_container_elements = driver.find_elements(By.XPATH, desc_container_xpath)
-        if desc_container_elements:
-            descricao_bruta = desc_container_elements[0].get_attribute('innerText').strip()
-            # Remove quebras de linha e substitui por um espaço, depois remove espaços múltiplos
-            data['descricao'] = re.sub(r'\s+', ' ', descricao_bruta.replace('\n', ' ').replace('\r', ' ')).strip()
-        else:
-            # print("Container da descrição não encontrado.") # Debug
-            data['descricao'] = None
+    # --- Extração da Descrição (opcional) ---
+    data['descricao'] = extract_mercado_livre_description(driver, wait) if include_description else None
 
-    except Exception as e_desc: 
-        print(f"Erro Descrição: {type(e_desc).__name__} - {e_desc}")
-        data['descricao'] = None
-        
     # 'dados_extras' não é mais coletado
     data['dados_extras'] = None 
     return data
@@ -346,13 +381,23 @@ def search_mercado_livre_and_get_links(search_term, driver, max_links=10):
     driver.get(search_url)
     time.sleep(random.uniform(2, 4))
 
-    try:
-        WebDriverWait(driver, 7).until(EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Entendi') or contains(@data-testid, 'action:understood-button') or @data-testid='cookie-banner-close-button'] | //button[contains(@class, 'cookie-consent-banner__cta')]"))).click()
-        # print("Popup de cookie fechado.") # Debug
-        time.sleep(random.uniform(1, 2))
-    except Exception: 
-        # print("Nenhum popup de cookie manipulado.") # Debug
-        pass
+    if consent_stored(driver):
+        record_banner_skip(driver) # Consentimento já salvo no perfil: evita esperar até 7 s pelo "Entendi"
+    else:
+        banner_start = time.time()
+        try:
+            WebDriverWait(driver, 7).until(EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Entendi') or contains(@data-testid, 'action:understood-button') or @data-testid='cookie-banner-close-button'] | //button[contains(@class, 'cookie-consent-banner__cta')]"))).click()
+            # print("Popup de cookie fechado.") # Debug
+            time.sleep(random.uniform(1, 2))
+            mark_consent(driver)
+        except Exception: 
+            # print("Nenhum popup de cookie manipulado.") # Debug
+            pass
+        record_banner_time(driver, time.time() - banner_start)
+
+    if not check_results_page(driver, 'mercado_livre', 1):
+        print(f"Nenhum resultado para '{search_term}'.")
+        return []
 
 
     try:
@@ -414,6 +459,105 @@ def search_mercado_livre_and_get_links(search_term, driver, max_links=10):
     # print(f"Coletados {len(product_links)} links de produtos únicos.") # Debug
     return product_links[:max_links]
 
+# --- Modo listagem: registros parciais lidos direto dos cards da busca ---
+def parse_mercado_livre_card(card):
+    """Extrai título, preço, avaliação, vendedor e link de um card de resultado (layouts poly-card e antigo)."""
+    from scraping import LISTING_FIELDS  # scraping importa este módulo
+    data = dict.fromkeys(LISTING_FIELDS)
+
+    link_elements = card.find_elements(By.CSS_SELECTOR, "a.poly-component__title, h2 a, h3 a, a.ui-search-link, a.ui-search-item__group__element")
+    href = link_elements[0].get_attribute('href') if link_elements else None
+    if not href or ("/MLB-" not in href and "/p/MLB" not in href) or "click?" in href:
+        return None # Anúncios patrocinados com redirecionamento e links inválidos são ignorados
+    clean_href = href.split('#')[0]
+    if "/MLB-" in clean_href and "?" in clean_href: clean_href = clean_href.split('?')[0]
+    data['link_anuncio'] = clean_href
+
+    title_elements = card.find_elements(By.CSS_SELECTOR, ".poly-component__title, h2.ui-search-item__title, h2, h3")
+    for el in title_elements:
+        if el.text.strip(): data['titulo'] = el.text.strip(); break
+
+    # Preço atual (ignora o preço riscado "--previous")
+    price_elements = card.find_elements(By.CSS_SELECTOR, ".poly-price__current .andes-money-amount, .ui-search-price__second-line .andes-money-amount, .andes-money-amount:not(.andes-money-amount--previous)")
+    if price_elements:
+        aria = price_elements[0].get_attribute('aria-label')
+        parsed = clean_price(aria) if aria else None
+        if not isinstance(parsed, float):
+            fraction = price_elements[0].find_elements(By.CSS_SELECTOR, ".andes-money-amount__fraction")
+            cents = price_elements[0].find_elements(By.CSS_SELECTOR, ".andes-money-amount__cents")
+            raw = fraction[0].text.strip() if fraction else ""
+            if raw and cents and cents[0].text.strip(): raw = f"{raw},{cents[0].text.strip()}"
+            parsed = clean_price(raw) if raw else None
+        data['preco'] = parsed if isinstance(parsed, float) else None
+
+    rating_elements = card.find_elements(By.CSS_SELECTOR, ".poly-reviews__rating, .ui-search-reviews__rating-number")
+    if rating_elements and re.match(r"[\d\.,]+", rating_elements[0].text.strip()):
+        data['avaliacao_nota'] = rating_elements[0].text.strip()
+    count_elements = card.find_elements(By.CSS_SELECTOR, ".poly-reviews__total, .ui-search-reviews__amount")
+    if count_elements: data['avaliacao_numero'] = extract_review_count(count_elements[0].text.strip())
+
+    # Selo do vendedor: "Por HP", "Loja oficial HP", etc.
+    seller_elements = card.find_elements(By.CSS_SELECTOR, ".poly-component__seller, .ui-search-official-store-label")
+    if seller_elements and seller_elements[0].text.strip():
+        seller = re.sub(r'^(por|vendido por|loja oficial)\s+', '', seller_elements[0].text.strip(), flags=re.IGNORECASE)
+        data['vendedor'] = seller.strip() or None
+    return data
+
+def fetch_mercado_livre_results_page(search_term, driver, cursor=None):
+    """
+    Lê uma única página de resultados. cursor é a URL da página (None = primeira).
+    Retorna (registros, próximo cursor) — a URL do botão "Seguinte" ou None no fim.
+    """
+    first_page = cursor is None
+    url = cursor or f"https://lista.mercadolivre.com.br/{search_term.replace(' ', '-')}"
+    driver.get(url)
+    time.sleep(random.uniform(2, 4))
+    if not check_results_page(driver, 'mercado_livre', 1 if first_page else 2): return [], None
+    if first_page and consent_stored(driver):
+        record_banner_skip(driver)
+    elif first_page:
+        banner_start = time.time()
+        try:
+            WebDriverWait(driver, 5).until(EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Entendi') or @data-testid='cookie-banner-close-button'] | //button[contains(@class, 'cookie-consent-banner__cta')]"))).click()
+            mark_consent(driver)
+        except Exception: pass
+        record_banner_time(driver, time.time() - banner_start)
+    try:
+        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.XPATH, "//ol[contains(@class, 'ui-search-layout')] | //section[contains(@class, 'ui-search-results')]")))
+    except Exception:
+        print(f"Container de resultados não encontrado em {url}."); return [], None
+
+    # Um scroll até o fim carrega as imagens/cards preguiçosos
+    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    time.sleep(random.uniform(1, 2))
+
+    records = []
+    for card in driver.find_elements(By.CSS_SELECTOR, "li.ui-search-layout__item"):
+        try: record = parse_mercado_livre_card(card)
+        except Exception: continue
+        if record: records.append(record)
+
+    next_buttons = driver.find_elements(By.CSS_SELECTOR, "li.andes-pagination__button--next a[href]")
+    return records, (next_buttons[0].get_attribute('href') if next_buttons else None)
+
+def search_mercado_livre_listings(search_term, driver, max_items=50, max_pages=5):
+    """
+    Versão "modo listagem" da busca: em vez de só os links, devolve registros
+    parciais lidos dos cards e segue o botão "Seguinte" da paginação.
+    """
+    records, seen, cursor = [], set(), None
+    for _ in range(max_pages):
+        page_records, cursor = fetch_mercado_livre_results_page(search_term, driver, cursor)
+        new_on_page = 0
+        for record in page_records:
+            if record['link_anuncio'] in seen: continue
+            seen.add(record['link_anuncio'])
+            records.append(record)
+            new_on_page += 1
+            if len(records) >= max_items: return records
+        if new_on_page == 0 or cursor is None: break
+    return records
+
 def save_to_csv(data_list, filename="mercado_livre_produtos.csv"):
     if not data_list: 
         print("Nenhum dado para salvar.")
@@ -519,6 +663,9 @@ if __name__ == '__main__':
                     if key == 'dados_extras': continue # Não printa 'dados_extras' pois foi removido
                     print(f"  {key}: {value}")
 
+            except UnusablePageError as e_page:
+                # Captcha/login/404: não gera linha "ERRO NA COLETA"
+                print(f"Página descartada: {e_page}")
             except Exception as e_product_scrape:
                 print(f"Erro CRÍTICO ao processar o produto {url}: {type(e_product_scrape).__name__} - {e_product_scrape}")
                 all_product_data_across_searches.append({'link_anuncio': url, 'titulo': 'ERRO NA COLETA', 'preco': None, 
@@ -0,0 +1,104 @@
+import math
+import sqlite3
+import time
+
+import numpy as np
+
+from analytics_cube import stale_batches
+from quantile_sketch import QuantileSketch
+
+# ========== Preços fora da curva por grupo ==========
+# Um cartucho preto de R$40 e um kit XL de R$300 não são a mesma população,
+# então os limites são calculados por (modelo, capacidade, compatibilidade).
+# Cada grupo guarda um sketch de quantis dos preços (tamanho limitado, somado
+# lote a lote), e o limite é a cerca de Tukey sobre o log do preço:
+# [Q1 - k*IQR, Q3 + k*IQR]. Grupos com poucos anúncios usam o limite do
+# modelo inteiro ou, na falta dele, o de todos os suprimentos. Atributo
+# ausente vira UNKNOWN, um valor como outro qualquer: se virasse o curinga
+# ANY, o preço entraria duas vezes no grupo geral e criaria grupos falsos
+# como (*, XL, Original).
+
+DEFAULT_DB = 'outliers_precos.sqlite'
+GROUP_COLUMNS = ['modelo_cartucho', 'capacidade', 'compatibilidade']
+ANY = '*'
+UNKNOWN = '?'
+FENCE_K = 1.5
+MIN_GROUP_SIZE = 10
+
+
+def group_levels(key):
+    """Do grupo mais específico ao mais geral: (662, XL, Original) -> (662, *, *) -> (*, *, *)."""
+    modelo = key[0]
+    return [tuple(key), (modelo,) + (ANY,) * (len(key) - 1), (ANY,) * len(key)]
+
+
+class PriceOutlierDetector:
+    def __init__(self, db_path=DEFAULT_DB, fence_k=FENCE_K, min_group_size=MIN_GROUP_SIZE):
+        self.fence_k = fence_k
+        self.min_group_size = min_group_size
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS group_stats (grupo TEXT PRIMARY KEY, sketch TEXT NOT NULL, atualizado_em REAL);
+            CREATE TABLE IF NOT EXISTS batches (batch_id TEXT PRIMARY KEY, rows INTEGER, loaded_at REAL);
+        """)
+        self.sketches = {tuple(grupo.split('|')): QuantileSketch.from_json(sketch)
+                         for grupo, sketch in self.conn.execute("SELECT grupo, sketch FROM group_stats")}
+
+    def update(self, df, batch_id=None):
+        """Soma os preços de um lote aos sketches de cada nível de grupo. Retorna quantos grupos mudaram."""
+        if batch_id and self.conn.execute("SELECT 1 FROM batches WHERE batch_id = ?", (batch_id,)).fetchone():
+            return 0
+        if batch_id and stale_batches(self.conn, batch_id):
+            print(f"Lote {batch_id[:10]} já entrou nos limites de preço com outra versão; rode com --reconstruir.")
+            return 0
+        touched = set()
+        rows = df.dropna(subset=['preco'])
+        for key, precos in rows.groupby([rows[c].fillna(UNKNOWN).astype(str) for c in GROUP_COLUMNS])['preco']:
+            for level in group_levels(key):
+                sketch = self.sketches.setdefault(level, QuantileSketch())
+                for preco in precos:
+                    sketch.add(float(preco))
+                touched.add(level)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO group_stats (grupo, sketch, atualizado_em) VALUES (?, ?, ?)",
+                [('|'.join(level), self.sketches[level].to_json(), time.time()) for level in touched])
+            if batch_id:
+                self.conn.execute("INSERT INTO batches (batch_id, rows, loaded_at) VALUES (?, ?, ?)",
+                                  (batch_id, len(rows), time.time()))
+        return len(touched)
+
+    def fences(self, key):
+        """Limites (inferior, superior) de preço para o grupo e o nível de grupo usado; (None, None, None) sem dados."""
+        for level in group_levels(key):
+            sketch = self.sketches.get(level)
+            if sketch is None or sketch.count < self.min_group_size: continue
+            q1, q3 = sketch.quantile(0.25), sketch.quantile(0.75)
+            if not q1 or q1 <= 0: continue
+            log_q1, log_q3 = math.log(q1), math.log(q3)
+            spread = self.fence_k * (log_q3 - log_q1)
+            return math.exp(log_q1 - spread), math.exp(log_q3 + spread), '|'.join(level)
+        return None, None, None
+
+    def flag(self, df):
+        """Adiciona preco_outlier, preco_limite_inf, preco_limite_sup e grupo_referencia ao DataFrame."""
+        keys = zip(*(df[c].fillna(UNKNOWN).astype(str) for c in GROUP_COLUMNS))
+        cache = {}
+        limits = [cache[k] if k in cache else cache.setdefault(k, self.fences(k)) for k in keys]
+        df['preco_limite_inf'] = [low for low, _, _ in limits]
+        df['preco_limite_sup'] = [high for _, high, _ in limits]
+        df['grupo_referencia'] = [level for _, _, level in limits]
+        low = df['preco_limite_inf'].astype(float)
+        high = df['preco_limite_sup'].astype(float)
+        df['preco_outlier'] = np.where(low.notna(), (df['preco'] < low) | (df['preco'] > high), False)
+        return df
+
+    def reset(self):
+        """Apaga os sketches e lotes de todos os grupos."""
+        with self.conn:
+            self.conn.execute("DELETE FROM group_stats")
+            self.conn.execute("DELETE FROM batches")
+        self.sketches = {}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,109 @@
+from selenium.webdriver.common.by import By
+
+# ========== Classificação da página após a navegação ==========
+# Quando a plataforma devolve captcha, parede de login ou busca vazia, não
+# adianta esperar cada campo estourar o timeout: a página é classificada logo
+# depois do driver.get() e o scraper desiste na hora.
+
+NORMAL = 'normal'
+BLOCKED = 'bloqueado'
+CAPTCHA = 'captcha'
+NOT_FOUND = 'nao_encontrado'
+EMPTY_SEARCH = 'busca_vazia'
+
+# Classes que indicam que a plataforma está barrando o robô (contam para o circuit breaker).
+# Busca vazia não entra: um termo sem resultados é legítimo e vira lista vazia.
+BLOCKING_CLASSES = {BLOCKED, CAPTCHA}
+
+CAPTCHA_MARKERS = [
+    'g-recaptcha', 'recaptcha/api', 'hcaptcha', 'px-captcha', 'captcha-delivery',
+    'não sou um robô', 'nao sou um robo', 'confirme que você é humano', 'verifique se você é humano',
+]
+BLOCKED_MARKERS = [
+    'access denied', 'acesso negado', 'request blocked', 'too many requests', 'você foi bloqueado',
+    'attention required', 'unusual traffic', 'tráfego incomum', 'para continuar, acesse sua conta',
+]
+BLOCKED_URL_MARKERS = [
+    '/jms/mlb/lgz/login', '/gz/account-verification', 'mercadolivre.com.br/login',
+    'magazineluiza.com.br/login', '/security/challenge',
+]
+NOT_FOUND_MARKERS = [
+    'página não encontrada', 'pagina nao encontrada', 'esta página não existe', 'parece que esta página não existe',
+    'produto não encontrado', 'anúncio não existe', 'o anúncio que você procura', 'erro 404',
+]
+EMPTY_SEARCH_MARKERS = [
+    'não há anúncios que correspondam à sua busca', 'nao ha anuncios que correspondam',
+    'não encontramos resultados', 'sua busca não encontrou', 'não encontramos nenhum resultado',
+    'ui-search-rescue',
+]
+
+# Elementos que confirmam que a página é mesmo o que esperávamos
+EXPECTED_SELECTORS = {
+    ('magalu', 'produto'): "h1[data-testid='heading-product-title']",
+    ('magalu', 'busca'): "[data-testid='product-card-container']",
+    ('mercado_livre', 'produto'): "h1.ui-pdp-title",
+    ('mercado_livre', 'busca'): "li.ui-search-layout__item, ol.ui-search-layout",
+}
+
+
+class UnusablePageError(Exception):
+    """A página carregada não é uma página de produto/busca utilizável."""
+
+    def __init__(self, page_class, url=None):
+        self.page_class = page_class
+        self.url = url
+        super().__init__(f"Página classificada como '{page_class}': {url}")
+
+    @property
+    def is_block(self):
+        return self.page_class in BLOCKING_CLASSES
+
+
+def classify_page(driver, plataforma, kind='produto'):
+    """Classifica a página atual como normal, bloqueado, captcha, nao_encontrado ou busca_vazia."""
+    expected = EXPECTED_SELECTORS.get((plataforma, kind))
+    try:
+        if expected and driver.find_elements(By.CSS_SELECTOR, expected):
+            return NORMAL
+        url = (driver.current_url or '').lower()
+        title = (driver.title or '').lower()
+        # innerText limitado: bem mais barato que percorrer o page_source inteiro
+        text = (driver.execute_script("return document.body ? document.body.innerText.slice(0, 6000) : ''") or '').lower()
+        html_head = (driver.execute_script("return document.documentElement ? document.documentElement.outerHTML.slice(0, 60000) : ''") or '').lower()
+    except Exception:
+        return NORMAL  # na dúvida não interrompe: os campos vão falhar sozinhos
+
+    if any(m in url for m in BLOCKED_URL_MARKERS):
+        return BLOCKED
+    if 'captcha' in title or any(m in html_head or m in text for m in CAPTCHA_MARKERS):
+        return CAPTCHA
+    if title.startswith('403') or any(m in title or m in text for m in BLOCKED_MARKERS):
+        return BLOCKED
+    if kind == 'busca' and any(m in text or m in html_head for m in EMPTY_SEARCH_MARKERS):
+        return EMPTY_SEARCH
+    if kind == 'produto' and (title.startswith('404') or any(m in title or m in text for m in NOT_FOUND_MARKERS)):
+        return NOT_FOUND
+    if not text.strip() and not title.strip():
+        return BLOCKED  # resposta totalmente vazia costuma ser bloqueio silencioso
+    return NORMAL
+
+
+def check_results_page(driver, plataforma, page_number):
+    """
+    Para páginas de resultado: busca vazia significa que não há (mais) resultados
+    e retorna False; nas páginas seguintes à primeira, 404 também é fim da
+    paginação. Bloqueio e captcha levantam UnusablePageError.
+    """
+    page_class = classify_page(driver, plataforma, 'busca')
+    if page_class == NORMAL: return True
+    if page_class == EMPTY_SEARCH: return False
+    if page_number > 1 and page_class == NOT_FOUND: return False
+    raise UnusablePageError(page_class, driver.current_url)
+
+
+def ensure_usable_page(driver, plataforma, kind='produto'):
+    """Levanta UnusablePageError se a página atual não for utilizável; senão retorna NORMAL."""
+    page_class = classify_page(driver, plataforma, kind)
+    if page_class != NORMAL:
+        raise UnusablePageError(page_class, driver.current_url)
+    return page_class
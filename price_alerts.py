@@ -0,0 +1,233 @@
+import argparse
+import json
+import sqlite3
+import time
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pandas as pd
+
+from hp_catalog import get_matcher, normalize_tokens
+from product_ids import canonical_product_id
+
+# ========== Alertas de preço ==========
+# Cada registro que sai dos scrapers passa pelas regras de regras_alertas.json
+# na hora em que é coletado. As regras ficam indexadas por (modelo, plataforma),
+# então um registro só é comparado com as regras que podem valer para ele. O
+# último preço de cada anúncio e os vendedores já vistos por modelo ficam num
+# SQLite local, o que permite "queda de preço desde a última vez" e "vendedor
+# novo" sem reler o histórico.
+#
+# Tipos de regra:
+#   preco_abaixo   preço menor que preco_max (avisa ao cruzar o limite, não a cada coleta)
+#   queda_preco    queda de pelo menos `percentual`% em relação ao último preço visto
+#   vendedor_novo  vendedor que ainda não tinha aparecido para o modelo
+# Filtros opcionais em qualquer regra: modelo, plataforma, capacidade ("XL"/"Padrão"),
+# compatibilidade ("Original"/"Compatível") e cor.
+
+DEFAULT_RULES = 'regras_alertas.json'
+DEFAULT_STATE_DB = 'alertas_estado.sqlite'
+ANY = '*'
+RULE_TYPES = {'preco_abaixo': ['preco_max'], 'queda_preco': ['percentual'], 'vendedor_novo': []}
+
+
+def _fold(value):
+    return ' '.join(normalize_tokens(value))
+
+
+def _same(rule_value, actual):
+    """'XL' casa com 'XL (Alto Rendimento)', 'compativel' com 'Compatível'."""
+    rule_value, actual = _fold(rule_value), _fold(actual)
+    return actual == rule_value or actual.split(' ')[0] == rule_value
+
+
+def load_rules(path=DEFAULT_RULES):
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    for i, rule in enumerate(config.get('regras', [])):
+        if rule.get('tipo') not in RULE_TYPES:
+            raise ValueError(f"Regra {i}: tipo desconhecido {rule.get('tipo')!r} (use {', '.join(RULE_TYPES)})")
+        missing = [p for p in RULE_TYPES[rule['tipo']] if p not in rule]
+        if missing:
+            raise ValueError(f"Regra {i} ({rule['tipo']}): faltam {', '.join(missing)}")
+        rule.setdefault('nome', f"{rule['tipo']} #{i}")
+    return config
+
+
+class FileAlertSink:
+    """Acrescenta cada alerta como uma linha JSON no arquivo."""
+    def __init__(self, path='alertas.jsonl'):
+        self.path = path
+
+    def send(self, alert):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+
+
+class WebhookAlertSink:
+    """Envia o alerta por POST (JSON). Falhas são impressas e não interrompem a coleta."""
+    def __init__(self, url, timeout=2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert):
+        request = urllib.request.Request(self.url, data=json.dumps(alert, ensure_ascii=False).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except Exception as e:
+            print(f"Falha ao enviar alerta para {self.url}: {type(e).__name__} - {e}")
+
+
+def build_sinks(config):
+    sinks = []
+    for destino in config.get('destinos', [{'tipo': 'arquivo'}]):
+        if destino['tipo'] == 'arquivo':
+            sinks.append(FileAlertSink(destino.get('caminho', 'alertas.jsonl')))
+        elif destino['tipo'] == 'webhook':
+            sinks.append(WebhookAlertSink(destino['url'], destino.get('timeout', 2.0)))
+        else:
+            raise ValueError(f"Destino de alerta desconhecido: {destino['tipo']!r}")
+    return sinks
+
+
+class AlertEngine:
+    def __init__(self, rules, sinks, db_path=DEFAULT_STATE_DB):
+        self.sinks = sinks
+        self.index = defaultdict(list)
+        for rule in rules:
+            self.index[(str(rule.get('modelo') or ANY), rule.get('plataforma') or ANY)].append(rule)
+        # O pipeline assíncrono chama process na thread de gravação (uma só), não na que criou o motor
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        if db_path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS last_seen (
+                product_id TEXT PRIMARY KEY, preco REAL, vendedor TEXT, visto_em REAL
+            );
+            CREATE TABLE IF NOT EXISTS sellers (
+                modelo TEXT, plataforma TEXT, vendedor TEXT, primeiro_visto REAL,
+                PRIMARY KEY (modelo, plataforma, vendedor)
+            ) WITHOUT ROWID;
+        """)
+
+    def _rules_for(self, modelo, plataforma):
+        keys = {(modelo or ANY, plataforma or ANY), (modelo or ANY, ANY), (ANY, plataforma or ANY), (ANY, ANY)}
+        for key in keys:
+            yield from self.index.get(key, ())
+
+    def _applies(self, rule, tags):
+        if rule.get('capacidade') and not _same(rule['capacidade'], tags['capacidade']): return False
+        if rule.get('compatibilidade') and not _same(rule['compatibilidade'], tags['compatibilidade']): return False
+        if rule.get('cor') and _fold(rule['cor']) not in tags['cores']: return False
+        return True
+
+    def process(self, record):
+        """Confere o registro contra as regras que valem para ele, dispara os alertas e atualiza o estado."""
+        plataforma = record.get('plataforma')
+        product_id = canonical_product_id(record.get('link_anuncio'), plataforma)
+        # clean_price devolve o texto original quando não consegue ler o preço
+        preco = pd.to_numeric(record.get('preco'), errors='coerce')
+        if not product_id or pd.isna(preco): return []
+        preco = float(preco)
+        tags = get_matcher().tag(record.get('titulo'))
+        modelo = tags['modelo']
+        vendedor = record.get('vendedor')
+        vendedor = None if vendedor is None or (isinstance(vendedor, float) and pd.isna(vendedor)) else str(vendedor)
+
+        previous = self.conn.execute("SELECT preco, vendedor FROM last_seen WHERE product_id = ?", (product_id,)).fetchone()
+        preco_anterior = previous[0] if previous else None
+        seller_known = seller_baseline = None
+        if modelo and vendedor:
+            seller_known = self.conn.execute(
+                "SELECT 1 FROM sellers WHERE modelo = ? AND plataforma = ? AND vendedor = ?", (modelo, plataforma, vendedor)).fetchone()
+            # Sem nenhum vendedor registrado para o modelo, a primeira coleta só forma a base
+            seller_baseline = self.conn.execute(
+                "SELECT 1 FROM sellers WHERE modelo = ? AND plataforma = ? LIMIT 1", (modelo, plataforma)).fetchone()
+
+        alerts = []
+        for rule in self._rules_for(modelo, plataforma):
+            if not self._applies(rule, tags): continue
+            message = None
+            if rule['tipo'] == 'preco_abaixo':
+                if preco < rule['preco_max'] and (preco_anterior is None or preco_anterior >= rule['preco_max']):
+                    message = f"Preço R$ {preco:.2f} abaixo de R$ {rule['preco_max']:.2f}"
+            elif rule['tipo'] == 'queda_preco':
+                if preco_anterior and preco <= preco_anterior * (1 - rule['percentual'] / 100):
+                    message = f"Preço caiu {100 * (1 - preco / preco_anterior):.1f}% (R$ {preco_anterior:.2f} -> R$ {preco:.2f})"
+            elif rule['tipo'] == 'vendedor_novo':
+                if modelo and vendedor and seller_baseline and not seller_known:
+                    message = f"Vendedor novo para o modelo {modelo}: {vendedor}"
+            if message:
+                alerts.append({
+                    'regra': rule['nome'], 'tipo': rule['tipo'], 'mensagem': message,
+                    'product_id': product_id, 'plataforma': plataforma, 'modelo': modelo,
+                    'titulo': record.get('titulo'), 'preco': preco, 'preco_anterior': preco_anterior,
+                    'vendedor': vendedor, 'link_anuncio': record.get('link_anuncio'),
+                    'em': datetime.now().isoformat(timespec='seconds'),
+                })
+
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO last_seen (product_id, preco, vendedor, visto_em) VALUES (?, ?, ?, ?)",
+                              (product_id, preco, vendedor, time.time()))
+            if modelo and vendedor and not seller_known:
+                self.conn.execute("INSERT OR IGNORE INTO sellers (modelo, plataforma, vendedor, primeiro_visto) VALUES (?, ?, ?, ?)",
+                                  (modelo, plataforma, vendedor, time.time()))
+        for alert in alerts:
+            print(f"[ALERTA] {alert['regra']}: {alert['mensagem']} | {alert['titulo']}")
+            for sink in self.sinks:
+                # Um destino com problema não pode derrubar a coleta nem os outros destinos
+                try:
+                    sink.send(alert)
+                except Exception as e:
+                    print(f"Falha no destino de alerta {type(sink).__name__}: {type(e).__name__} - {e}")
+        return alerts
+
+    def close(self):
+        self.conn.close()
+
+
+def create_alert_engine(rules_path=DEFAULT_RULES, db_path=DEFAULT_STATE_DB):
+    config = load_rules(rules_path)
+    return AlertEngine(config.get('regras', []), build_sinks(config), db_path)
+
+
+def run_test_webhook(port, path='alertas_webhook.jsonl'):
+    """Receptor local que faz papel do webhook: grava cada POST recebido num arquivo."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            with open(path, 'ab') as f:
+                f.write(body + b'\n')
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    print(f"Webhook de teste em http://127.0.0.1:{port}/ gravando em {path} (Ctrl+C para sair)")
+    HTTPServer(('127.0.0.1', port), Handler).serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Confere registros da coleta contra as regras de alerta de preço.")
+    parser.add_argument('arquivo', nargs='?', default='scraping_unificado.csv', help="CSV da coleta a conferir")
+    parser.add_argument('--regras', default=DEFAULT_RULES)
+    parser.add_argument('--estado', default=DEFAULT_STATE_DB)
+    parser.add_argument('--webhook-teste', type=int, metavar='PORTA', help="Só sobe o receptor local de webhook")
+    args = parser.parse_args()
+
+    if args.webhook_teste:
+        run_test_webhook(args.webhook_teste)
+    else:
+        engine = create_alert_engine(args.regras, args.estado)
+        df = pd.read_csv(args.arquivo, sep=';')
+        start, total = time.time(), 0
+        records = df.where(df.notna(), None).to_dict('records')
+        for record in records:
+            total += len(engine.process(record))
+        engine.close()
+        elapsed = time.time() - start
+        print(f"{total} alerta(s) em {len(records)} registros ({1000 * elapsed / max(len(records), 1):.2f} ms por registro)")
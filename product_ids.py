@@ -0,0 +1,31 @@
+import re
+
+# ========== Identificador canônico de produto ==========
+# O mesmo anúncio aparece com URLs diferentes (parâmetros de rastreamento,
+# fragmentos, slug alterado). Caches e históricos usam este ID estável.
+
+ML_ITEM_PATTERN = re.compile(r'MLB-?(\d{6,})', re.IGNORECASE)
+MAGALU_ITEM_PATTERN = re.compile(r'/p/([a-z0-9]+)/?', re.IGNORECASE)
+
+
+def canonical_product_id(url, plataforma=None):
+    """
+    Retorna um ID estável para o anúncio, ex: 'mercado_livre:MLB123456789'
+    ou 'magalu:ka31begeg2'. Se o padrão não for reconhecido, usa a URL sem
+    query string nem fragmento.
+    """
+    if not url or not isinstance(url, str):
+        return None
+    clean = url.split('#')[0].split('?')[0].rstrip('/')
+
+    if plataforma == 'mercado_livre' or 'mercadolivre.com' in clean:
+        match = ML_ITEM_PATTERN.search(clean)
+        if match: return f"mercado_livre:MLB{match.group(1)}"
+        return f"mercado_livre:{clean}"
+
+    if plataforma == 'magalu' or 'magazineluiza.com' in clean:
+        match = MAGALU_ITEM_PATTERN.search(clean + '/')
+        if match: return f"magalu:{match.group(1).lower()}"
+        return f"magalu:{clean}"
+
+    return f"{plataforma}:{clean}" if plataforma else clean
@@ -0,0 +1,432 @@
+import argparse
+import json
+import select
+import socket
+import socketserver
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from page_guard import BLOCKED, BLOCKED_MARKERS, UnusablePageError
+from rate_limit import min_interval_for
+
+# ========== Saídas de rede (proxies) por plataforma ==========
+# Sem proxy, todo o tráfego sai pelo mesmo IP, e o ritmo seguro por domínio é
+# o que um IP aguenta. Com proxies.json, cada plataforma tem um conjunto de
+# saídas; cada navegador (ou sessão HTTP) fica preso a uma saída do início ao
+# fim, e o intervalo mínimo entre páginas passa a valer por saída, então a
+# vazão total cresce com o número de saídas. Cada saída tem um limite diário
+# de requisições e um histórico de bloqueios: depois de alguns bloqueios
+# seguidos (ou muitos bloqueios nas últimas páginas) ela sai do rodízio por um
+# tempo que dobra a cada remoção. O Chrome não aceita usuário/senha em
+# --proxy-server; saídas autenticadas precisam de um repassador local.
+#
+# Formato do proxies.json:
+#   {"saidas": {"magalu": ["http://10.0.0.2:3128", ...], "*": [...]},
+#    "intervalo": 4.0, "limite_diario": 2000}
+# Cada saída também pode ser {"url": ..., "intervalo": ..., "limite_diario": ...}.
+# Saídas em "*" valem para todas as plataformas (com saúde separada por plataforma).
+
+DEFAULT_CONFIG = 'proxies.json'
+ANY = '*'
+DEFAULT_DAILY_BUDGET = 2000
+MAX_CONSECUTIVE_BLOCKS = 3
+HEALTH_WINDOW = 20
+MAX_BLOCK_RATE = 0.5
+EXIT_COOLDOWN = 1800.0
+MAX_EXIT_COOLDOWN = 6 * 3600.0
+
+
+class NoHealthyExitError(RuntimeError):
+    """Todas as saídas da plataforma estão removidas ou sem orçamento. retry_in: segundos até a primeira voltar."""
+
+    def __init__(self, message, retry_in):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class ProxyExit:
+    def __init__(self, url, plataforma, interval, daily_budget):
+        self.url = url
+        self.plataforma = plataforma
+        self.interval = interval
+        self.daily_budget = daily_budget
+        self.sessions = 0
+        self.requests = 0
+        self.blocks = 0
+        self.consecutive_blocks = 0
+        self.recent = deque(maxlen=HEALTH_WINDOW)
+        self.next_at = 0.0
+        self.day = None
+        self.requests_today = 0
+        self.removals = 0
+        self.removed_until = 0.0
+
+    def available(self, now):
+        return self.seconds_until_available(now) == 0
+
+    def seconds_until_available(self, now):
+        if now < self.removed_until: return self.removed_until - now
+        if self.day == time.strftime('%Y-%m-%d', time.localtime(now)) and self.requests_today >= self.daily_budget:
+            # O orçamento diário volta à meia-noite (horário local)
+            t = time.localtime(now)
+            return time.mktime((t.tm_year, t.tm_mon, t.tm_mday + 1, 0, 0, 0, 0, 0, -1)) - now
+        return 0
+
+    def __repr__(self):
+        return f"ProxyExit({self.plataforma}, {self.url})"
+
+
+class ProxyPool:
+    def __init__(self, exits_by_platform, interval=None, daily_budget=DEFAULT_DAILY_BUDGET):
+        self._lock = threading.Lock()
+        self.exits = {}
+        shared = exits_by_platform.get(ANY, [])
+        platforms = [p for p in exits_by_platform if p != ANY]
+        for plataforma in platforms:
+            entries = exits_by_platform[plataforma] + shared
+            self.exits[plataforma] = [self._make_exit(e, plataforma, interval, daily_budget) for e in entries]
+        self.shared = shared
+        self.interval = interval
+        self.daily_budget = daily_budget
+
+    @staticmethod
+    def _make_exit(entry, plataforma, interval, daily_budget):
+        if isinstance(entry, str): entry = {'url': entry}
+        return ProxyExit(entry['url'], plataforma,
+                         entry.get('intervalo', interval if interval is not None else min_interval_for(plataforma)),
+                         entry.get('limite_diario', daily_budget))
+
+    def _exits_for(self, plataforma):
+        if plataforma not in self.exits and self.shared:
+            self.exits[plataforma] = [self._make_exit(e, plataforma, self.interval, self.daily_budget) for e in self.shared]
+        return self.exits.get(plataforma, [])
+
+    def size(self, plataforma):
+        with self._lock:
+            return len(self._exits_for(plataforma))
+
+    def acquire(self, plataforma):
+        """
+        Prende uma sessão a uma saída da plataforma (a menos usada no momento).
+        Retorna None se a plataforma não tem saídas configuradas (conexão direta).
+        """
+        with self._lock:
+            exits = self._exits_for(plataforma)
+            if not exits: return None
+            now = time.time()
+            candidates = [e for e in exits if e.available(now)]
+            if not candidates:
+                retry_in = min(e.seconds_until_available(now) for e in exits)
+                raise NoHealthyExitError(f"[{plataforma}] Nenhuma saída disponível ({len(exits)} removidas ou sem orçamento)", retry_in)
+            chosen = min(candidates, key=lambda e: (e.sessions, e.requests_today, e.next_at))
+            chosen.sessions += 1
+            return chosen
+
+    def release(self, proxy_exit):
+        with self._lock:
+            proxy_exit.sessions = max(proxy_exit.sessions - 1, 0)
+
+    def reserve(self, proxy_exit):
+        """Reserva o próximo horário livre da saída e devolve quantos segundos faltam para ele."""
+        with self._lock:
+            now = time.time()
+            slot = max(now, proxy_exit.next_at)
+            proxy_exit.next_at = slot + proxy_exit.interval
+        return slot - now
+
+    def acquire_slot(self, proxy_exit):
+        wait = self.reserve(proxy_exit)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    @staticmethod
+    def _count_request(proxy_exit):
+        today = time.strftime('%Y-%m-%d', time.localtime(time.time()))
+        if proxy_exit.day != today:
+            proxy_exit.day, proxy_exit.requests_today = today, 0
+        proxy_exit.requests += 1
+        proxy_exit.requests_today += 1
+
+    def record_success(self, proxy_exit):
+        with self._lock:
+            self._count_request(proxy_exit)
+            proxy_exit.consecutive_blocks = 0
+            proxy_exit.recent.append(False)
+
+    def record_block(self, proxy_exit, page_class=BLOCKED):
+        """Registra um bloqueio na saída. Retorna True se ela foi removida do rodízio."""
+        with self._lock:
+            self._count_request(proxy_exit)
+            proxy_exit.blocks += 1
+            proxy_exit.consecutive_blocks += 1
+            proxy_exit.recent.append(True)
+            rate = sum(proxy_exit.recent) / len(proxy_exit.recent)
+            if proxy_exit.consecutive_blocks < MAX_CONSECUTIVE_BLOCKS and (
+                    len(proxy_exit.recent) < HEALTH_WINDOW // 2 or rate < MAX_BLOCK_RATE):
+                return False
+            cooldown = min(EXIT_COOLDOWN * 2 ** proxy_exit.removals, MAX_EXIT_COOLDOWN)
+            proxy_exit.removals += 1
+            proxy_exit.removed_until = time.time() + cooldown
+            proxy_exit.consecutive_blocks = 0
+            proxy_exit.recent.clear()
+        print(f"[{proxy_exit.plataforma}] Saída {proxy_exit.url} removida por {cooldown/60:.0f} min ({page_class}).")
+        return True
+
+    def report(self):
+        lines = ["Saídas (proxies):"]
+        now = time.time()
+        with self._lock:
+            for plataforma, exits in self.exits.items():
+                for e in exits:
+                    state = 'ativa' if e.available(now) else ('removida' if now < e.removed_until else 'sem orçamento')
+                    lines.append(f"  {plataforma} {e.url}: {e.requests} requisições, {e.blocks} bloqueios, {state}")
+        return '\n'.join(lines)
+
+
+def load_proxy_pool(path=DEFAULT_CONFIG):
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    return ProxyPool(config.get('saidas', {}), config.get('intervalo'), config.get('limite_diario', DEFAULT_DAILY_BUDGET))
+
+
+_pool = None
+
+
+def configure_proxy_pool(path=DEFAULT_CONFIG):
+    """Carrega proxies.json; a partir daí scraping.start_driver prende cada navegador a uma saída."""
+    global _pool
+    _pool = load_proxy_pool(path) if path else None
+    return _pool
+
+
+def get_proxy_pool():
+    return _pool
+
+
+def report_page(driver, page_class=None):
+    """
+    Registra o resultado de uma página na saída do navegador. Retorna False se
+    o navegador não usa proxy (aí o bloqueio conta para o circuit breaker da plataforma).
+    """
+    proxy_exit = getattr(driver, 'saida', None)
+    if proxy_exit is None or _pool is None: return False
+    if page_class is None: _pool.record_success(proxy_exit)
+    else: _pool.record_block(proxy_exit, page_class)
+    return True
+
+
+class ProxySession:
+    """Sessão HTTP (urllib) presa a uma saída, com o ritmo e a saúde da saída."""
+
+    def __init__(self, pool, plataforma, timeout=20.0):
+        self.pool = pool
+        self.plataforma = plataforma
+        self.timeout = timeout
+        self.exit = None
+        self.opener = None
+        self._pin()
+
+    def _pin(self):
+        self.exit = self.pool.acquire(self.plataforma)
+        handler = urllib.request.ProxyHandler({'http': self.exit.url, 'https': self.exit.url} if self.exit else {})
+        self.opener = urllib.request.build_opener(handler)
+
+    def get(self, url):
+        if self.exit is not None and not self.exit.available(time.time()):
+            # A saída foi removida: a sessão passa para outra
+            self.pool.release(self.exit)
+            self._pin()
+        if self.exit is not None:
+            self.pool.acquire_slot(self.exit)
+        try:
+            with self.opener.open(url, timeout=self.timeout) as response:
+                body = response.read().decode('utf-8', errors='replace')
+        except urllib.error.HTTPError as e:
+            if e.code in (403, 429):
+                if self.exit is not None: self.pool.record_block(self.exit, BLOCKED)
+                raise UnusablePageError(BLOCKED, url)
+            raise
+        if any(m in body[:6000].lower() for m in BLOCKED_MARKERS):
+            if self.exit is not None: self.pool.record_block(self.exit, BLOCKED)
+            raise UnusablePageError(BLOCKED, url)
+        if self.exit is not None: self.pool.record_success(self.exit)
+        return body
+
+    def close(self):
+        if self.exit is not None:
+            self.pool.release(self.exit)
+            self.exit = None
+
+
+# ========== Proxies locais para teste ==========
+
+class LocalProxyHandler(BaseHTTPRequestHandler):
+    """Proxy de encaminhamento mínimo: GET com URL absoluta e túnel CONNECT (HTTPS)."""
+    protocol_version = 'HTTP/1.0'
+
+    def _blocked(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            blocked = server.block_after is not None and server.requests > server.block_after
+        if blocked:
+            self.send_error(403, 'Access denied')
+        return blocked
+
+    def do_GET(self):
+        if self._blocked(): return
+        try:
+            with urllib.request.build_opener(urllib.request.ProxyHandler({})).open(self.path, timeout=30) as upstream:
+                body = upstream.read()
+                self.send_response(upstream.status)
+                for key, value in upstream.getheaders():
+                    if key.lower() not in ('transfer-encoding', 'connection', 'content-length'):
+                        self.send_header(key, value)
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            self.send_response(e.code)
+        except Exception as e:
+            self.send_error(502, str(e))
+            return
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_CONNECT(self):
+        if self._blocked(): return
+        host, _, port = self.path.partition(':')
+        try:
+            upstream = socket.create_connection((host, int(port or 443)), timeout=30)
+        except OSError as e:
+            self.send_error(502, str(e))
+            return
+        self.send_response(200, 'Connection established')
+        self.end_headers()
+        sockets = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, errored = select.select(sockets, [], sockets, 60)
+                if errored or not readable: break
+                for sock in readable:
+                    data = sock.recv(65536)
+                    if not data: return
+                    (upstream if sock is self.connection else self.connection).sendall(data)
+        finally:
+            upstream.close()
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalProxyServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port, block_after=None):
+        super().__init__(('127.0.0.1', port), LocalProxyHandler)
+        self.block_after = block_after
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def start_local_proxies(count, first_port=0, block_after=None):
+    """Sobe `count` proxies locais em threads. Retorna (servidores, urls)."""
+    servers = []
+    for i in range(count):
+        server = LocalProxyServer(first_port + i if first_port else 0, block_after)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers, [f"http://127.0.0.1:{s.server_address[1]}" for s in servers]
+
+
+def run_throughput_test(exit_counts, requests_total, interval, blocked_exits=0):
+    """
+    Mede a vazão (requisições/s) com 1..N saídas locais contra um servidor local,
+    com o mesmo intervalo mínimo por saída. `blocked_exits` saídas passam a
+    responder 403 depois de 3 requisições, para exercitar a remoção automática.
+    """
+    class Target(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = b'<html><body>ok</body></html>'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    target = LocalProxyServer(0)
+    target.RequestHandlerClass = Target
+    threading.Thread(target=target.serve_forever, daemon=True).start()
+    target_url = f"http://127.0.0.1:{target.server_address[1]}/"
+
+    results = {}
+    for count in exit_counts:
+        servers, urls = start_local_proxies(count)
+        for server in servers[:blocked_exits]:
+            server.block_after = 3
+        pool = ProxyPool({'teste': urls}, interval=interval)
+        done, lock = [0], threading.Lock()
+
+        def worker():
+            session = ProxySession(pool, 'teste')
+            try:
+                while True:
+                    with lock:
+                        if done[0] >= requests_total: return
+                        done[0] += 1
+                    try:
+                        session.get(target_url)
+                    except UnusablePageError:
+                        with lock: done[0] -= 1
+            except NoHealthyExitError:
+                return
+            finally:
+                session.close()
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            for _ in range(count):
+                executor.submit(worker)
+        elapsed = time.time() - start
+        results[count] = done[0] / elapsed
+        print(f"{count} saída(s): {done[0]} requisições em {elapsed:.1f}s = {results[count]:.2f} req/s")
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        if blocked_exits: print(pool.report())
+    target.shutdown()
+    target.server_close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Proxies locais para teste e medição de vazão por número de saídas.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_local = sub.add_parser('locais', help="Sobe proxies locais (para usar no proxies.json) até Ctrl+C")
+    p_local.add_argument('--quantidade', type=int, default=3)
+    p_local.add_argument('--porta-inicial', type=int, default=8901)
+    p_local.add_argument('--bloquear-apos', type=int, default=None, help="Responde 403 depois de N requisições")
+    p_test = sub.add_parser('teste', help="Mede a vazão com 1..N saídas locais")
+    p_test.add_argument('--saidas', type=int, nargs='+', default=[1, 2, 4])
+    p_test.add_argument('--requisicoes', type=int, default=40)
+    p_test.add_argument('--intervalo', type=float, default=0.5, help="Intervalo mínimo por saída (s)")
+    p_test.add_argument('--bloqueadas', type=int, default=0, help="Saídas que passam a ser bloqueadas")
+    args = parser.parse_args()
+
+    if args.comando == 'locais':
+        _, urls = start_local_proxies(args.quantidade, args.porta_inicial, args.bloquear_apos)
+        print(json.dumps({'saidas': {ANY: urls}}, indent=2))
+        print("Proxies locais rodando (Ctrl+C para sair)")
+        try:
+            while True: time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    else:
+        run_throughput_test(args.saidas, args.requisicoes, args.intervalo, args.bloqueadas)
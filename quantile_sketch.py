@@ -0,0 +1,86 @@
+import json
+import math
+
+# ========== Sketch de quantis ==========
+# Histograma com buckets em escala logarítmica (no estilo do DDSketch): cada
+# quantil sai com erro relativo de no máximo `relative_accuracy`, dois sketches
+# se juntam somando os buckets e a memória fica limitada a `max_bins`, não
+# importa quantos valores tenham sido adicionados.
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=0.01, max_bins=512):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        if value is None or (isinstance(value, float) and math.isnan(value)): return
+        if value <= 0:
+            self.zero_count += count
+        else:
+            index = self._index(value)
+            self.bins[index] = self.bins.get(index, 0) + count
+            if len(self.bins) > self.max_bins: self._collapse()
+        self.count += count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _collapse(self):
+        # Junta os buckets mais baixos: perde precisão só nos menores valores
+        indexes = sorted(self.bins)
+        extra = len(indexes) - self.max_bins
+        target = indexes[extra]
+        for index in indexes[:extra]:
+            self.bins[target] += self.bins.pop(index)
+
+    def merge(self, other):
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins: self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        if not self.count: return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen: return min(self.min, 0.0)
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def to_json(self):
+        return json.dumps({
+            'a': self.relative_accuracy, 'm': self.max_bins, 'z': self.zero_count,
+            'min': self.min if self.count else None, 'max': self.max if self.count else None,
+            'b': [[index, count] for index, count in self.bins.items()],
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        sketch = cls(data['a'], data['m'])
+        sketch.bins = {index: count for index, count in data['b']}
+        sketch.zero_count = data['z']
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        if sketch.count:
+            sketch.min, sketch.max = data['min'], data['max']
+        return sketch
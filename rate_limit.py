@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+import time
+
+# ========== Limites por domínio ==========
+# Intervalo mínimo (em segundos) entre duas páginas do mesmo domínio,
+# somando todos os navegadores/processos que estiverem rodando ao mesmo tempo.
+DOMAIN_MIN_INTERVAL = {
+    'magalu': 4.0,
+    'mercado_livre': 4.0,
+}
+DEFAULT_MIN_INTERVAL = 5.0
+
+
+def min_interval_for(plataforma):
+    return DOMAIN_MIN_INTERVAL.get(plataforma, DEFAULT_MIN_INTERVAL)
+
+
+class RateLimiter:
+    """Limitador por domínio para um único processo (várias threads/abas)."""
+
+    def __init__(self, intervals=None):
+        self.intervals = dict(intervals or DOMAIN_MIN_INTERVAL)
+        self._next_at = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, domain):
+        """Reserva o próximo horário livre do domínio e devolve quantos segundos faltam para ele."""
+        interval = self.intervals.get(domain, DEFAULT_MIN_INTERVAL)
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_at.get(domain, 0.0))
+            self._next_at[domain] = slot + interval
+        return slot - now
+
+    def acquire(self, domain):
+        wait = self.reserve(domain)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def try_acquire(self, domain):
+        """Reserva o domínio só se ele estiver livre agora; não espera nem reserva horário futuro."""
+        interval = self.intervals.get(domain, DEFAULT_MIN_INTERVAL)
+        with self._lock:
+            now = time.time()
+            if self._next_at.get(domain, 0.0) > now:
+                return False
+            self._next_at[domain] = now + interval
+        return True
+
+
+class SharedRateLimiter:
+    """
+    Limitador por domínio compartilhado entre processos, guardado em SQLite.
+    Cada chamada reserva um horário dentro de uma transação exclusiva, então
+    N workers nunca passam do ritmo configurado para o domínio.
+    """
+
+    def __init__(self, db_path, intervals=None):
+        self.db_path = db_path
+        self.intervals = dict(intervals or DOMAIN_MIN_INTERVAL)
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS domain_slots (domain TEXT PRIMARY KEY, next_at REAL NOT NULL)")
+
+    def reserve(self, domain):
+        interval = self.intervals.get(domain, DEFAULT_MIN_INTERVAL)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = self.conn.execute("SELECT next_at FROM domain_slots WHERE domain = ?", (domain,)).fetchone()
+            slot = max(now, row[0] if row else 0.0)
+            self.conn.execute(
+                "INSERT INTO domain_slots (domain, next_at) VALUES (?, ?) "
+                "ON CONFLICT(domain) DO UPDATE SET next_at = excluded.next_at",
+                (domain, slot + interval)
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return slot - now
+
+    def acquire(self, domain):
+        wait = self.reserve(domain)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def close(self):
+        self.conn.close()
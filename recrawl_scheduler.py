@@ -0,0 +1,340 @@
+import argparse
+import heapq
+import math
+import random
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from circuit_breaker import CircuitBreakerBoard
+from page_guard import UnusablePageError
+from price_alerts import create_alert_engine
+from product_ids import canonical_product_id
+from rate_limit import RateLimiter
+from run_stats import RunStats
+from scraping import PLATFORMS, start_driver, stop_driver, save_to_csv
+
+# ========== Recoleta priorizada por volatilidade ==========
+# Cada anúncio já visto tem um histórico de mudanças (preço, vendedor, nota e
+# número de avaliações). Supondo que as mudanças de um anúncio chegam como um
+# processo de Poisson, a taxa é estimada por
+#     (mudanças + PRIOR_CHANGES) / (dias observados + PRIOR_DAYS)
+# e a chance de ter mudado desde a última visita é 1 - exp(-taxa * dias).
+# Cada rodada tem um orçamento fixo de páginas: uma cota mínima vai para
+# anúncios novos (vistos só na busca, nunca visitados) e o resto para os
+# anúncios com maior chance de mudança. Anúncios conhecidos com chance abaixo
+# de MIN_CHANCE só entram se sobrar orçamento depois dos novos, então anúncios
+# parados há semanas quase não gastam páginas.
+# Só preço e vendedor contam para a taxa; nota e avaliações mudam o tempo todo
+# (novas avaliações) e ficam apenas no histórico.
+
+DEFAULT_DB = 'recoleta.sqlite'
+TRACKED_FIELDS = ['preco', 'vendedor', 'avaliacao_nota', 'avaliacao_numero']
+RATE_FIELDS = ('preco', 'vendedor')
+PRIOR_CHANGES = 0.5
+PRIOR_DAYS = 14.0  # sem histórico, supõe uma mudança a cada 4 semanas
+EXPLORATION_SHARE = 0.2
+MIN_CHANCE = 0.2
+PRICE_TOLERANCE = 0.005  # diferenças de até 0,5% (arredondamento) não contam como mudança
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value)) or (isinstance(value, str) and not value.strip())
+
+
+def _normalize(field, value):
+    if _missing(value): return None
+    if field == 'vendedor': return str(value).strip()
+    try:
+        return float(str(value).replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def _changed(field, before, after):
+    if before is None or after is None: return False
+    if field == 'preco': return abs(after - before) > PRICE_TOLERANCE * before
+    return before != after
+
+
+def change_probability(changes, exposure_days, elapsed_days):
+    rate = (changes + PRIOR_CHANGES) / (exposure_days + PRIOR_DAYS)
+    return 1.0 - math.exp(-rate * max(elapsed_days, 0.0))
+
+
+class RecrawlScheduler:
+    def __init__(self, db_path=DEFAULT_DB):
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS listings (
+                product_id TEXT PRIMARY KEY, plataforma TEXT, link_anuncio TEXT,
+                first_seen REAL, last_visit REAL, visits INTEGER DEFAULT 0,
+                changes INTEGER DEFAULT 0, exposure_days REAL DEFAULT 0,
+                preco REAL, vendedor TEXT, avaliacao_nota REAL, avaliacao_numero REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_listings_new ON listings (visits, first_seen);
+            CREATE TABLE IF NOT EXISTS changes (
+                product_id TEXT, visto_em REAL, campo TEXT, antes TEXT, depois TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_changes_product ON changes (product_id, visto_em);
+        """)
+
+    def discover(self, link, plataforma, when=None):
+        """Registra um anúncio visto na busca (sem visita). Retorna True se ele era novo."""
+        product_id = canonical_product_id(link, plataforma)
+        if not product_id: return False
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO listings (product_id, plataforma, link_anuncio, first_seen) VALUES (?, ?, ?, ?)",
+            (product_id, plataforma, link, when or time.time()))
+        self.conn.commit()
+        return cur.rowcount == 1
+
+    def observe(self, record, when=None):
+        """
+        Compara o registro com o último estado do anúncio, grava as mudanças no
+        histórico e atualiza a taxa. Retorna a lista de campos que mudaram.
+        """
+        plataforma = record.get('plataforma')
+        product_id = canonical_product_id(record.get('link_anuncio'), plataforma)
+        if not product_id: return []
+        when = when or time.time()
+        values = {f: _normalize(f, record.get(f)) for f in TRACKED_FIELDS}
+        row = self.conn.execute(
+            f"SELECT last_visit, {', '.join(TRACKED_FIELDS)} FROM listings WHERE product_id = ?", (product_id,)).fetchone()
+
+        changed = []
+        with self.conn:
+            if row is None or row[0] is None:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO listings (product_id, plataforma, link_anuncio, first_seen) VALUES (?, ?, ?, ?)",
+                    (product_id, plataforma, record.get('link_anuncio'), when))
+                elapsed = 0.0
+            else:
+                previous = dict(zip(TRACKED_FIELDS, row[1:]))
+                elapsed = max(when - row[0], 0.0) / 86400
+                changed = [f for f in TRACKED_FIELDS if _changed(f, previous[f], values[f])]
+                self.conn.executemany(
+                    "INSERT INTO changes (product_id, visto_em, campo, antes, depois) VALUES (?, ?, ?, ?, ?)",
+                    [(product_id, when, f, str(previous[f]), str(values[f])) for f in changed])
+            # Campos que não vieram nesta visita mantêm o último valor conhecido
+            self.conn.execute(
+                f"UPDATE listings SET last_visit = ?, visits = visits + 1, changes = changes + ?, "
+                f"exposure_days = exposure_days + ?, link_anuncio = COALESCE(?, link_anuncio), "
+                f"{', '.join(f'{f} = COALESCE(?, {f})' for f in TRACKED_FIELDS)} WHERE product_id = ?",
+                (when, int(any(f in RATE_FIELDS for f in changed)), elapsed, record.get('link_anuncio'),
+                 *(values[f] for f in TRACKED_FIELDS), product_id))
+        return changed
+
+    def plan(self, budget, exploration=EXPLORATION_SHARE, platforms=None, now=None):
+        """
+        Escolhe até `budget` anúncios para visitar, nesta ordem: conhecidos com
+        chance de mudança >= MIN_CHANCE (fora a cota de exploração), nunca
+        visitados (mais antigos primeiro) e, se ainda sobrar, os demais conhecidos.
+        """
+        now = now or time.time()
+        where, params = '', []
+        if platforms:
+            where = f" AND plataforma IN ({','.join('?' * len(platforms))})"
+            params = list(platforms)
+        explore_quota = int(round(budget * exploration))
+        new = self.conn.execute(
+            f"SELECT product_id, plataforma, link_anuncio FROM listings WHERE visits = 0{where} ORDER BY first_seen LIMIT ?",
+            params + [budget]).fetchall()
+        known = self.conn.execute(
+            f"SELECT product_id, plataforma, link_anuncio, changes, exposure_days, last_visit FROM listings WHERE visits > 0{where}",
+            params)
+        ranked = heapq.nlargest(budget, ((change_probability(changes, exposure, (now - last_visit) / 86400), pid, p, link)
+                                         for pid, p, link, changes, exposure, last_visit in known))
+
+        likely = [entry for entry in ranked if entry[0] >= MIN_CHANCE]
+        n_likely = min(len(likely), budget - min(explore_quota, len(new)))
+        n_new = min(len(new), budget - n_likely)
+        n_rest = budget - n_likely - n_new
+        chosen = [{'product_id': pid, 'plataforma': p, 'link_anuncio': link, 'novo': False, 'chance': prob}
+                  for prob, pid, p, link in likely[:n_likely]]
+        chosen += [{'product_id': pid, 'plataforma': p, 'link_anuncio': link, 'novo': True, 'chance': None}
+                   for pid, p, link in new[:n_new]]
+        chosen += [{'product_id': pid, 'plataforma': p, 'link_anuncio': link, 'novo': False, 'chance': prob}
+                   for prob, pid, p, link in ranked[len(likely):len(likely) + n_rest]]
+        return chosen
+
+    def history(self, product_id):
+        return self.conn.execute(
+            "SELECT visto_em, campo, antes, depois FROM changes WHERE product_id = ? ORDER BY visto_em", (product_id,)).fetchall()
+
+    def summary(self):
+        total, visited, changes, exposure = self.conn.execute(
+            "SELECT COUNT(*), SUM(visits > 0), SUM(changes), SUM(exposure_days) FROM listings").fetchone()
+        return {'anuncios': total, 'visitados': visited or 0, 'mudancas': changes or 0,
+                'mudancas_por_dia': (changes or 0) / exposure if exposure else None}
+
+    def close(self):
+        self.conn.close()
+
+
+def parse_date(text):
+    return datetime.strptime(str(text)[:10], '%Y-%m-%d').timestamp()
+
+
+def import_csv(scheduler, path, links_only=False, default_date=None):
+    """
+    Soma um CSV da coleta ao histórico; data_coleta vira o horário da observação.
+    Linhas sem data_coleta (CSVs antigos) usam default_date ('AAAA-MM-DD'); sem
+    nenhuma das duas o import é recusado, porque carimbar CSVs antigos com a hora
+    atual zeraria a exposição entre eles e inflaria as taxas de mudança.
+    Com links_only, os anúncios só entram como novos (sem visita).
+    """
+    df = pd.read_csv(path, sep=';')
+    default_when = parse_date(default_date) if default_date else None
+    if default_when is None and ('data_coleta' not in df.columns or df['data_coleta'].isna().any()):
+        raise ValueError(f"{path}: há linhas sem data_coleta; informe a data da coleta com --data AAAA-MM-DD")
+    # O mesmo anúncio aparece em vários termos de busca; conta uma observação por coleta
+    df = df[~df.apply(lambda row: canonical_product_id(row['link_anuncio'], row.get('plataforma')), axis=1).duplicated(keep='last')]
+    changed = 0
+    for record in df.where(df.notna(), None).to_dict('records'):
+        when = parse_date(record['data_coleta']) if record.get('data_coleta') else default_when
+        if links_only:
+            changed += scheduler.discover(record['link_anuncio'], record.get('plataforma'), when)
+            continue
+        changed += bool(scheduler.observe(record, when))
+    return len(df), changed
+
+
+def run_recrawl(scheduler, budget, exploration=EXPLORATION_SHARE, platforms=None, use_profiles=False, on_record=None):
+    """Visita os anúncios escolhidos pelo plan() e atualiza o histórico. Retorna (registros, páginas com mudança)."""
+    plan = scheduler.plan(budget, exploration, platforms)
+    print(f"{len(plan)} anúncios na rodada ({sum(item['novo'] for item in plan)} novos)")
+    limiter, board, stats = RateLimiter(), CircuitBreakerBoard(), RunStats()
+    drivers, records, with_changes = {}, [], 0
+    try:
+        for item in plan:
+            plataforma = item['plataforma']
+            if not board.allow(plataforma):
+                stats.record_skip(plataforma)
+                continue
+            try:
+                if plataforma not in drivers:
+                    drivers[plataforma] = start_driver(PLATFORMS[plataforma][0], plataforma=plataforma, use_profile=use_profiles)
+            except Exception as e:
+                print(f"[{plataforma}] Não foi possível iniciar o navegador: {e}")
+                continue
+            limiter.acquire(plataforma)
+            start = time.time()
+            try:
+                record = PLATFORMS[plataforma][2](item['link_anuncio'], drivers[plataforma], include_description=False)
+                stats.record_page(plataforma, time.time() - start)
+                board.record_success(plataforma)
+            except UnusablePageError as e:
+                stats.record_page(plataforma, time.time() - start, e.page_class)
+                if e.is_block: board.record_failure(plataforma, e.page_class)
+                print(f"Página descartada: {e}")
+                continue
+            except Exception as e:
+                print(f"Erro ao visitar {item['link_anuncio']}: {type(e).__name__} - {e}")
+                stop_driver(drivers.pop(plataforma))
+                continue
+            record['plataforma'] = plataforma
+            changed = scheduler.observe(record)
+            if changed:
+                with_changes += 1
+                print(f"[{plataforma}] mudou {', '.join(changed)}: {record.get('titulo')}")
+            records.append(record)
+            if on_record: on_record(record)
+            time.sleep(random.uniform(2, 4))
+    finally:
+        for driver in drivers.values():
+            stop_driver(driver)
+    print(stats.summary())
+    return records, with_changes
+
+
+def simulate(n_listings=2000, days=30, budget=200, new_per_day=40, exploration=EXPLORATION_SHARE, seed=0):
+    """
+    Compara a recoleta priorizada com a uniforme (sempre o anúncio visitado há
+    mais tempo) num mercado simulado: taxas de mudança log-normais (a maioria
+    parada, alguns mudando todo dia) e anúncios novos surgindo a cada dia.
+    Retorna mudanças de preço detectadas por página em cada estratégia.
+    """
+    rng = np.random.default_rng(seed)
+    total = n_listings + new_per_day * days
+    rates = np.minimum(rng.lognormal(np.log(0.05), 1.5, size=total), 3.0)  # mudanças por dia
+    prices = rng.uniform(30, 300, size=total)
+    links = [f"https://produto.mercadolivre.com.br/MLB-{1000000000 + i}-sim-_JM" for i in range(total)]
+    born = np.concatenate([np.zeros(n_listings, dtype=int), np.repeat(np.arange(1, days + 1), new_per_day)])
+
+    scheduler = RecrawlScheduler(':memory:')
+    uniform_seen, uniform_last = {}, {}
+    detected = {'priorizada': 0, 'uniforme': 0}
+    day0 = time.time()
+    for day in range(days + 1):
+        now = day0 + day * 86400
+        alive = np.flatnonzero(born <= day)
+        if day > 0:
+            events = rng.poisson(rates[alive]) > 0
+            prices[alive[events]] *= rng.uniform(0.85, 1.15, size=events.sum())
+        for i in np.flatnonzero(born == day):
+            scheduler.discover(links[i], 'mercado_livre', now)
+
+        # Priorizada
+        for item in scheduler.plan(budget, exploration, now=now):
+            i = int(item['link_anuncio'].split('MLB-')[1].split('-')[0]) - 1000000000
+            changed = scheduler.observe({'plataforma': 'mercado_livre', 'link_anuncio': links[i], 'preco': round(prices[i], 2)}, now)
+            detected['priorizada'] += 'preco' in changed
+        # Uniforme: nunca visitados primeiro, depois o visitado há mais tempo
+        for i in sorted(alive, key=lambda i: uniform_last.get(i, -1))[:budget]:
+            if i in uniform_seen and _changed('preco', uniform_seen[i], round(prices[i], 2)):
+                detected['uniforme'] += 1
+            uniform_seen[i], uniform_last[i] = round(prices[i], 2), now
+    scheduler.close()
+    pages = budget * (days + 1)
+    return {estrategia: n / pages for estrategia, n in detected.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recoleta com orçamento de páginas, priorizando anúncios que mudam de preço.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_import = sub.add_parser('importar', help="Soma CSVs da coleta ao histórico de mudanças")
+    p_import.add_argument('arquivos', nargs='+')
+    p_import.add_argument('--so-links', action='store_true', help="Registra os anúncios como novos, sem contar como visita")
+    p_import.add_argument('--data', metavar='AAAA-MM-DD', help="Data da coleta para CSVs sem a coluna data_coleta")
+    p_visit = sub.add_parser('visitar', help="Visita os anúncios com maior chance de mudança")
+    p_visit.add_argument('--orcamento', type=int, default=100, help="Páginas de produto nesta rodada")
+    p_visit.add_argument('--exploracao', type=float, default=EXPLORATION_SHARE, help="Fração do orçamento para anúncios novos")
+    p_visit.add_argument('--plataformas', nargs='+', choices=list(PLATFORMS), default=None)
+    p_visit.add_argument('--perfis', action='store_true')
+    p_visit.add_argument('--alertas', nargs='?', const='regras_alertas.json', default=None, metavar='REGRAS')
+    p_visit.add_argument('--saida', default='recoleta.csv')
+    p_sim = sub.add_parser('simular', help="Compara com a recoleta uniforme num mercado simulado")
+    p_sim.add_argument('--anuncios', type=int, default=2000)
+    p_sim.add_argument('--dias', type=int, default=30)
+    p_sim.add_argument('--orcamento', type=int, default=200)
+    parser.add_argument('--db', default=DEFAULT_DB)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    if args.comando == 'importar':
+        scheduler = RecrawlScheduler(args.db)
+        for path in args.arquivos:
+            try:
+                rows, changed = import_csv(scheduler, path, args.so_links, args.data)
+            except ValueError as e:
+                parser.error(str(e))
+            print(f"{path}: {rows} registros, {changed} {'novos' if args.so_links else 'com mudança'}")
+        print(scheduler.summary())
+        scheduler.close()
+    elif args.comando == 'visitar':
+        scheduler = RecrawlScheduler(args.db)
+        alerts = create_alert_engine(args.alertas) if args.alertas else None
+        records, with_changes = run_recrawl(scheduler, args.orcamento, args.exploracao, args.plataformas,
+                                            args.perfis, alerts.process if alerts else None)
+        if alerts: alerts.close()
+        print(f"{with_changes} de {len(records)} páginas com mudança")
+        scheduler.close()
+        save_to_csv(records, args.saida)
+    else:
+        result = simulate(args.anuncios, args.dias, args.orcamento)
+        print(f"Mudanças de preço por página: priorizada {result['priorizada']:.3f}, uniforme {result['uniforme']:.3f}")
+    print(f"Finalizado em {(time.time() - start_time)/60:.2f} minutos")
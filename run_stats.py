@@ -0,0 +1,64 @@
+import time
+from collections import defaultdict
+
+from page_guard import NORMAL
+
+# ========== Estatísticas da execução ==========
+# O tempo economizado é medido contra o custo real de uma página normal da
+# plataforma nesta execução (média das durações de record_page): cada job
+# pulado pelo circuit breaker poupa uma página média, e as páginas bloqueadas
+# abandonadas logo após a navegação poupam a diferença entre uma página média
+# e o tempo gasto nelas. Sem nenhuma página normal medida não há estimativa.
+
+
+class RunStats:
+    def __init__(self):
+        self.start = time.time()
+        self.pages = defaultdict(int)
+        self.page_seconds = defaultdict(float)
+        self.classes = defaultdict(lambda: defaultdict(int))
+        self.skipped = defaultdict(int)
+        self.unusable = defaultdict(int)
+        self.unusable_seconds = defaultdict(float)
+        self.extra_saved = defaultdict(float)
+
+    def average_page_seconds(self, plataforma):
+        """Duração média das páginas normais da plataforma; None antes da primeira."""
+        if not self.pages[plataforma]: return None
+        return self.page_seconds[plataforma] / self.pages[plataforma]
+
+    def record_page(self, plataforma, seconds, page_class=NORMAL):
+        self.classes[plataforma][page_class] += 1
+        if page_class == NORMAL:
+            self.pages[plataforma] += 1
+            self.page_seconds[plataforma] += seconds
+        else:
+            self.unusable[plataforma] += 1
+            self.unusable_seconds[plataforma] += seconds
+
+    def record_skip(self, plataforma, count=1):
+        """Job não enviado porque o circuit breaker da plataforma estava aberto."""
+        self.skipped[plataforma] += count
+
+    def record_saving(self, plataforma, seconds):
+        """Economia medida diretamente (ex: espera pelo banner de cookies evitada)."""
+        self.extra_saved[plataforma] += seconds
+
+    def saved_seconds(self, plataforma):
+        """Tempo economizado na plataforma, ou None se faltou página normal para estimar os pulos e bloqueios."""
+        average = self.average_page_seconds(plataforma)
+        if average is None:
+            return None if self.skipped[plataforma] or self.unusable[plataforma] else self.extra_saved[plataforma]
+        abandoned = max(0.0, self.unusable[plataforma] * average - self.unusable_seconds[plataforma])
+        return self.skipped[plataforma] * average + abandoned + self.extra_saved[plataforma]
+
+    def summary(self):
+        lines = [f"Tempo total: {(time.time() - self.start)/60:.2f} minutos"]
+        for plataforma in sorted(set(self.classes) | set(self.skipped) | set(self.extra_saved)):
+            classes = ', '.join(f"{k}: {v}" for k, v in sorted(self.classes[plataforma].items())) or '-'
+            saved = self.saved_seconds(plataforma)
+            lines.append(
+                f"  {plataforma}: páginas [{classes}] | jobs pulados: {self.skipped[plataforma]} | "
+                f"tempo economizado: {'sem página normal medida' if saved is None else format(saved / 60, '.1f') + ' min'}"
+            )
+        return '\n'.join(lines)
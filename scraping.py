@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import re
 import time
@@ -6,6 +7,7 @@ from datetime import datetime
 from magazine_scraper import (
     setup_driver as setup_magalu,
     search_magalu_and_get_links,
+    search_magalu_listings,
     scrape_magalu_product,
     clean_price,
     extract_review_count
@@ -13,8 +15,17 @@ from magazine_scraper import (
 from mercado_scraper import (
     setup_driver as setup_ml,
     search_mercado_livre_and_get_links,
+    search_mercado_livre_listings,
     scrape_mercado_livre_product
 )
+from browser_profiles import get_profile_manager, banner_report
+from circuit_breaker import CircuitBreakerBoard
+from page_guard import UnusablePageError
+from price_alerts import create_alert_engine
+from proxy_pool import NoHealthyExitError, configure_proxy_pool, get_proxy_pool, report_page
+from rate_limit import RateLimiter
+from run_stats import RunStats
+from tab_pipeline import scrape_pipelined
 
 # ========= Configuração =========
 queries = [
@@ -27,63 +38,318 @@ user_agents = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.1 Safari/605.1.15"
 ]
 
+# ========= Plataformas =========
+PLATFORMS = {
+    'magalu': (setup_magalu, search_magalu_and_get_links, scrape_magalu_product),
+    'mercado_livre': (setup_ml, search_mercado_livre_and_get_links, scrape_mercado_livre_product),
+}
+
+# Busca em "modo listagem": devolve registros parciais direto dos cards
+LISTING_SEARCH = {
+    'magalu': search_magalu_listings,
+    'mercado_livre': search_mercado_livre_listings,
+}
+
+def start_driver(setup_func, extra_arguments=None, plataforma=None, use_profile=False):
+    """
+    Inicia o navegador com user-agent aleatório. Com use_profile, usa um perfil
+    persistente da plataforma (cookies, consentimento e cache HTTP); se todos os
+    slots estiverem ocupados, restaura o cookie jar mais recente numa sessão nova.
+    Se houver proxies configurados (--proxies), o navegador fica preso a uma saída.
+    """
+    extra = list(extra_arguments or [])
+    profile = None
+    if use_profile and plataforma:
+        profile = get_profile_manager(plataforma).acquire()
+        if profile: extra.append(f"--user-data-dir={profile.chrome_dir}")
+    pool = get_proxy_pool()
+    proxy_exit = pool.acquire(plataforma) if pool and plataforma else None
+    try:
+        kwargs = {'proxy': proxy_exit.url} if proxy_exit else {}
+        driver = setup_func(extra, **kwargs) if extra or kwargs else setup_func()
+    except Exception:
+        if profile: get_profile_manager(plataforma).release(profile)
+        if proxy_exit: pool.release(proxy_exit)
+        raise
+    driver.saida = proxy_exit
+    driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": random.choice(user_agents)})
+    if profile:
+        driver.perfil = profile
+        driver.consentimento_salvo = profile.consent
+    elif use_profile and plataforma:
+        jar = get_profile_manager(plataforma).latest_cookie_jar()
+        if jar and jar.restore_cookies(driver):
+            driver.consentimento_salvo = jar.consent
+    return driver
+
+def stop_driver(driver):
+    """Fecha o navegador, salvando antes cookies/consentimento no perfil persistente (se houver)."""
+    if driver is None: return
+    profile = getattr(driver, 'perfil', None)
+    if profile is not None:
+        get_profile_manager(profile.plataforma).release(profile, driver)
+    proxy_exit = getattr(driver, 'saida', None)
+    if proxy_exit is not None and get_proxy_pool():
+        get_proxy_pool().release(proxy_exit)
+    driver.quit()
+
+def missing_fields(record, fields):
+    return [f for f in fields if record.get(f) in (None, '')]
+
+def complete_missing_fields(record, scrape_func, driver, fields=('descricao',)):
+    """Visita a página do produto só se algum dos campos pedidos não veio do card."""
+    missing = missing_fields(record, fields)
+    if not missing: return record, False
+    page = scrape_func(record['link_anuncio'], driver)
+    for field in LISTING_COLUMNS:
+        if record.get(field) in (None, '') and page.get(field) not in (None, ''):
+            record[field] = page[field]
+    return record, True
+
 # ========= Salvamento =========
+# Campos de um registro lido do card de busca (modo listagem); os que o card não traz ficam None
+LISTING_FIELDS = ['link_anuncio', 'titulo', 'preco', 'vendedor', 'avaliacao_nota', 'avaliacao_numero', 'descricao']
+LISTING_COLUMNS = LISTING_FIELDS[1:]
+CSV_COLUMNS = ['plataforma', 'link_anuncio', 'titulo', 'preco', 'vendedor', 'avaliacao_nota', 'avaliacao_numero', 'descricao', 'data_coleta']
+
 def save_to_csv(data, filename):
     if not data:
         print("Nenhum dado coletado.")
         return
     df = pd.DataFrame(data)
-    cols = ['plataforma', 'link_anuncio', 'titulo', 'preco', 'vendedor', 'avaliacao_nota', 'avaliacao_numero', 'descricao']
-    for col in cols:
+    if 'data_coleta' not in df.columns:
+        df['data_coleta'] = datetime.now().strftime('%Y-%m-%d')
+    for col in CSV_COLUMNS:
         if col not in df.columns:
             df[col] = None
-    df = df[cols]
+    df = df[CSV_COLUMNS]
     df.to_csv(filename, index=False, sep=';', encoding='utf-8-sig')
     print(f"CSV salvo em: {filename}")
 
 # ========= Execução =========
-if __name__ == '__main__':
-    num = input("Quantos produtos por termo de busca? (Padrão: 2): ")
-    num = int(num) if num.isdigit() else 2
-    all_data = []
-    start_time = time.time()
+def run_guarded(plataforma, board, stats, func, *args, **kwargs):
+    """
+    Executa uma etapa que abre página respeitando o circuit breaker da plataforma.
+    Páginas bloqueadas/captcha alimentam o breaker; retorna (ok, resultado).
+    Com proxy, o bloqueio conta para a saída do navegador e não para a plataforma.
+    """
+    if not board.allow(plataforma):
+        stats.record_skip(plataforma)
+        return False, None
+    # O navegador da etapa sempre vem entre os argumentos (busca e produto)
+    driver = next((a for a in args if getattr(a, 'saida', None) is not None), None)
+    start = time.time()
+    try:
+        result = func(*args, **kwargs)
+    except UnusablePageError as e:
+        stats.record_page(plataforma, time.time() - start, e.page_class)
+        if e.is_block and not report_page(driver, e.page_class): board.record_failure(plataforma, e.page_class)
+        print(f"Página descartada: {e}")
+        return False, None
+    stats.record_page(plataforma, time.time() - start)
+    report_page(driver)
+    board.record_success(plataforma)
+    return True, result
+
+def platform_paused(plataforma, board, stats, pending_jobs):
+    """Se o breaker está aberto, conta os jobs como pulados sem nem esperar as pausas."""
+    if board.seconds_until_retry(plataforma) > 0:
+        stats.record_skip(plataforma, pending_jobs)
+        print(f"{plataforma} pausada pelo circuit breaker ({board.seconds_until_retry(plataforma)/60:.1f} min restantes).")
+        return True
+    return False
 
-    scrapers = [
-        ('magalu', setup_magalu, search_magalu_and_get_links, scrape_magalu_product),
-        ('mercado_livre', setup_ml, search_mercado_livre_and_get_links, scrape_mercado_livre_product)
-    ]
+def pause_without_exit(plataforma, board, error):
+    """Nenhuma saída de proxy disponível: pausa a plataforma no breaker até a primeira saída voltar."""
+    print(error)
+    board.pause(plataforma, error.retry_in, 'sem_saida')
 
-    for plataforma, setup_func, search_func, scrape_func in scrapers:
+def run_full_mode(num, include_description=True, board=None, stats=None, use_profiles=False, on_record=None, on_links=None):
+    """
+    Modo original: busca os links e abre a página de cada produto.
+    Com include_description=False a descrição fica para description_stage.py.
+    on_links(links, plataforma) recebe os links de cada busca (ex: --recoleta).
+    """
+    board, stats = board or CircuitBreakerBoard(), stats or RunStats()
+    all_data = []
+    for plataforma, (setup_func, search_func, scrape_func) in PLATFORMS.items():
         print(f"\n{'='*30} {plataforma.upper()} {'='*30}")
         for termo in queries:
             print(f"\n>>> Termo: {termo}")
+            if platform_paused(plataforma, board, stats, 1 + num): continue
             time.sleep(random.uniform(8, 15))  # tempo entre buscas
 
+            driver = None
             try:
-                driver = setup_func()
-                driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": random.choice(user_agents)})
-                links = search_func(termo, driver, max_links=num)
+                driver = start_driver(setup_func, plataforma=plataforma, use_profile=use_profiles)
+                _, links = run_guarded(plataforma, board, stats, search_func, termo, driver, max_links=num)
+                links = links or []
+                if on_links and links: on_links(links, plataforma)
+            except NoHealthyExitError as e:
+                pause_without_exit(plataforma, board, e)
+                links = []
             except Exception as e:
                 print(f"Erro ao buscar links: {e}")
                 links = []
             finally:
-                driver.quit()
+                stop_driver(driver)
 
             for i, link in enumerate(links):
+                if platform_paused(plataforma, board, stats, len(links) - i): break
                 print(f"({i+1}/{len(links)}) Raspando: {link}")
+                driver = None
                 try:
-                    driver = setup_func()
-                    driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": random.choice(user_agents)})
+                    driver = start_driver(setup_func, plataforma=plataforma, use_profile=use_profiles)
                     time.sleep(random.uniform(3, 6))
-                    item = scrape_func(link, driver)
-                    item['plataforma'] = plataforma
-                    all_data.append(item)
+                    ok, item = run_guarded(plataforma, board, stats, scrape_func, link, driver, include_description=include_description)
+                    if ok:
+                        item['plataforma'] = plataforma
+                        all_data.append(item)
+                        if on_record: on_record(item)
+                except NoHealthyExitError as e:
+                    pause_without_exit(plataforma, board, e)
                 except Exception as e:
                     print(f"Erro ao raspar produto: {e}")
                 finally:
-                    driver.quit()
+                    stop_driver(driver)
                     time.sleep(random.uniform(8, 15))  # tempo entre produtos
+    return all_data
+
+def run_pipelined_mode(num, include_description=True, tabs=None, board=None, stats=None, use_profiles=False, on_record=None,
+                       on_links=None):
+    """
+    Modo com abas em paralelo: uma sessão por termo faz a busca e depois
+    extrai os produtos enquanto os próximos carregam em abas de fundo.
+    """
+    board, stats = board or CircuitBreakerBoard(), stats or RunStats()
+    all_data = []
+    limiter = RateLimiter()
+    for plataforma, (setup_func, search_func, _) in PLATFORMS.items():
+        print(f"\n{'='*30} {plataforma.upper()} (abas) {'='*30}")
+        for termo in queries:
+            print(f"\n>>> Termo: {termo}")
+            if platform_paused(plataforma, board, stats, 1 + num): continue
+            time.sleep(random.uniform(8, 15))  # tempo entre buscas
+            driver = None
+            try:
+                driver = start_driver(setup_func, plataforma=plataforma, use_profile=use_profiles)
+                limiter.acquire(plataforma)
+                _, links = run_guarded(plataforma, board, stats, search_func, termo, driver, max_links=num)
+                links = links or []
+                if on_links and links: on_links(links, plataforma)
+                last = time.time()
+                try:
+                    for i, (link, item) in enumerate(scrape_pipelined(links, driver, plataforma, tabs, limiter, include_description)):
+                        print(f"({i+1}/{len(links)}) Raspado: {link}")
+                        elapsed, last = time.time() - last, time.time()
+                        if item is None: continue  # extração falhou: não conta como página normal
+                        stats.record_page(plataforma, elapsed)
+                        report_page(driver)
+                        board.record_success(plataforma)
+                        item['plataforma'] = plataforma
+                        all_data.append(item)
+                        if on_record: on_record(item)
+                except UnusablePageError as e:
+                    stats.record_page(plataforma, time.time() - last, e.page_class)
+                    if not report_page(driver, e.page_class): board.record_failure(plataforma, e.page_class)
+                    print(f"Página bloqueada, abandonando o termo: {e}")
+            except NoHealthyExitError as e:
+                pause_without_exit(plataforma, board, e)
+            except Exception as e:
+                print(f"Erro no termo '{termo}': {e}")
+            finally:
+                stop_driver(driver)
+    return all_data
+
+def run_listing_mode(num, max_pages=5, required_fields=(), board=None, stats=None, use_profiles=False, on_record=None,
+                     on_links=None):
+    """
+    Modo listagem: os registros saem direto dos cards da busca (com paginação).
+    A página do produto só é aberta se faltar algum campo de required_fields
+    (ex: 'descricao'), o que reduz muito o número de páginas por registro.
+    """
+    board, stats = board or CircuitBreakerBoard(), stats or RunStats()
+    all_data, product_pages = [], 0
+    for plataforma, (setup_func, _, scrape_func) in PLATFORMS.items():
+        print(f"\n{'='*30} {plataforma.upper()} (listagem) {'='*30}")
+        for termo in queries:
+            print(f"\n>>> Termo: {termo}")
+            if platform_paused(plataforma, board, stats, max_pages): continue
+            time.sleep(random.uniform(8, 15))  # tempo entre buscas
+            driver = None
+            try:
+                driver = start_driver(setup_func, plataforma=plataforma, use_profile=use_profiles)
+                _, records = run_guarded(plataforma, board, stats, LISTING_SEARCH[plataforma], termo, driver, max_items=num, max_pages=max_pages)
+                records = records or []
+                print(f"{len(records)} registros lidos dos cards.")
+                if on_links and records: on_links([r['link_anuncio'] for r in records], plataforma)
+                for record in records:
+                    record['plataforma'] = plataforma
+                    if required_fields and missing_fields(record, required_fields) and not platform_paused(plataforma, board, stats, 1):
+                        time.sleep(random.uniform(3, 6))
+                        try:
+                            ok, result = run_guarded(plataforma, board, stats, complete_missing_fields, record, scrape_func, driver, required_fields)
+                            product_pages += bool(ok and result[1])
+                        except Exception as e:
+                            print(f"Erro ao completar {record['link_anuncio']}: {e}")
+                    all_data.append(record)
+                    if on_record: on_record(record)
+            except NoHealthyExitError as e:
+                pause_without_exit(plataforma, board, e)
+            except Exception as e:
+                print(f"Erro na busca em modo listagem: {e}")
+            finally:
+                stop_driver(driver)
+    print(f"Páginas de produto abertas: {product_pages} para {len(all_data)} registros")
+    return all_data
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Coleta unificada Magalu + Mercado Livre.")
+    parser.add_argument('--por-termo', type=int, default=None, help="Produtos por termo de busca")
+    parser.add_argument('--modo', choices=['completo', 'listagem'], default='completo',
+                        help="'listagem' lê os dados dos cards da busca, sem abrir cada produto")
+    parser.add_argument('--paginas', type=int, default=5, help="Máximo de páginas de resultado por termo (modo listagem)")
+    parser.add_argument('--com-descricao', action='store_true', help="No modo listagem, abre o produto para buscar a descrição")
+    parser.add_argument('--abas', type=int, nargs='?', const=0, default=None,
+                        help="No modo completo, carrega produtos em várias abas da mesma sessão (sem valor: padrão por plataforma)")
+    parser.add_argument('--perfis', action='store_true', help="Reaproveita perfis de navegador por plataforma (cookies, consentimento, cache)")
+    parser.add_argument('--sem-descricao', action='store_true', help="No modo completo, não coleta a descrição (ver description_stage.py)")
+    parser.add_argument('--alertas', nargs='?', const='regras_alertas.json', default=None, metavar='REGRAS',
+                        help="Confere cada registro coletado contra as regras de alerta de preço (price_alerts.py)")
+    parser.add_argument('--proxies', nargs='?', const='proxies.json', default=None, metavar='CONFIG',
+                        help="Prende cada navegador a uma saída de proxy da plataforma (proxy_pool.py). Aqui o ritmo "
+                             "continua por plataforma; para a vazão crescer com o número de saídas, use async_pipeline.py --proxies")
+    parser.add_argument('--recoleta', nargs='?', const='recoleta.sqlite', default=None, metavar='DB',
+                        help="Registra os anúncios achados nas buscas como novos na recoleta priorizada (recrawl_scheduler.py)")
+    args = parser.parse_args()
+
+    num = args.por_termo
+    if num is None:
+        num = input("Quantos produtos por termo de busca? (Padrão: 2): ")
+        num = int(num) if num.isdigit() else 2
+    start_time = time.time()
+    board, stats = CircuitBreakerBoard(), RunStats()
+    alerts = create_alert_engine(args.alertas) if args.alertas else None
+    on_record = alerts.process if alerts else None
+    proxies = configure_proxy_pool(args.proxies)
+    recrawl, on_links = None, None
+    if args.recoleta:
+        from recrawl_scheduler import RecrawlScheduler  # recrawl_scheduler importa este módulo
+        recrawl = RecrawlScheduler(args.recoleta)
+        on_links = lambda links, plataforma: [recrawl.discover(link, plataforma) for link in links]
+
+    if args.modo == 'listagem':
+        all_data = run_listing_mode(num, args.paginas, ('descricao',) if args.com_descricao else (), board, stats, args.perfis, on_record, on_links)
+    elif args.abas is not None:
+        all_data = run_pipelined_mode(num, include_description=not args.sem_descricao, tabs=args.abas or None, board=board, stats=stats, use_profiles=args.perfis, on_record=on_record, on_links=on_links)
+    else:
+        all_data = run_full_mode(num, include_description=not args.sem_descricao, board=board, stats=stats, use_profiles=args.perfis, on_record=on_record, on_links=on_links)
+    if alerts: alerts.close()
+    if recrawl: recrawl.close()
+    print(stats.summary())
+    if proxies: print(proxies.report())
+    if args.perfis: print("Banners de cookies:\n" + banner_report(PLATFORMS))
 
     filename = f"scraping_unificado.csv"
     save_to_csv(all_data, filename)
-    print(f"Processo finalizado em {(time.time() - start_time)/60:.2f} minutos")
\ No newline at end of file
+    print(f"Processo finalizado em {(time.time() - start_time)/60:.2f} minutos")
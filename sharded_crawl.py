@@ -0,0 +1,239 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from datetime import datetime
+
+try:
+    import resource  # indisponível no Windows
+except ImportError:
+    resource = None
+
+from circuit_breaker import CircuitBreakerBoard
+from page_guard import UnusablePageError
+from proxy_pool import get_proxy_pool
+from rate_limit import SharedRateLimiter
+from run_stats import RunStats
+from work_queue import LeaseHeartbeat, ResultSink, WorkQueue
+from scraping import PLATFORMS, queries, start_driver, stop_driver, save_to_csv
+
+# ========= Coleta distribuída =========
+# N processos, cada um com seu próprio Chrome, consomem jobs de busca e de
+# produto de uma fila SQLite compartilhada. O ritmo por domínio é global
+# (SharedRateLimiter), então a vazão cresce com os workers até bater no limite
+# configurado em rate_limit.DOMAIN_MIN_INTERVAL. O circuit breaker também é
+# compartilhado: se uma plataforma começa a bloquear, todos os workers param
+# de pegar jobs dela até o teste após o tempo de espera passar.
+
+DEFAULT_DB = 'crawl_fila.sqlite'
+SEARCH_PRIORITY = 0
+PRODUCT_PRIORITY = 10  # produtos antes de novas buscas: mantém a fila curta
+
+
+def seed_queue(queue, platforms, terms, per_term):
+    added = 0
+    for plataforma in platforms:
+        for termo in terms:
+            if queue.enqueue('busca', plataforma, {'termo': termo, 'max_links': per_term},
+                             priority=SEARCH_PRIORITY, dedupe_key=f"busca:{plataforma}:{termo}:{per_term}"):
+                added += 1
+    return added
+
+
+def process_tree_rss_mb(pid):
+    """Soma a memória residente do processo e de todos os descendentes (Linux, via /proc)."""
+    try:
+        children = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit(): continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(entry))
+            except (OSError, ValueError, IndexError):
+                continue
+        total_kb, stack = 0, [pid]
+        while stack:
+            current = stack.pop()
+            try:
+                with open(f'/proc/{current}/status') as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total_kb += int(line.split()[1])
+                            break
+            except OSError:
+                pass
+            stack.extend(children.get(current, []))
+        return total_kb / 1024
+    except OSError:
+        # Fora do Linux: mede só o próprio processo Python (quando possível)
+        if resource is None: return 0.0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class DriverSlot:
+    """Um navegador por plataforma dentro do worker, reciclado por número de páginas ou memória."""
+
+    def __init__(self, plataforma, max_pages, max_memory_mb, use_profiles=False):
+        self.plataforma = plataforma
+        self.use_profiles = use_profiles
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.driver = None
+        self.pages = 0
+
+    def get(self):
+        if self.driver is not None and self._should_recycle():
+            self.quit()
+        if self.driver is None:
+            setup_func = PLATFORMS[self.plataforma][0]
+            extra = [f"--js-flags=--max-old-space-size={max(self.max_memory_mb // 4, 128)}"] if self.max_memory_mb else None
+            self.driver = start_driver(setup_func, extra, self.plataforma, self.use_profiles)
+            self.pages = 0
+        self.pages += 1
+        return self.driver
+
+    def _should_recycle(self):
+        if self.max_pages and self.pages >= self.max_pages:
+            return True
+        if self.max_memory_mb and process_tree_rss_mb(os.getpid()) > self.max_memory_mb:
+            print(f"[{self.plataforma}] Limite de memória atingido, reiniciando navegador...")
+            return True
+        return False
+
+    def quit(self):
+        if self.driver is not None:
+            try: stop_driver(self.driver)
+            except Exception: pass
+        self.driver = None
+
+
+def run_job(job, slot, queue, sink, limiter, worker_id, include_description=True):
+    plataforma = job['plataforma']
+    _, search_func, scrape_func = PLATFORMS[plataforma]
+    payload = job['payload']
+
+    limiter.acquire(plataforma)
+    driver = slot.get()
+
+    if job['kind'] == 'busca':
+        links = search_func(payload['termo'], driver, max_links=payload['max_links'])
+        for link in links:
+            queue.enqueue('produto', plataforma, {'url': link, 'termo': payload['termo']},
+                          priority=PRODUCT_PRIORITY, dedupe_key=f"produto:{plataforma}:{link}")
+        print(f"[{worker_id}] {plataforma} '{payload['termo']}': {len(links)} links")
+    else:
+        item = scrape_func(payload['url'], driver, include_description)
+        item['plataforma'] = plataforma
+        sink.add(job['id'], item, worker_id)
+        print(f"[{worker_id}] {plataforma} raspado: {payload['url']}")
+
+
+def worker_main(worker_id, db_path, platforms, max_per_platform, max_pages, max_memory_mb, lease_seconds, use_profiles=False,
+                include_description=True):
+    # Conexões SQLite são abertas dentro do processo filho (não podem ser herdadas)
+    queue = WorkQueue(db_path)
+    sink = ResultSink(db_path)
+    limiter = SharedRateLimiter(db_path)
+    board = CircuitBreakerBoard(db_path)
+    stats = RunStats()
+    slots = {p: DriverSlot(p, max_pages, max_memory_mb, use_profiles) for p in platforms}
+    try:
+        while True:
+            paused = set(board.open_platforms())
+            available = [p for p in platforms if p not in paused]
+            job = queue.lease(worker_id, lease_seconds=lease_seconds, platforms=available, max_per_platform=max_per_platform) if available else None
+            if job is None:
+                if not queue.has_unfinished():
+                    break
+                time.sleep(random.uniform(1, 3))
+                continue
+            plataforma = job['plataforma']
+            if not board.allow(plataforma, worker_id):
+                # Outro worker está fazendo a página de teste desta plataforma
+                queue.release(job['id'], worker_id, delay=30)
+                continue
+            start = time.time()
+            try:
+                with LeaseHeartbeat(db_path, job['id'], worker_id, lease_seconds):
+                    run_job(job, slots[plataforma], queue, sink, limiter, worker_id, include_description)
+                queue.complete(job['id'], worker_id)
+                stats.record_page(plataforma, time.time() - start)
+                board.record_success(plataforma)
+            except UnusablePageError as e:
+                stats.record_page(plataforma, time.time() - start, e.page_class)
+                if e.is_block:
+                    cooldown = board.record_failure(plataforma, e.page_class)
+                    # A tentativa conta: com a plataforma bloqueada de vez, o job acaba falhando e a coleta termina
+                    queue.release(job['id'], worker_id, delay=cooldown, count_attempt=True, reason=f"bloqueio: {e.page_class}")
+                else:
+                    print(f"[{worker_id}] {e}")
+                    queue.complete(job['id'], worker_id)  # página não existe: não adianta repetir
+            except Exception as e:
+                print(f"[{worker_id}] Erro no job {job['id']} ({job['kind']}): {type(e).__name__} - {e}")
+                # Navegador pode ter ficado em estado ruim: começa do zero no próximo job
+                slots[job['plataforma']].quit()
+                queue.fail(job['id'], worker_id, f"{type(e).__name__}: {e}")
+    finally:
+        for slot in slots.values():
+            slot.quit()
+        print(f"[{worker_id}] {stats.summary()}")
+        queue.close(); sink.close(); limiter.close(); board.close()
+
+
+def run_sharded(db_path, workers, platforms, max_per_platform=None, max_pages=25, max_memory_mb=1500, lease_seconds=300, use_profiles=False,
+                include_description=True):
+    if get_proxy_pool() is not None:
+        # Os workers são processos novos (spawn) e cada um teria saídas com saúde e orçamento próprios
+        raise ValueError("sharded_crawl não usa proxies: use async_pipeline.py --proxies")
+    ctx = multiprocessing.get_context('spawn')
+    procs = []
+    for n in range(workers):
+        worker_id = f"w{n + 1}-{os.getpid()}"
+        p = ctx.Process(target=worker_main, name=worker_id,
+                        args=(worker_id, db_path, platforms, max_per_platform, max_pages, max_memory_mb, lease_seconds, use_profiles,
+                              include_description))
+        p.start()
+        procs.append(p)
+    for p in procs:
+        p.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Coleta distribuída em vários processos com fila SQLite compartilhada.")
+    parser.add_argument('--workers', type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    parser.add_argument('--por-termo', type=int, default=2, help="Produtos por termo de busca")
+    parser.add_argument('--plataformas', nargs='+', default=list(PLATFORMS), choices=list(PLATFORMS))
+    parser.add_argument('--max-por-plataforma', type=int, default=None, help="Workers simultâneos por plataforma")
+    parser.add_argument('--max-memoria-mb', type=int, default=1500, help="Memória máxima por worker (Python + Chrome)")
+    parser.add_argument('--paginas-por-driver', type=int, default=25, help="Páginas antes de reiniciar o navegador")
+    parser.add_argument('--perfis', action='store_true', help="Perfis de navegador persistentes por plataforma (um slot por worker)")
+    parser.add_argument('--sem-descricao', action='store_true', help="Não coleta a descrição (ver description_stage.py)")
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--reiniciar', action='store_true', help="Apaga a fila existente antes de começar")
+    parser.add_argument('--saida', default='scraping_unificado.csv')
+    parser.add_argument('--proxies', nargs='?', const='proxies.json', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.proxies:
+        parser.error("--proxies não é suportado aqui (cada worker teria saídas com saúde e orçamento próprios); "
+                     "use async_pipeline.py --proxies")
+
+    if args.reiniciar:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix): os.remove(args.db + suffix)
+
+    start_time = time.time()
+    queue = WorkQueue(args.db)
+    print(f"{seed_queue(queue, args.plataformas, queries, args.por_termo)} buscas adicionadas à fila ({datetime.now():%d/%m/%Y %H:%M})")
+
+    run_sharded(args.db, args.workers, args.plataformas, args.max_por_plataforma,
+                args.paginas_por_driver, args.max_memoria_mb, use_profiles=args.perfis,
+                include_description=not args.sem_descricao)
+
+    print(f"Situação da fila: {queue.counts()}")
+    queue.close()
+    sink = ResultSink(args.db)
+    save_to_csv(sink.records(), args.saida)
+    sink.close()
+    print(f"Processo finalizado em {(time.time() - start_time)/60:.2f} minutos")
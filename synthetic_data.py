@@ -0,0 +1,154 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from hp_catalog import load_catalog
+from scraping import CSV_COLUMNS
+
+# ========== Dados sintéticos para testes de escala ==========
+# Gera CSVs no formato de scraping_unificado.csv com as distribuições
+# observadas na coleta real (135 linhas): ~74% Mercado Livre, vendedores
+# concentrados em poucas lojas, preços log-normais por modelo/capacidade/
+# compatibilidade com alguns valores fora da curva, notas perto de 4,7,
+# número de avaliações bem assimétrico, ~7% sem descrição e frases de
+# rendimento como "até 480 páginas" ou "preto: 2.000 Páginas".
+# A geração é feita em blocos, então 10^7 linhas não precisam caber na memória.
+
+PLATFORM_SHARE = {'mercado_livre': 0.74, 'magalu': 0.26}
+SELLERS = ['OBERO INFORMATICA', 'Inkcor', 'Eshop', 'vanvan', 'TONER SHOPS', 'CASAPRINT SPEED', 'STK',
+           'LUIZCPSB', 'Print Center', 'Tinta Facil', 'Loja do Cartucho', 'InfoStore', 'MEGA TONER']
+# Preço base (R$) do cartucho padrão original; XL, kit e compatível mudam a escala
+BASE_PRICE = {'60': 75, '63': 80, '65': 70, '67': 65, '74': 90, '75': 100, '122': 60, '21': 85, '22': 95,
+              '27': 110, '28': 120, '56': 130, '57': 140, '92': 100, '93': 110, '305': 55, '662': 55, '664': 60,
+              '667': 60, '670': 70, '680': 65, '901': 90, '932': 150, '933': 90, '950': 200, '951': 120,
+              '954': 180, '962': 190, '965': 190, 'GT51': 50, 'GT52': 45}
+TITLE_TEMPLATES = [
+    'Cartucho HP {modelo}{xl} {cor} {tipo}',
+    'Cartucho De Tinta Hp {modelo}{xl} {cor} {tipo}',
+    'Kit Cartucho Hp {modelo}{xl} Preto + Colorido {tipo}',
+    'Cartucho Hp {modelo}{xl} {cor} {tipo} {impressora}',
+    'Refil De Tinta Recarga De Cartucho Hp {modelo} {cor} {tipo}',
+]
+YIELD_PHRASES = [
+    'Rendimento para impressão de até {n} páginas.',
+    'Rendimento Preto {n} paginas',
+    'Cartucho rende até {n} páginas.',
+    'Rendimento aproximado de até: {n_br} Páginas (considerando cobertura de 5%)',
+    'preto: {n_br} Páginas',
+]
+FILLER = ('Imprima os documentos e as fotos de alta qualidade que você precisa por um ótimo valor. '
+          'Conte com os cartuchos de tinta para obter desempenho de impressão consistente. '
+          'Alertas de baixo nível de tinta ajudam a garantir que você não fique sem tinta na hora errada. ')
+PRINTERS = ['DeskJet 2774', 'DeskJet 2136', 'DeskJet 3776', 'DeskJet 2546', 'OfficeJet Pro 8210', 'Ink Tank 416']
+
+
+def format_brazilian_price(value):
+    """154823.5 -> 'R$ 154.823,50'"""
+    inteiro, centavos = f"{value:,.2f}".split('.')
+    return f"R$ {inteiro.replace(',', '.')},{centavos}"
+
+
+def generate_listings(n, seed=0, price_format='numerico', start_id=0):
+    """
+    Gera n anúncios sintéticos. price_format='br' grava o preço como texto
+    ("R$ 1.234,56") em vez de número.
+    """
+    rng = np.random.default_rng(seed)
+    catalog = load_catalog()
+    entries = catalog['modelos']
+    modelos = np.array([e['modelo'] for e in entries])
+    # Modelos populares (662/664/667/122/954) aparecem bem mais
+    weights = np.array([6.0 if m in ('662', '664', '667', '122', '954') else 1.0 for m in modelos])
+    idx = rng.choice(len(modelos), size=n, p=weights / weights.sum())
+    has_xl = np.array([e.get('xl', False) for e in entries])[idx]
+    xl = has_xl & (rng.random(n) < 0.35)
+    compat = rng.random(n) < 0.4
+    template = rng.integers(0, len(TITLE_TEMPLATES), size=n)
+    kit = template == 2
+
+    plataforma = rng.choice(list(PLATFORM_SHARE), size=n, p=list(PLATFORM_SHARE.values()))
+    base = np.array([BASE_PRICE.get(m, 80) for m in modelos])[idx]
+    preco = base * np.where(xl, 2.4, 1.0) * np.where(kit, 1.8, 1.0) * np.where(compat, 0.5, 1.0)
+    preco = preco * rng.lognormal(0.0, 0.25, size=n)
+    outlier = rng.random(n) < 0.02
+    preco = np.round(np.where(outlier, preco * rng.uniform(4, 10, size=n), preco), 2)
+
+    nota = np.round(np.clip(rng.normal(4.7, 0.25, size=n), 1.0, 5.0), 1)
+    nota_missing = rng.random(n) < 0.1
+    avaliacoes = np.round(rng.lognormal(4.5, 1.8, size=n)).clip(1, 50000)
+    seller_weights = 1.0 / np.arange(1, len(SELLERS) + 1)
+    vendedor = np.where(plataforma == 'magalu', 'Magazine Luiza',
+                        np.array(SELLERS)[rng.choice(len(SELLERS), size=n, p=seller_weights / seller_weights.sum())])
+    product_ids = start_id + np.arange(n)
+
+    cores_por_linha = rng.random(n)
+    desc_missing = rng.random(n) < 0.07
+    yield_present = rng.random(n) < 0.6
+    yield_phrase = rng.integers(0, len(YIELD_PHRASES), size=n)
+    filler_repeats = rng.integers(1, 12, size=n)
+    printer = rng.integers(0, len(PRINTERS), size=n)
+
+    rows = []
+    for i in range(n):
+        entry = entries[idx[i]]
+        cores = entry.get('cores') or ['preto']
+        cor = cores[int(cores_por_linha[i] * len(cores))]
+        modelo = entry['modelo']
+        titulo = TITLE_TEMPLATES[template[i]].format(
+            modelo=modelo, xl=' XL' if xl[i] else '', cor=cor.capitalize(),
+            tipo='Compatível' if compat[i] else 'Original', impressora=PRINTERS[printer[i]])
+        if plataforma[i] == 'mercado_livre':
+            link = f"https://produto.mercadolivre.com.br/MLB-{3000000000 + product_ids[i]}-cartucho-hp-{modelo.lower()}-_JM"
+        else:
+            link = f"https://www.magazineluiza.com.br/cartucho-hp-{modelo.lower()}/p/{product_ids[i]:x}sint/in/ctdt/"
+
+        descricao = None
+        if not desc_missing[i]:
+            descricao = f"Cartucho {'Compatível' if compat[i] else 'Original'} HP {modelo}. " + FILLER * filler_repeats[i]
+            if yield_present[i]:
+                table = entry.get('rendimento', {}).get('xl' if xl[i] else 'padrao', {})
+                pages = table.get(cor) or next(iter(table.values()), 200)
+                descricao += YIELD_PHRASES[yield_phrase[i]].format(n=pages, n_br=f"{pages:,}".replace(',', '.'))
+
+        rows.append({
+            'plataforma': plataforma[i], 'link_anuncio': link, 'titulo': titulo,
+            'preco': format_brazilian_price(preco[i]) if price_format == 'br' else preco[i],
+            'vendedor': vendedor[i],
+            'avaliacao_nota': None if nota_missing[i] else nota[i],
+            'avaliacao_numero': None if nota_missing[i] else avaliacoes[i],
+            'descricao': descricao,
+        })
+    df = pd.DataFrame(rows)
+    # ~20% das linhas repetem um anúncio anterior (mesmo produto em termos de busca diferentes)
+    repeat = (rng.random(n) < 0.2) & (np.arange(n) > 0)
+    source = (rng.random(n) * np.arange(n)).astype(int)[repeat]
+    same_listing = ['plataforma', 'link_anuncio', 'titulo', 'vendedor', 'descricao']
+    df.loc[repeat, same_listing] = df.loc[source, same_listing].values
+    return df[[c for c in CSV_COLUMNS if c in df.columns]]
+
+
+def write_synthetic_csv(path, n, seed=0, chunk_size=200_000, price_format='numerico'):
+    """Grava n linhas sintéticas em blocos, no formato de scraping_unificado.csv."""
+    written = 0
+    for chunk, start in enumerate(range(0, n, chunk_size)):
+        size = min(chunk_size, n - start)
+        df = generate_listings(size, seed=seed + chunk, price_format=price_format, start_id=start)
+        df.to_csv(path, sep=';', index=False, mode='w' if chunk == 0 else 'a', header=chunk == 0,
+                  encoding='utf-8-sig' if chunk == 0 else 'utf-8')
+        written += size
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera um CSV sintético no formato da coleta.")
+    parser.add_argument('linhas', type=int)
+    parser.add_argument('--saida', default='scraping_sintetico.csv')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--preco-br', action='store_true', help="Grava o preço como texto no formato 'R$ 1.234,56'")
+    args = parser.parse_args()
+
+    start = time.time()
+    rows = write_synthetic_csv(args.saida, args.linhas, args.semente, price_format='br' if args.preco_br else 'numerico')
+    print(f"{rows} linhas salvas em {args.saida} em {time.time() - start:.1f}s")
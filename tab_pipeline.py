@@ -0,0 +1,100 @@
+from collections import deque
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from magazine_scraper import extract_magalu_product
+from mercado_scraper import extract_mercado_livre_product
+from page_guard import UnusablePageError
+from rate_limit import RateLimiter
+
+# ========== Pipeline de abas ==========
+# Em vez de navegar -> esperar -> extrair uma página por vez, a mesma sessão
+# mantém várias abas abertas: enquanto a aba atual é extraída, as próximas
+# URLs já estão carregando em segundo plano. O número de abas por plataforma
+# é limitado e cada abertura passa pelo limitador por domínio.
+
+TABS_PER_PLATFORM = {
+    'magalu': 3,
+    'mercado_livre': 2,
+}
+EXTRACTORS = {
+    'magalu': extract_magalu_product,
+    'mercado_livre': extract_mercado_livre_product,
+}
+PAGE_LOAD_TIMEOUT = 30
+
+
+def open_background_tab(driver, url):
+    """Abre a URL numa nova aba sem tirar o foco da aba atual. Retorna o handle da nova aba."""
+    before = set(driver.window_handles)
+    driver.execute_script("window.open(arguments[0], '_blank');", url)
+    new_handles = [h for h in driver.window_handles if h not in before]
+    return new_handles[0] if new_handles else None
+
+
+def wait_until_loaded(driver, timeout=PAGE_LOAD_TIMEOUT):
+    try:
+        WebDriverWait(driver, timeout).until(lambda d: d.execute_script("return document.readyState") == 'complete')
+    except Exception:
+        pass  # extrai o que já tiver carregado
+
+
+def scrape_pipelined(urls, driver, plataforma, tabs=None, limiter=None, include_description=True):
+    """
+    Gera (url, item) para cada URL, usando até `tabs` abas ao mesmo tempo na mesma sessão.
+    item é None quando a extração falha. Se uma aba vier bloqueada (captcha/login),
+    levanta UnusablePageError e fecha as demais.
+    """
+    tabs = tabs or TABS_PER_PLATFORM.get(plataforma, 1)
+    limiter = limiter or RateLimiter()
+    extract = EXTRACTORS[plataforma]
+    home = driver.current_window_handle
+    queue = deque(urls)
+    open_tabs = deque()  # (url, handle)
+
+    def prefetch(block):
+        # Abre novas abas enquanto houver espaço; sem bloquear se outra aba já está pronta para extração
+        while queue and len(open_tabs) < tabs:
+            if block and not open_tabs:
+                limiter.acquire(plataforma)
+            elif not limiter.try_acquire(plataforma):
+                return
+            url = queue.popleft()
+            handle = open_background_tab(driver, url)
+            if handle is None:
+                print(f"Não foi possível abrir aba para {url}")
+                continue
+            open_tabs.append((url, handle))
+
+    try:
+        prefetch(block=True)
+        while open_tabs:
+            url, handle = open_tabs.popleft()
+            driver.switch_to.window(handle)
+            wait_until_loaded(driver)
+            # Enquanto esta aba é extraída, as próximas já carregam em segundo plano
+            prefetch(block=False)
+            item, blocked = None, None
+            try:
+                item = extract(url, driver, include_description)
+            except UnusablePageError as e:
+                print(f"Página descartada: {e}")
+                if e.is_block: blocked = e
+            except Exception as e:
+                print(f"Erro ao extrair {url}: {type(e).__name__} - {e}")
+            driver.close()
+            driver.switch_to.window(home)
+            if blocked is not None:
+                raise blocked  # plataforma bloqueando: não adianta extrair as outras abas
+            yield url, item
+            prefetch(block=True)
+    finally:
+        # Fecha abas que ficaram abertas se o consumidor parar no meio
+        for _, handle in open_tabs:
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+            except Exception:
+                pass
+        try: driver.switch_to.window(home)
+        except Exception: pass
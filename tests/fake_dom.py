@@ -0,0 +1,92 @@
+import re
+from html.parser import HTMLParser
+
+# DOM mínimo para testar os parsers de card sem navegador: implementa só o
+# que os scrapers usam do WebElement (find_elements com seletores CSS simples
+# ou ".//tag[@attr]", get_attribute e text).
+
+VOID_TAGS = {'br', 'img', 'input', 'meta', 'link', 'hr', 'source', 'wbr'}
+COMPOUND = re.compile(r"""([a-z0-9]+)|\.([\w-]+)|\[([\w-]+)(?:='([^']*)')?\]|:not\(\.([\w-]+)\)""", re.I)
+
+
+class Element:
+    def __init__(self, tag, attrs, parent=None):
+        self.tag = tag
+        self.attrs = {k: v or '' for k, v in attrs}
+        self.parent = parent
+        self.children = []
+
+    @property
+    def classes(self):
+        return self.attrs.get('class', '').split()
+
+    @property
+    def text(self):
+        parts = []
+        for child in self.children:
+            parts.append(child if isinstance(child, str) else ' ' + child.text + ' ')
+        return ' '.join(''.join(parts).split())
+
+    def get_attribute(self, name):
+        return self.attrs.get(name)
+
+    def descendants(self):
+        for child in self.children:
+            if isinstance(child, Element):
+                yield child
+                yield from child.descendants()
+
+    def find_elements(self, by, selector):
+        if by == 'xpath':
+            match = re.fullmatch(r"\.//(\w+)(?:\[@([\w-]+)\])?", selector)
+            tag, attr = match.groups()
+            return [e for e in self.descendants() if e.tag == tag and (attr is None or attr in e.attrs)]
+        groups = [g.split() for g in selector.split(',')]
+        return [e for e in self.descendants() if any(_matches(e, parts) for parts in groups)]
+
+
+def _matches_compound(element, compound):
+    for tag, cls, attr, value, not_cls in COMPOUND.findall(compound):
+        if tag and element.tag != tag.lower(): return False
+        if cls and cls not in element.classes: return False
+        if attr and (attr not in element.attrs or (value and element.attrs[attr] != value)): return False
+        if not_cls and not_cls in element.classes: return False
+    return True
+
+
+def _matches(element, parts):
+    if not _matches_compound(element, parts[-1]): return False
+    ancestor, remaining = element.parent, parts[:-1]
+    while remaining and ancestor is not None:
+        if _matches_compound(ancestor, remaining[-1]): remaining = remaining[:-1]
+        ancestor = ancestor.parent
+    return not remaining
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.root = Element('#document', [])
+        self.current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        element = Element(tag, attrs, self.current)
+        self.current.children.append(element)
+        if tag not in VOID_TAGS: self.current = element
+
+    def handle_endtag(self, tag):
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root: self.current = node.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+def parse_html(html):
+    """Devolve o primeiro elemento do fragmento (o card)."""
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return next(builder.root.descendants())
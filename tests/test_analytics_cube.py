@@ -0,0 +1,37 @@
+import pandas as pd
+
+from analytics_cube import AnalyticsCube, batch_id_for_file
+
+
+def batch(precos):
+    return pd.DataFrame({
+        'plataforma': 'magalu', 'categoria_produto': 'Suprimento de Impressão', 'modelo_cartucho': '664',
+        'compatibilidade': 'Original', 'capacidade': 'XL', 'vendedor': 'Loja', 'dia': '2026-10-01',
+        'preco': precos, 'avaliacao_nota': 4.5, 'avaliacao_numero': 10, 'custo_por_pagina': 0.1,
+    })
+
+
+def test_version_is_part_of_the_batch_key(tmp_path):
+    csv = tmp_path / 'coleta.csv'
+    csv.write_text('titulo;preco\nCartucho HP 664;50\n')
+    assert batch_id_for_file(csv) != batch_id_for_file(csv, '2-abc')
+    assert batch_id_for_file(csv, '2-abc').startswith(batch_id_for_file(csv) + ':')
+
+
+def test_same_csv_with_new_version_is_not_counted_twice(tmp_path):
+    cube = AnalyticsCube(str(tmp_path / 'cubo.sqlite'))
+    assert cube.add_batch(batch([50.0, 60.0]), batch_id='abc:1-cat') == 1
+    assert cube.add_batch(batch([50.0, 60.0]), batch_id='abc:1-cat') == 0
+    # Enriquecimento novo: o lote antigo continua lá, e somar de novo dobraria as contagens
+    assert cube.add_batch(batch([55.0, 65.0]), batch_id='abc:2-cat') == 0
+    assert cube.query()['n'].sum() == 2
+
+
+def test_reset_rebuilds_with_the_new_version(tmp_path):
+    cube = AnalyticsCube(str(tmp_path / 'cubo.sqlite'))
+    cube.add_batch(batch([50.0, 60.0]), batch_id='abc:1-cat')
+    cube.reset()
+    assert cube.add_batch(batch([55.0, 65.0, 75.0]), batch_id='abc:2-cat') == 1
+    result = cube.query()
+    assert result['n'].sum() == 3
+    assert result['preco_min'].iloc[0] == 55.0
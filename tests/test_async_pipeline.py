@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import async_pipeline
+from rate_limit import RateLimiter
+
+
+class FakeDriver:
+    def __init__(self):
+        self.stopped = False
+
+
+class FakeBrowsers:
+    """Substitui start_driver/stop_driver e conta quantos navegadores estão abertos."""
+
+    def __init__(self):
+        self.started = 0
+        self.open = 0
+        self.max_open = 0
+
+    def start(self, *args, **kwargs):
+        self.started += 1
+        self.open += 1
+        self.max_open = max(self.max_open, self.open)
+        return FakeDriver()
+
+    def stop(self, driver):
+        assert not driver.stopped
+        driver.stopped = True
+        self.open -= 1
+
+
+def search(termo, driver, per_term):
+    return [f"https://www.magazineluiza.com.br/produto/p/{termo}{i}/" for i in range(per_term)]
+
+
+def scrape_ok(link, driver, include_description=True):
+    time.sleep(0.01)  # segura o navegador tempo suficiente para a busca ter de esperar por ele
+    return {'link_anuncio': link, 'titulo': 'Cartucho HP 664', 'preco': 50.0}
+
+
+def scrape_failing(link, driver, include_description=True):
+    time.sleep(0.01)
+    raise RuntimeError("navegador travou")
+
+
+def run_crawl(monkeypatch, tmp_path, scrape, per_term=25, drivers=2, on_record=None):
+    browsers = FakeBrowsers()
+    monkeypatch.setattr(async_pipeline, 'start_driver', browsers.start)
+    monkeypatch.setattr(async_pipeline, 'stop_driver', browsers.stop)
+    monkeypatch.setattr(async_pipeline, 'PLATFORMS', {'magalu': (None, search, scrape)})
+    crawl = async_pipeline.AsyncCrawl(['magalu'], ['a', 'b'], per_term, drivers_per_platform={'magalu': drivers},
+                                      on_record=on_record)
+    crawl.limiter = RateLimiter({'magalu': 0.0})
+    rows = asyncio.run(asyncio.wait_for(crawl.run(str(tmp_path / 'saida.csv')), timeout=20))
+    return rows, browsers
+
+
+def test_recycled_drivers_do_not_hang(monkeypatch, tmp_path):
+    monkeypatch.setattr(async_pipeline, 'PAGES_PER_DRIVER', 13)
+    rows, browsers = run_crawl(monkeypatch, tmp_path, scrape_ok)
+    assert rows == 50
+    assert browsers.started > 2
+    assert browsers.max_open <= 2
+    assert browsers.open == 0
+
+
+def test_broken_drivers_do_not_hang(monkeypatch, tmp_path):
+    rows, browsers = run_crawl(monkeypatch, tmp_path, scrape_failing)
+    assert rows == 0
+    assert browsers.max_open <= 2
+    assert browsers.open == 0
+
+
+def test_failed_start_frees_the_slot(monkeypatch):
+    browsers = FakeBrowsers()
+    attempts = []
+
+    def flaky_start(*args, **kwargs):
+        attempts.append(1)
+        if len(attempts) == 1: raise RuntimeError("chromedriver não subiu")
+        return browsers.start()
+
+    monkeypatch.setattr(async_pipeline, 'start_driver', flaky_start)
+    monkeypatch.setattr(async_pipeline, 'stop_driver', browsers.stop)
+
+    async def scenario():
+        pool = async_pipeline.DriverPool('magalu', 1, None)
+        with pytest.raises(RuntimeError):
+            await pool.acquire()
+        driver = await asyncio.wait_for(pool.acquire(), timeout=5)
+        await pool.release(driver, broken=True)
+
+    asyncio.run(scenario())
+    assert browsers.started == 1
+    assert browsers.open == 0
+
+
+def test_proxy_blocks_retire_browsers_without_hanging(monkeypatch, tmp_path):
+    import proxy_pool
+    from page_guard import BLOCKED, UnusablePageError
+
+    pool = proxy_pool.ProxyPool({'magalu': ['http://saida-boa', 'http://saida-bloqueada']}, interval=0.0)
+    monkeypatch.setattr(proxy_pool, '_pool', pool)
+    browsers = FakeBrowsers()
+
+    def start_with_exit(*args, **kwargs):
+        driver = browsers.start()
+        driver.saida = pool.acquire('magalu')
+        return driver
+
+    def stop_with_exit(driver):
+        pool.release(driver.saida)
+        browsers.stop(driver)
+
+    def scrape(link, driver, include_description=True):
+        time.sleep(0.01)
+        if driver.saida.url == 'http://saida-bloqueada': raise UnusablePageError(BLOCKED, link)
+        return scrape_ok(link, driver)
+
+    monkeypatch.setattr(async_pipeline, 'start_driver', start_with_exit)
+    monkeypatch.setattr(async_pipeline, 'stop_driver', stop_with_exit)
+    monkeypatch.setattr(async_pipeline, 'PLATFORMS', {'magalu': (None, search, scrape)})
+    crawl = async_pipeline.AsyncCrawl(['magalu'], ['a', 'b'], 25, drivers_per_platform={'magalu': 2})
+    rows = asyncio.run(asyncio.wait_for(crawl.run(str(tmp_path / 'saida.csv')), timeout=20))
+
+    blocked_exit = pool.exits['magalu'][1]
+    assert blocked_exit.removals == 1
+    assert rows == 50 - blocked_exit.blocks
+    assert browsers.open == 0
+    # Bloqueio numa saída não pausa a plataforma inteira
+    assert crawl.board.allow('magalu')
+
+
+def test_raising_on_record_does_not_stop_the_sink(monkeypatch, tmp_path):
+    calls = []
+
+    def on_record(record):
+        calls.append(record)
+        raise ValueError("webhook fora do ar")
+
+    rows, browsers = run_crawl(monkeypatch, tmp_path, scrape_ok, on_record=on_record)
+    assert rows == 50
+    assert len(calls) == 50
+    assert browsers.open == 0
+
+
+def test_slow_on_record_runs_off_the_event_loop(monkeypatch, tmp_path):
+    threads = set()
+    loop_thread = threading.get_ident()
+
+    def on_record(record):
+        threads.add(threading.get_ident())
+        time.sleep(0.02)  # como um webhook lento
+
+    rows, browsers = run_crawl(monkeypatch, tmp_path, scrape_ok, on_record=on_record)
+    assert rows == 50
+    assert threads and loop_thread not in threads
@@ -0,0 +1,15 @@
+import math
+
+from benchmark_analise import SUPERLINEAR_EXPONENT, scaling_exponent
+
+
+def test_linear_and_quadratic_growth():
+    assert math.isclose(scaling_exponent(1_000, 0.5, 10_000, 5.0), 1.0)
+    assert math.isclose(scaling_exponent(1_000, 0.1, 10_000, 10.0), 2.0)
+    assert scaling_exponent(1_000, 0.1, 10_000, 10.0) > SUPERLINEAR_EXPONENT
+
+
+def test_unmeasurable_pairs():
+    assert scaling_exponent(1_000, 0.0, 10_000, 1.0) is None
+    assert scaling_exponent(1_000, None, 10_000, 1.0) is None
+    assert scaling_exponent(1_000, 1.0, 1_000, 2.0) is None
@@ -0,0 +1,129 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import browser_profiles
+from browser_profiles import ProfileManager, banner_report, record_banner_skip, record_banner_time
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(browser_profiles, 'time', clock)
+    return clock
+
+
+class FakeDriver:
+    def __init__(self, cookies=None):
+        self.cookies = cookies or []
+        self.cdp_calls = []
+        self.pages = []
+
+    def get_cookies(self):
+        return self.cookies
+
+    def get(self, url):
+        self.pages.append(url)
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.cdp_calls.append((cmd, params))
+
+
+def test_locked_slots_are_skipped_until_released(tmp_path, clock):
+    manager = ProfileManager('magalu', str(tmp_path), slots=2)
+    first, second = manager.acquire(), manager.acquire()
+    assert {first.slot, second.slot} == {0, 1}
+    assert manager.acquire() is None  # todos os slots em uso
+    manager.release(first)
+    assert manager.acquire().slot == first.slot
+
+
+def test_lock_of_a_dead_process_is_reclaimed(tmp_path, clock):
+    manager = ProfileManager('magalu', str(tmp_path), slots=1)
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    with open(manager._lock_path(0), 'w') as f:
+        f.write(str(dead.pid))
+    assert manager.acquire().slot == 0
+
+
+def test_lock_of_a_live_process_is_kept(tmp_path, clock):
+    manager = ProfileManager('magalu', str(tmp_path), slots=1)
+    with open(manager._lock_path(0), 'w') as f:
+        f.write(str(os.getpid()))
+    assert manager.acquire() is None
+
+
+def test_least_recently_used_slot_comes_first(tmp_path, clock):
+    manager = ProfileManager('magalu', str(tmp_path), slots=3)
+    profiles = [manager.acquire() for _ in range(3)]
+    for profile in (profiles[1], profiles[2], profiles[0]):  # slot1 é liberado primeiro
+        clock.now += 10
+        manager.release(profile)
+    assert [manager.acquire().slot for _ in range(3)] == [1, 2, 0]
+
+
+def test_expired_profile_is_recreated(tmp_path, clock):
+    manager = ProfileManager('magalu', str(tmp_path), slots=1, max_age_days=7)
+    profile = manager.acquire()
+    driver = FakeDriver([{'name': 'sessao', 'value': 'x'}])
+    driver.consentimento_salvo = True
+    manager.release(profile, driver)
+    assert os.path.exists(profile.cookies_file)
+
+    clock.now += 6 * 86400
+    profile = manager.acquire()
+    assert profile.consent and profile.meta['sessoes'] == 2
+    manager.release(profile)
+
+    clock.now += 2 * 86400  # 8 dias desde a criação
+    profile = manager.acquire()
+    assert not profile.consent and profile.meta['sessoes'] == 1
+    assert not os.path.exists(profile.cookies_file)
+    assert profile.meta['criado_em'] == clock.now
+
+
+def test_restore_cookies_does_not_open_the_home_page(tmp_path, clock):
+    manager = ProfileManager('mercado_livre', str(tmp_path), slots=1)
+    profile = manager.acquire()
+    cookies = [
+        {'name': 'a', 'value': '1', 'domain': '.mercadolivre.com.br', 'path': '/', 'expiry': 2_000_000, 'sameSite': 'Lax'},
+        {'name': 'b', 'value': '2', 'sameSite': 'qualquer'},
+    ]
+    manager.release(profile, FakeDriver(cookies))
+
+    driver = FakeDriver()
+    assert manager.latest_cookie_jar().restore_cookies(driver) == 2
+    assert driver.pages == []
+    (_, first), (_, second) = driver.cdp_calls
+    assert first == {'name': 'a', 'value': '1', 'domain': '.mercadolivre.com.br', 'path': '/', 'sameSite': 'Lax', 'expires': 2_000_000}
+    assert second == {'name': 'b', 'value': '2', 'url': browser_profiles.HOME_URLS['mercado_livre']}
+
+
+def test_banner_metrics_are_stored_in_the_profile(tmp_path, clock):
+    manager = ProfileManager('mercado_livre', str(tmp_path), slots=2)
+    fresh, warm = manager.acquire(), manager.acquire()
+    fresh_driver, warm_driver = FakeDriver(), FakeDriver()
+    record_banner_time(fresh_driver, 6.0)
+    record_banner_time(fresh_driver, 4.0)
+    for _ in range(3): record_banner_skip(warm_driver)
+    manager.release(fresh, fresh_driver)
+    manager.release(warm, warm_driver)
+
+    with open(fresh.meta_file, encoding='utf-8') as f:
+        assert json.load(f)['banner_medicoes'] == 2
+    assert manager.banner_totals() == {'banner_segundos': 10.0, 'banner_medicoes': 2, 'banners_pulados': 3}
+    report = banner_report(['mercado_livre', 'magalu'], str(tmp_path))
+    assert 'banner custa 5.0s por página; pulado 3x' in report
+    assert 'magalu' not in report
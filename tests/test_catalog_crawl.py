@@ -0,0 +1,84 @@
+import catalog_crawl
+from catalog_crawl import EMPTY_PAGES_TO_EXHAUST, MAX_JOB_ERRORS, CatalogCrawlState, crawl_catalog
+from circuit_breaker import CircuitBreakerBoard
+from page_guard import BLOCKED, UnusablePageError
+from rate_limit import RateLimiter
+
+
+def fake_results_page(termo, driver, cursor):
+    if termo == 'cartucho bloqueado':
+        raise UnusablePageError(BLOCKED, 'https://www.magazineluiza.com.br/busca/')
+    if termo == 'cartucho inexistente':
+        return [], None
+    page = cursor or 1
+    if termo == 'cartucho lacuna':  # página 2 só repete a 1, a 3 volta a trazer novos
+        records = [{'link_anuncio': f'https://www.magazineluiza.com.br/cartucho/p/lac{1 if page == 2 else page}{i}/'} for i in range(5)]
+        return records, (page + 1 if page < 3 else None)
+    if termo == 'cartucho repetido':  # depois da primeira página, só repetidos
+        return [{'link_anuncio': f'https://www.magazineluiza.com.br/cartucho/p/rep1{i}/'} for i in range(5)], page + 1
+    records = [{'link_anuncio': f'https://www.magazineluiza.com.br/cartucho/p/{termo[-3:]}{page}{i}/'} for i in range(5)]
+    return records, (page + 1 if page < 2 else None)
+
+
+def run(monkeypatch, tmp_path, termos, max_pages=30):
+    monkeypatch.setattr(catalog_crawl, 'start_driver', lambda *a, **k: object())
+    monkeypatch.setattr(catalog_crawl, 'stop_driver', lambda driver: None)
+    monkeypatch.setattr(catalog_crawl, 'RateLimiter', lambda: RateLimiter({'magalu': 0.0}))
+    # Limite alto para o breaker não pausar a plataforma durante o teste
+    monkeypatch.setattr(catalog_crawl, 'CircuitBreakerBoard', lambda: CircuitBreakerBoard(failure_threshold=100))
+    monkeypatch.setattr(catalog_crawl.time, 'sleep', lambda seconds: None)
+    monkeypatch.setitem(catalog_crawl.RESULTS_PAGE, 'magalu', fake_results_page)
+    state = CatalogCrawlState(str(tmp_path / 'crawl.sqlite'))
+    run_id = state.start_run(['magalu'], [(termo, '664') for termo in termos])
+    pages = crawl_catalog(state, run_id, ['magalu'], max_pages=max_pages, max_minutes=1)
+    jobs = {termo: (pages_, errors, exhausted) for termo, pages_, errors, exhausted in state.conn.execute(
+        "SELECT termo, pages, errors, exhausted FROM jobs WHERE run_id = ?", (run_id,))}
+    return state, run_id, pages, jobs
+
+
+def test_blocked_term_is_penalized_until_exhausted(monkeypatch, tmp_path):
+    state, run_id, pages, jobs = run(monkeypatch, tmp_path, ['cartucho bloqueado', 'cartucho hp 664'])
+    assert jobs['cartucho bloqueado'] == (0, MAX_JOB_ERRORS, 1)
+    assert jobs['cartucho hp 664'] == (2, 0, 1)
+    assert pages == MAX_JOB_ERRORS + 2
+    assert len(state.records(run_id)) == 10
+
+
+def test_empty_first_page_exhausts_the_term(monkeypatch, tmp_path):
+    state, run_id, pages, jobs = run(monkeypatch, tmp_path, ['cartucho inexistente'])
+    assert jobs['cartucho inexistente'] == (1, 0, 1)
+    assert pages == 1
+
+
+def test_one_page_of_repeats_does_not_exhaust_the_term(monkeypatch, tmp_path):
+    state, run_id, pages, jobs = run(monkeypatch, tmp_path, ['cartucho lacuna'])
+    assert jobs['cartucho lacuna'] == (3, 0, 1)  # encerrado pelo fim da paginação
+    assert len(state.records(run_id)) == 10
+
+
+def test_consecutive_pages_of_repeats_exhaust_the_term(monkeypatch, tmp_path):
+    state, run_id, pages, jobs = run(monkeypatch, tmp_path, ['cartucho repetido'])
+    assert jobs['cartucho repetido'] == (1 + EMPTY_PAGES_TO_EXHAUST, 0, 1)
+
+
+def test_run_ids_started_in_the_same_second_are_unique(tmp_path):
+    state = CatalogCrawlState(str(tmp_path / 'crawl.sqlite'))
+    runs = {state.start_run(['magalu'], [('cartucho hp 664', '664')]) for _ in range(5)}
+    assert len(runs) == 5
+
+
+def test_found_listings_reach_the_recrawl_queue(monkeypatch, tmp_path):
+    from recrawl_scheduler import RecrawlScheduler
+
+    recrawl = RecrawlScheduler(':memory:')
+    monkeypatch.setattr(catalog_crawl, 'start_driver', lambda *a, **k: object())
+    monkeypatch.setattr(catalog_crawl, 'stop_driver', lambda driver: None)
+    monkeypatch.setattr(catalog_crawl, 'RateLimiter', lambda: RateLimiter({'magalu': 0.0}))
+    monkeypatch.setattr(catalog_crawl.time, 'sleep', lambda seconds: None)
+    monkeypatch.setitem(catalog_crawl.RESULTS_PAGE, 'magalu', fake_results_page)
+    state = CatalogCrawlState(str(tmp_path / 'crawl.sqlite'))
+    run_id = state.start_run(['magalu'], [('cartucho hp 664', '664')])
+    crawl_catalog(state, run_id, ['magalu'], max_pages=5, max_minutes=1,
+                  on_links=lambda links, plataforma: [recrawl.discover(link, plataforma) for link in links])
+    plan = recrawl.plan(20)
+    assert len(plan) == 10 and all(item['novo'] for item in plan)
@@ -0,0 +1,93 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreakerBoard
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, 'time', clock)
+    return clock
+
+
+def state(board, plataforma='magalu'):
+    return board._row(plataforma)[0]
+
+
+def test_opens_after_consecutive_failures(clock):
+    board = CircuitBreakerBoard(failure_threshold=3, base_cooldown=100)
+    assert board.record_failure('magalu', 'bloqueado') == 0
+    board.record_success('magalu')  # sucesso zera a contagem
+    assert board.record_failure('magalu') == 0
+    assert board.record_failure('magalu') == 0
+    assert board.record_failure('magalu') == 100
+    assert state(board) == OPEN
+    assert not board.allow('magalu')
+    assert board.open_platforms() == ['magalu']
+    assert board.seconds_until_retry('magalu') == 100
+    assert board.allow('mercado_livre')
+
+
+def test_half_open_lets_a_single_probe_through(clock):
+    board = CircuitBreakerBoard(failure_threshold=1, base_cooldown=100)
+    board.record_failure('magalu')
+    clock.now += 101
+    assert board.allow('magalu', owner='w1')
+    assert state(board) == HALF_OPEN
+    assert not board.allow('magalu', owner='w2')
+    assert board.allow('magalu', owner='w1')
+    board.record_success('magalu')
+    assert state(board) == CLOSED
+    assert board.allow('magalu', owner='w2')
+
+
+def test_failed_probe_reopens_with_a_longer_cooldown(clock):
+    board = CircuitBreakerBoard(failure_threshold=1, base_cooldown=100, max_cooldown=350)
+    cooldowns = []
+    for _ in range(4):
+        cooldowns.append(board.record_failure('magalu'))
+        clock.now += cooldowns[-1] + 1
+        assert board.allow('magalu')
+    assert cooldowns == [100, 200, 350, 350]
+
+
+def test_abandoned_probe_expires(clock):
+    board = CircuitBreakerBoard(failure_threshold=1, base_cooldown=100, probe_timeout=50)
+    board.record_failure('magalu')
+    clock.now += 101
+    assert board.allow('magalu', owner='w1')
+    assert not board.allow('magalu', owner='w2')
+    clock.now += 51  # w1 morreu sem reportar
+    assert board.allow('magalu', owner='w2')
+
+
+def test_state_is_shared_through_sqlite(clock, tmp_path):
+    db = str(tmp_path / 'breakers.sqlite')
+    first, second = CircuitBreakerBoard(db, failure_threshold=1), CircuitBreakerBoard(db, failure_threshold=1)
+    first.record_failure('magalu')
+    assert not second.allow('magalu')
+
+
+def test_pause_opens_without_counting_a_block(clock):
+    board = CircuitBreakerBoard(failure_threshold=3, base_cooldown=100)
+    board.pause('magalu', 500, 'sem_saida')
+    assert not board.allow('magalu')
+    assert board.seconds_until_retry('magalu') == 500
+    board.pause('magalu', 50)  # uma pausa menor não encurta a atual
+    assert board.seconds_until_retry('magalu') == 500
+    clock.now += 500
+    assert board.allow('magalu', 'w1')
+    board.record_success('magalu')
+    assert state(board) == CLOSED
+    # A pausa não dobrou a espera da próxima abertura
+    for _ in range(3): board.record_failure('magalu')
+    assert board.seconds_until_retry('magalu') == 100
@@ -0,0 +1,16 @@
+from description_stage import needs_description
+
+
+def test_title_with_catalog_yield_skips_the_description():
+    assert not needs_description({'titulo': 'Cartucho HP 664 XL Preto Original', 'descricao': None})
+    assert not needs_description({'titulo': 'Cartucho HP 664 Preto', 'descricao': ''})
+
+
+def test_unknown_model_or_yield_needs_the_description():
+    assert needs_description({'titulo': 'Cartucho de tinta preto compatível', 'descricao': None})
+    # Sem cor no título o catálogo não sabe qual rendimento nominal usar
+    assert needs_description({'titulo': 'Cartucho HP 664 XL', 'descricao': None})
+
+
+def test_existing_description_is_never_fetched_again():
+    assert not needs_description({'titulo': 'Cartucho de tinta preto', 'descricao': 'Rende 480 páginas'})
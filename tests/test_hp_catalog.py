@@ -0,0 +1,72 @@
+import pytest
+
+from hp_catalog import XL_CAPACITY, CatalogMatcher, expand_search_queries, load_catalog
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return CatalogMatcher()
+
+
+def model(matcher, title, descricao=None):
+    return matcher.tag(title, descricao)['modelo']
+
+
+def test_bare_numbers_are_not_models(matcher):
+    assert model(matcher, 'Tinta Refil Universal 60 ml Preta') is None
+    assert model(matcher, 'Papel Fotográfico A4 60 folhas') is None
+    assert model(matcher, 'Monitor 27 polegadas') is None
+    assert model(matcher, 'Cartucho HP 60 ml de tinta') is None
+
+
+def test_numeric_model_needs_brand_or_context(matcher):
+    assert model(matcher, 'Cartucho HP 60 Preto') == '60'
+    assert model(matcher, 'Cartucho 60 Preto Original') == '60'
+    assert model(matcher, 'Kit 21 e 22 para DeskJet') == '21'
+    assert model(matcher, '60xl colorido') == '60'
+    # Números soltos na descrição não contam, só "HP 92"
+    assert model(matcher, 'Cartucho de tinta preto', 'rende 92 paginas') is None
+    assert model(matcher, 'Cartucho de tinta preto', 'Compatível com HP 92') == '92'
+
+
+def test_brand_and_part_code_beat_a_weaker_mention(matcher):
+    # "cartucho 60" e "hp 664" no mesmo título: a citação com a marca vence
+    assert model(matcher, 'Cartucho 60 Compatível Substitui HP 664') == '664'
+    assert model(matcher, 'Cartucho HP 21 CZ103AB') == '662'
+
+
+def test_overlapping_aliases_and_words(matcher):
+    # "GT51" e o alias "GT 51" viram os mesmos tokens
+    assert model(matcher, 'Garrafa de Tinta HP GT51 Preto') == 'GT51'
+    assert model(matcher, 'Garrafa de Tinta GT 52 Ciano') == 'GT52'
+    # "122" não pode casar com "22", nem "664" com "64"
+    assert model(matcher, 'Cartucho HP 122 Preto') == '122'
+    assert model(matcher, 'Cartucho 664 Colorido') == '664'
+
+
+def test_xl_variants(matcher):
+    for title in ('Cartucho HP 662XL Preto', 'Cartucho Hp 662 Xl Preto', 'Cartucho HP 662 Alto Rendimento Preto'):
+        tags = matcher.tag(title)
+        assert tags['modelo'] == '662' and tags['capacidade'] == XL_CAPACITY
+        assert matcher.nominal_yield(tags) == 360
+    tags = matcher.tag('Cartucho HP CH563HB')  # código de peça do 122XL preto
+    assert (tags['modelo'], tags['capacidade'], tags['cores']) == ('122', XL_CAPACITY, {'preto'})
+    assert matcher.nominal_yield(tags) == 480
+
+
+def test_printer_implies_model(matcher):
+    tags = matcher.tag('Cartucho Preto para DeskJet 2774')
+    assert (tags['modelo'], tags['impressora']) == ('667', 'DeskJet 2774')
+
+
+def test_every_model_has_nominal_yields():
+    for entry in load_catalog()['modelos']:
+        rendimento = entry['rendimento']
+        assert set(rendimento['padrao']) == set(entry['cores']), entry['modelo']
+        if entry.get('xl'):  # nem toda cor tem versão XL (o 901XL é só preto)
+            assert rendimento['xl'] and set(rendimento['xl']) <= set(entry['cores']), entry['modelo']
+
+
+def test_every_search_query_is_recognised(matcher):
+    for termo, modelo in expand_search_queries():
+        assert model(matcher, termo) == modelo, termo
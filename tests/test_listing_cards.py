@@ -0,0 +1,67 @@
+import os
+
+from fake_dom import parse_html
+from magazine_scraper import parse_magalu_card
+from mercado_scraper import parse_mercado_livre_card
+from scraping import LISTING_FIELDS
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def card(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return parse_html(f.read())
+
+
+def test_magalu_card():
+    record = parse_magalu_card(card('magalu_cards.html'))
+    assert list(record) == LISTING_FIELDS
+    assert record == {
+        'link_anuncio': 'https://www.magazineluiza.com.br/cartucho-de-tinta-hp-664-preto/p/ah2k1g8ba8/in/ctdt/',
+        'titulo': 'Cartucho de Tinta HP 664 Preto Original',
+        'preco': 1079.9,
+        'vendedor': 'Magazine Luiza',
+        'avaliacao_nota': '4.8',
+        'avaliacao_numero': 1532,
+        'descricao': None,
+    }
+
+
+def test_magalu_card_with_link_inside_and_missing_fields():
+    record = parse_magalu_card(card('magalu_card_inner_link.html'))
+    assert record['link_anuncio'] == 'https://www.magazineluiza.com.br/kit-cartucho-hp-667/p/jk81hb3c2e/in/ctdt/'
+    assert record['titulo'] == 'Kit Cartucho HP 667 Preto + Colorido'
+    assert record['preco'] == 139.0
+    assert record['vendedor'] is None and record['avaliacao_nota'] is None and record['avaliacao_numero'] is None
+
+
+def test_magalu_card_without_link_is_skipped():
+    assert parse_magalu_card(parse_html('<div data-testid="product-card-container"><h2>Sem link</h2></div>')) is None
+
+
+def test_mercado_livre_poly_card():
+    record = parse_mercado_livre_card(card('mercado_livre_poly_card.html'))
+    assert list(record) == LISTING_FIELDS
+    assert record == {
+        'link_anuncio': 'https://produto.mercadolivre.com.br/MLB-3456789012-cartucho-hp-664xl-preto-original-_JM',
+        'titulo': 'Cartucho HP 664XL Preto Original',
+        'preco': 1119.05,  # preço atual, não o riscado
+        'vendedor': 'HP',
+        'avaliacao_nota': '4.7',
+        'avaliacao_numero': 812,
+        'descricao': None,
+    }
+
+
+def test_mercado_livre_old_layout_card():
+    record = parse_mercado_livre_card(card('mercado_livre_old_card.html'))
+    # Link de catálogo (/p/MLB...) mantém a query, só perde o fragmento
+    assert record['link_anuncio'] == 'https://www.mercadolivre.com.br/cartucho-hp-667-colorido/p/MLB19876543?pdp_filters=category:MLB1234'
+    assert record['titulo'] == 'Cartucho HP 667 Colorido'
+    assert record['preco'] == 64.9  # sem aria-label: fração + centavos
+    assert record['vendedor'] == 'Kalunga'
+    assert record['avaliacao_nota'] is None and record['avaliacao_numero'] is None
+
+
+def test_mercado_livre_sponsored_card_is_skipped():
+    assert parse_mercado_livre_card(card('mercado_livre_sponsored_card.html')) is None
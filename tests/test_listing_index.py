@@ -0,0 +1,69 @@
+import listing_index
+from listing_index import ListingIndex
+
+
+def records(n):
+    for i in range(n):
+        capacidade = 'XL' if i % 2 else ''
+        cor = 'Preto' if i % 3 else 'Tricolor'
+        yield {'plataforma': 'magalu', 'titulo': f'Cartucho HP 664 {capacidade} {cor}', 'preco': 40 + i % 50,
+               'descricao': 'rende 480 páginas' if i % 5 == 0 else '',
+               'link_anuncio': f'https://www.magazineluiza.com.br/cartucho/p/{i:06d}/'}
+
+
+def brute_force(n, predicate):
+    return {r['link_anuncio'] for r in records(n) if predicate(r)}
+
+
+def test_large_candidate_sets_intersect_in_sqlite(tmp_path):
+    index = ListingIndex(str(tmp_path / 'indice.sqlite'))
+    n = 3 * listing_index.SMALL_CANDIDATE_SET
+    index.add_records(records(n))
+
+    found = set(index.search('cartucho 664 xl preto', limit=n)['link_anuncio'])
+    assert found == brute_force(n, lambda r: 'XL' in r['titulo'] and 'Preto' in r['titulo'])
+
+    found = set(index.search('cartucho "hp 664" -tricolor 480', limit=n)['link_anuncio'])
+    assert found == brute_force(n, lambda r: 'Tricolor' not in r['titulo'] and '480' in r['descricao'])
+
+
+def test_postings_only_return_candidates(tmp_path):
+    index = ListingIndex(str(tmp_path / 'indice.sqlite'))
+    index.add_records(records(2000))
+    candidates = set(range(1, 1500, 2))
+    assert set(index._postings('cartucho', candidates)) == candidates
+    assert set(index._postings('xl', candidates, positions=False)) <= candidates
+    assert all(value is None for value in index._postings('xl', candidates, positions=False).values())
+
+
+def test_filters_limit_the_posting_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(listing_index, 'COMMON_QUERY_DOCS', 10 ** 9)  # força o caminho das listas
+    index = ListingIndex(str(tmp_path / 'indice.sqlite'))
+    index.add_records(records(1000))
+    read = []
+    postings = index._postings
+    monkeypatch.setattr(index, '_postings', lambda *a, **k: read.append(postings(*a, **k)) or read[-1])
+
+    found = set(index.search('cartucho tricolor', preco_max=45, limit=1000)['link_anuncio'])
+    assert found == brute_force(1000, lambda r: 'Tricolor' in r['titulo'] and r['preco'] <= 45)
+    # Nenhuma lista lida passa do número de anúncios que atendem o filtro de preço
+    assert max(len(r) for r in read) <= sum(1 for r in records(1000) if r['preco'] <= 45)
+
+
+def test_common_queries_run_in_sql_by_price(tmp_path, monkeypatch):
+    monkeypatch.setattr(listing_index, 'COMMON_QUERY_DOCS', 100)
+    index = ListingIndex(str(tmp_path / 'indice.sqlite'))
+    index.add_records(records(1000))
+
+    def no_lists(*args, **kwargs):
+        raise AssertionError("consulta comum não deveria carregar listas")
+
+    monkeypatch.setattr(index, '_postings', no_lists)
+    result = index.search('cartucho -tricolor (xl OR 480)', preco_min=80, limit=20)
+    expected = sorted((r for r in records(1000) if 'Tricolor' not in r['titulo'] and r['preco'] >= 80
+                       and ('XL' in r['titulo'] or '480' in r['descricao'])), key=lambda r: r['preco'])
+    assert len(result) == 20
+    assert list(result['preco']) == [r['preco'] for r in expected[:20]]
+    # Frase ainda precisa das posições: volta para o caminho das listas
+    monkeypatch.setattr(index, '_postings', ListingIndex._postings.__get__(index))
+    assert len(index.search('"hp 664"', limit=5)) == 5
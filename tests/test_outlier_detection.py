@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from analise import flag_price_outliers
+from outlier_detection import ANY, MIN_GROUP_SIZE, PriceOutlierDetector
+
+
+def fixture():
+    """
+    664 XL Original tem grupo próprio; 664 Padrão Compatível tem poucos anúncios e cai
+    no limite do modelo 664; o 901 só tem dois anúncios e cai no limite geral.
+    """
+    rng = np.random.default_rng(7)
+    rows = [('664', 'XL', 'Original', p) for p in rng.uniform(100, 120, 2 * MIN_GROUP_SIZE)]
+    rows += [('664', 'Padrão', 'Compatível', p) for p in (95.0, 105.0, 900.0)]
+    rows += [('901', 'Padrão', 'Original', p) for p in (110.0, 4.0)]
+    rows += [('664', 'XL', 'Original', 15.0)]
+    df = pd.DataFrame(rows, columns=['modelo_cartucho', 'capacidade', 'compatibilidade', 'preco'])
+    df['categoria_produto'] = 'Suprimento de Impressão'
+    return df
+
+
+def test_small_groups_fall_back_to_model_and_global_fences(tmp_path):
+    detector = PriceOutlierDetector(str(tmp_path / 'outliers.sqlite'))
+    df = flag_price_outliers(fixture(), detector, batch_id='fixture')
+
+    flagged = df[df['preco_outlier'].astype(bool)]
+    assert sorted(flagged['preco']) == [4.0, 15.0, 900.0]
+    referencia = dict(zip(df['preco'], df['grupo_referencia']))
+    assert referencia[15.0] == '664|XL|Original'
+    assert referencia[900.0] == '664|*|*'
+    assert referencia[4.0] == '*|*|*'
+
+
+def test_no_fence_without_enough_data(tmp_path):
+    detector = PriceOutlierDetector(str(tmp_path / 'outliers.sqlite'))
+    df = flag_price_outliers(fixture().head(MIN_GROUP_SIZE - 1), detector)
+    assert not df['preco_outlier'].astype(bool).any()
+    assert df['grupo_referencia'].isna().all()
+
+
+def test_missing_attributes_do_not_become_the_wildcard(tmp_path):
+    detector = PriceOutlierDetector(str(tmp_path / 'outliers.sqlite'))
+    df = fixture()
+    unknown = pd.DataFrame({'modelo_cartucho': [None] * MIN_GROUP_SIZE, 'capacidade': 'XL', 'compatibilidade': 'Original',
+                            'preco': np.linspace(300, 320, MIN_GROUP_SIZE), 'categoria_produto': 'Suprimento de Impressão'})
+    df = flag_price_outliers(pd.concat([df, unknown], ignore_index=True), detector)
+
+    # Cada preço entra uma vez só no grupo geral, e não existe grupo (*, XL, Original)
+    assert detector.sketches[(ANY, ANY, ANY)].count == len(df)
+    assert (ANY, 'XL', 'Original') not in detector.sketches
+    assert detector.sketches[('?', 'XL', 'Original')].count == MIN_GROUP_SIZE
+    assert set(df.loc[df['modelo_cartucho'].isna(), 'grupo_referencia']) == {'?|XL|Original'}
+    assert not df.loc[df['modelo_cartucho'].isna(), 'preco_outlier'].astype(bool).any()
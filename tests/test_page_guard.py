@@ -0,0 +1,46 @@
+import pytest
+
+from page_guard import (BLOCKED, CAPTCHA, EMPTY_SEARCH, NORMAL, UnusablePageError,
+                        check_results_page, classify_page)
+
+
+class FakePage:
+    """Só o que classify_page usa do driver do Selenium."""
+
+    def __init__(self, text='', title='Resultados', url='https://lista.mercadolivre.com.br/cartucho', cards=False):
+        self.text = text
+        self.title = title
+        self.current_url = url
+        self.cards = cards
+
+    def find_elements(self, by, selector):
+        return [object()] if self.cards else []
+
+    def execute_script(self, script):
+        return self.text
+
+
+def test_empty_search_is_not_a_block():
+    page = FakePage('Não há anúncios que correspondam à sua busca.')
+    assert classify_page(page, 'mercado_livre', 'busca') == EMPTY_SEARCH
+    assert not UnusablePageError(EMPTY_SEARCH).is_block
+    assert UnusablePageError(BLOCKED).is_block
+    assert UnusablePageError(CAPTCHA).is_block
+
+
+def test_empty_first_results_page_means_no_results():
+    page = FakePage('Não encontramos resultados para sua busca')
+    assert check_results_page(page, 'magalu', 1) is False
+    assert check_results_page(page, 'magalu', 3) is False
+
+
+def test_results_page_with_cards_is_normal():
+    assert classify_page(FakePage(cards=True), 'magalu', 'busca') == NORMAL
+    assert check_results_page(FakePage(cards=True), 'magalu', 1) is True
+
+
+def test_captcha_on_results_page_still_raises_a_block():
+    page = FakePage('Confirme que você é humano', title='Captcha')
+    with pytest.raises(UnusablePageError) as error:
+        check_results_page(page, 'mercado_livre', 1)
+    assert error.value.is_block
@@ -0,0 +1,36 @@
+from price_alerts import AlertEngine
+
+RULE = {'tipo': 'preco_abaixo', 'preco_max': 60.0, 'nome': 'HP 664 barato', 'modelo': '664'}
+
+
+def record(preco, produto='123'):
+    return {'plataforma': 'magalu', 'titulo': 'Cartucho HP 664 XL Preto Original', 'preco': preco,
+            'vendedor': 'Loja', 'link_anuncio': f'https://www.magazineluiza.com.br/cartucho-hp-664/p/{produto}/'}
+
+
+class ListSink:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, alert):
+        self.sent.append(alert)
+
+
+class BrokenSink:
+    def send(self, alert):
+        raise OSError('disco cheio')
+
+
+def test_unparsed_price_is_skipped():
+    engine = AlertEngine([RULE], [], ':memory:')
+    assert engine.process(record('R$ a combinar')) == []
+    assert engine.process(record(None)) == []
+    assert [a['preco'] for a in engine.process(record('49.90'))] == [49.9]
+
+
+def test_failing_sink_does_not_stop_the_others():
+    sink = ListSink()
+    engine = AlertEngine([RULE], [BrokenSink(), sink], ':memory:')
+    alerts = engine.process(record(50.0, '1')) + engine.process(record(55.0, '2'))
+    assert len(alerts) == 2
+    assert len(sink.sent) == 2
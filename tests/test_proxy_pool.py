@@ -0,0 +1,96 @@
+import time as real_time
+
+import pytest
+
+import proxy_pool
+from proxy_pool import EXIT_COOLDOWN, MAX_CONSECUTIVE_BLOCKS, NoHealthyExitError, ProxyPool
+
+
+class Clock:
+    """Substitui o módulo time do proxy_pool: só o relógio é controlado."""
+
+    def __init__(self):
+        self.now = real_time.mktime((2024, 5, 10, 12, 0, 0, 0, 0, -1))
+
+    def time(self):
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(real_time, name)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(proxy_pool, 'time', clock)
+    return clock
+
+
+def test_interval_is_per_exit(clock):
+    pool = ProxyPool({'magalu': ['http://a', 'http://b']}, interval=4.0)
+    a, b = pool.acquire('magalu'), pool.acquire('magalu')
+    assert a is not b  # cada sessão vai para a saída menos usada
+    assert [pool.reserve(a), pool.reserve(a), pool.reserve(a)] == [0, 4.0, 8.0]
+    assert pool.reserve(b) == 0  # a outra saída tem o próprio ritmo
+    clock.now += 10
+    assert pool.reserve(a) == 2.0
+
+
+def test_shared_exits_are_separate_per_platform(clock):
+    pool = ProxyPool({'magalu': ['http://a'], '*': ['http://c']}, interval=1.0)
+    assert pool.size('magalu') == 2 and pool.size('mercado_livre') == 1
+    ml = pool.acquire('mercado_livre')
+    for _ in range(MAX_CONSECUTIVE_BLOCKS): pool.record_block(ml)
+    assert not ml.available(clock.now)
+    assert all(e.available(clock.now) for e in pool.exits['magalu'])
+    assert pool.acquire('desconhecida') is not None and ProxyPool({'magalu': ['http://a']}).acquire('outra') is None
+
+
+def test_daily_budget_runs_out_until_midnight(clock):
+    pool = ProxyPool({'magalu': ['http://a']}, interval=0, daily_budget=3)
+    exit_ = pool.acquire('magalu')
+    for _ in range(3): pool.record_success(exit_)
+    with pytest.raises(NoHealthyExitError) as info:
+        pool.acquire('magalu')
+    assert info.value.retry_in == 12 * 3600
+    clock.now += 12 * 3600  # novo dia: orçamento zerado
+    assert pool.acquire('magalu') is exit_
+    pool.record_success(exit_)
+    assert exit_.requests_today == 1 and exit_.requests == 4
+
+
+def test_consecutive_blocks_remove_the_exit_with_growing_cooldown(clock):
+    pool = ProxyPool({'magalu': ['http://a', 'http://b']}, interval=0)
+    bad = pool.acquire('magalu')
+    pool.release(bad)
+    assert not pool.record_block(bad)
+    pool.record_success(bad)  # sucesso zera os bloqueios seguidos
+    assert [pool.record_block(bad) for _ in range(MAX_CONSECUTIVE_BLOCKS)] == [False] * (MAX_CONSECUTIVE_BLOCKS - 1) + [True]
+    assert bad.removed_until == clock.now + EXIT_COOLDOWN
+    assert all(pool.acquire('magalu') is not bad for _ in range(3))
+
+    clock.now += EXIT_COOLDOWN
+    assert bad.available(clock.now)
+    for _ in range(MAX_CONSECUTIVE_BLOCKS): pool.record_block(bad)
+    assert bad.removed_until == clock.now + 2 * EXIT_COOLDOWN
+
+
+def test_high_block_rate_removes_the_exit(clock):
+    pool = ProxyPool({'magalu': ['http://a']}, interval=0)
+    exit_ = pool.acquire('magalu')
+    removed = False
+    for _ in range(proxy_pool.HEALTH_WINDOW // 2):
+        pool.record_success(exit_)
+        removed = pool.record_block(exit_) or removed
+    assert removed  # nunca 3 seguidos, mas metade das últimas páginas bloqueadas
+
+
+def test_no_healthy_exit_reports_when_the_first_one_returns(clock):
+    pool = ProxyPool({'magalu': ['http://a', 'http://b']}, interval=0)
+    a, b = pool.exits['magalu']
+    for _ in range(MAX_CONSECUTIVE_BLOCKS): pool.record_block(a)
+    clock.now += 600
+    for _ in range(MAX_CONSECUTIVE_BLOCKS): pool.record_block(b)
+    with pytest.raises(NoHealthyExitError) as info:
+        pool.acquire('magalu')
+    assert info.value.retry_in == EXIT_COOLDOWN - 600
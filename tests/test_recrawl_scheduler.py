@@ -0,0 +1,73 @@
+import math
+
+import pytest
+
+from recrawl_scheduler import (MIN_CHANCE, PRIOR_CHANGES, PRIOR_DAYS, RecrawlScheduler, change_probability,
+                               import_csv)
+
+DAY = 86400.0
+T0 = 1_750_000_000.0
+
+
+def link(i):
+    return f"https://produto.mercadolivre.com.br/MLB-{1000000000 + i}-cartucho-hp-664-_JM"
+
+
+def visit(scheduler, i, when, preco, vendedor='Loja'):
+    return scheduler.observe({'plataforma': 'mercado_livre', 'link_anuncio': link(i), 'preco': preco, 'vendedor': vendedor}, when)
+
+
+def test_change_probability_follows_the_prior_and_the_history():
+    assert change_probability(0, 0, 0) == 0.0
+    assert math.isclose(change_probability(0, 0, 7), 1 - math.exp(-PRIOR_CHANGES / PRIOR_DAYS * 7))
+    volatile = change_probability(10, 10, 3)
+    stable = change_probability(0, 60, 1)
+    assert volatile > 0.5 > stable
+    assert change_probability(0, 60, 30) > stable  # a chance cresce com o tempo sem visita
+
+
+def test_observe_records_changes_and_exposure():
+    scheduler = RecrawlScheduler(':memory:')
+    assert visit(scheduler, 1, T0, 50.0) == []
+    assert visit(scheduler, 1, T0 + 2 * DAY, 50.1) == []  # arredondamento não conta
+    assert visit(scheduler, 1, T0 + 5 * DAY, 42.0, vendedor='Outra') == ['preco', 'vendedor']
+    visits, changes, exposure = scheduler.conn.execute(
+        "SELECT visits, changes, exposure_days FROM listings").fetchone()
+    assert (visits, changes) == (3, 1)
+    assert math.isclose(exposure, 5.0)
+    assert [campo for _, campo, _, _ in scheduler.history(next(iter(scheduler.conn.execute("SELECT product_id FROM listings")))[0])] == ['preco', 'vendedor']
+
+
+def test_plan_keeps_an_exploration_quota_for_new_listings():
+    scheduler = RecrawlScheduler(':memory:')
+    for i in range(20):
+        visit(scheduler, i, T0, 50.0)
+    for day in range(1, 6):  # anúncios 0-9 mudam todo dia
+        for i in range(10):
+            visit(scheduler, i, T0 + day * DAY, 50.0 + day + i)
+    for i in range(100, 110):
+        scheduler.discover(link(i), 'mercado_livre', T0)
+
+    plan = scheduler.plan(10, exploration=0.3, now=T0 + 6 * DAY)
+    assert sum(item['novo'] for item in plan) == 3
+    known = [item for item in plan if not item['novo']]
+    assert all(item['chance'] >= MIN_CHANCE for item in known)
+    assert {item['link_anuncio'] for item in known} <= {link(i) for i in range(10)}
+
+    # Sem conhecidos prováveis, o orçamento vai para os novos
+    plan = scheduler.plan(10, exploration=0.3, now=T0 + 6 * DAY + 60)
+    assert len(plan) == 10
+
+
+def test_import_requires_a_collection_date(tmp_path):
+    csv = tmp_path / 'antigo.csv'
+    csv.write_text(f"plataforma;link_anuncio;preco;vendedor\nmercado_livre;{link(1)};50.0;Loja\n", encoding='utf-8')
+    scheduler = RecrawlScheduler(':memory:')
+    with pytest.raises(ValueError):
+        import_csv(scheduler, str(csv))
+    assert import_csv(scheduler, str(csv), default_date='2025-06-10') == (1, 0)
+    dated = tmp_path / 'novo.csv'
+    dated.write_text(f"plataforma;link_anuncio;preco;vendedor;data_coleta\nmercado_livre;{link(1)};40.0;Loja;2025-06-20\n",
+                     encoding='utf-8')
+    assert import_csv(scheduler, str(dated)) == (1, 1)
+    assert math.isclose(scheduler.conn.execute("SELECT exposure_days FROM listings").fetchone()[0], 10.0)
@@ -0,0 +1,31 @@
+import math
+
+from page_guard import BLOCKED, NORMAL
+from run_stats import RunStats
+
+
+def test_savings_use_the_measured_page_cost():
+    stats = RunStats()
+    stats.record_page('magalu', 8.0)
+    stats.record_page('magalu', 12.0, NORMAL)
+    stats.record_page('magalu', 1.0, BLOCKED)  # abandonada logo: poupa 10 - 1
+    stats.record_skip('magalu', 3)             # 3 páginas médias
+    assert stats.average_page_seconds('magalu') == 10.0
+    assert math.isclose(stats.saved_seconds('magalu'), 9.0 + 30.0)
+
+
+def test_no_estimate_without_a_normal_page():
+    stats = RunStats()
+    stats.record_page('mercado_livre', 2.0, BLOCKED)
+    stats.record_skip('mercado_livre', 5)
+    assert stats.saved_seconds('mercado_livre') is None
+    assert 'sem página normal medida' in stats.summary()
+
+
+def test_direct_savings_are_added():
+    stats = RunStats()
+    stats.record_saving('magalu', 6.0)
+    assert stats.saved_seconds('magalu') == 6.0
+    stats.record_page('magalu', 4.0)
+    stats.record_skip('magalu')
+    assert stats.saved_seconds('magalu') == 10.0
@@ -0,0 +1,40 @@
+import re
+
+import pandas as pd
+
+from analise import enrich_data, load_and_clean_data
+from scraping import CSV_COLUMNS
+from synthetic_data import format_brazilian_price, generate_listings, write_synthetic_csv
+
+
+def test_columns_follow_the_collection_csv():
+    df = generate_listings(2000, seed=1)
+    assert list(df.columns) == [c for c in CSV_COLUMNS if c in df.columns]
+    assert {'plataforma', 'link_anuncio', 'titulo', 'preco', 'descricao'} <= set(df.columns)
+    assert df['preco'].dtype.kind == 'f'
+    assert abs((df['plataforma'] == 'mercado_livre').mean() - 0.74) < 0.1
+
+
+def test_share_of_yield_phrases():
+    df = generate_listings(5000, seed=2)
+    with_phrase = df['descricao'].fillna('').str.contains(r'p[aá]ginas', case=False, regex=True)
+    # 93% com descrição x 60% com frase de rendimento
+    assert 0.5 < with_phrase.mean() < 0.62
+    assert 0.04 < df['descricao'].isna().mean() < 0.1
+
+
+def test_brazilian_price_format():
+    assert format_brazilian_price(154823.5) == 'R$ 154.823,50'
+    assert format_brazilian_price(45.9) == 'R$ 45,90'
+    precos = generate_listings(100, seed=3, price_format='br')['preco']
+    assert all(re.fullmatch(r'R\$ \d{1,3}(\.\d{3})*,\d{2}', p) for p in precos)
+
+
+def test_brazilian_prices_survive_the_analysis(tmp_path):
+    numeric, br = tmp_path / 'numerico.csv', tmp_path / 'br.csv'
+    write_synthetic_csv(str(numeric), 300, seed=4)
+    write_synthetic_csv(str(br), 300, seed=4, price_format='br')
+    df_numeric = enrich_data(load_and_clean_data(str(numeric)))
+    df_br = enrich_data(load_and_clean_data(str(br)))
+    pd.testing.assert_series_equal(df_br['preco'], df_numeric['preco'])
+    assert df_br['custo_por_pagina'].notna().any()
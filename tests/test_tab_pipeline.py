@@ -0,0 +1,145 @@
+import pytest
+
+import rate_limit
+import tab_pipeline
+from page_guard import BLOCKED, NOT_FOUND, UnusablePageError
+from rate_limit import RateLimiter
+from tab_pipeline import scrape_pipelined
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+        self.slept = []
+        self.driver = None
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # Guarda também quantas abas estavam abertas enquanto o limitador esperava
+        self.slept.append((seconds, len(self.driver.window_handles) - 1))
+        self.now += seconds
+
+
+class SwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        assert handle in self.driver.window_handles
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    """Abas do Selenium: window.open cria um handle, close fecha a aba atual."""
+
+    def __init__(self, clock, load_seconds=0.0):
+        self.clock = clock
+        clock.driver = self
+        self.load_seconds = load_seconds
+        self.window_handles = ['home']
+        self.current_window_handle = 'home'
+        self.urls = {'home': None}
+        self.switch_to = SwitchTo(self)
+        self.events = []
+
+    def execute_script(self, script, *args):
+        if script.startswith('window.open'):
+            handle = f"aba{len(self.urls)}"
+            self.window_handles.append(handle)
+            self.urls[handle] = args[0]
+            self.events.append(('abre', args[0], self.clock.now))
+            return None
+        self.clock.now += self.load_seconds  # esperar a aba atual terminar de carregar
+        return 'complete'
+
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+
+def use_extractor(monkeypatch, failures=None, seconds=0.0):
+    """Extrator falso: registra a extração, avança o relógio e levanta a exceção de failures[url]."""
+    failures = failures or {}
+
+    def extract(url, driver, include_description=True):
+        assert driver.urls[driver.current_window_handle] == url  # extrai a aba certa
+        driver.events.append(('extrai', url, driver.clock.now))
+        driver.clock.now += seconds
+        if url in failures: raise failures[url]
+        return {'link_anuncio': url}
+
+    monkeypatch.setitem(tab_pipeline.EXTRACTORS, 'magalu', extract)
+
+
+def urls(n):
+    return [f"https://www.magazineluiza.com.br/p/{i}/" for i in range(n)]
+
+
+def test_next_tabs_load_while_the_current_one_is_extracted(clock, monkeypatch):
+    use_extractor(monkeypatch)
+    driver = FakeDriver(clock)
+    u = urls(5)
+    results = list(scrape_pipelined(u, driver, 'magalu', tabs=3, limiter=RateLimiter({'magalu': 0})))
+    assert [url for url, _ in results] == u
+    assert [(kind, url) for kind, url, _ in driver.events] == [
+        ('abre', u[0]), ('abre', u[1]), ('abre', u[2]),
+        ('abre', u[3]), ('extrai', u[0]),  # u[3] entra na vaga antes de u[0] ser extraída
+        ('abre', u[4]), ('extrai', u[1]),
+        ('extrai', u[2]), ('extrai', u[3]), ('extrai', u[4]),
+    ]
+    assert driver.window_handles == ['home'] and driver.current_window_handle == 'home'
+
+
+def test_failed_tab_yields_none_and_the_rest_continue(clock, monkeypatch):
+    u = urls(4)
+    use_extractor(monkeypatch, {u[1]: ValueError('sem título'), u[2]: UnusablePageError(NOT_FOUND, u[2])})
+    driver = FakeDriver(clock)
+    results = dict(scrape_pipelined(u, driver, 'magalu', tabs=2, limiter=RateLimiter({'magalu': 0})))
+    assert results == {u[0]: {'link_anuncio': u[0]}, u[1]: None, u[2]: None, u[3]: {'link_anuncio': u[3]}}
+    assert driver.window_handles == ['home']
+
+
+def test_blocked_tab_stops_and_closes_the_other_tabs(clock, monkeypatch):
+    u = urls(5)
+    use_extractor(monkeypatch, {u[1]: UnusablePageError(BLOCKED, u[1])})
+    driver = FakeDriver(clock)
+    seen = []
+    with pytest.raises(UnusablePageError):
+        for url, item in scrape_pipelined(u, driver, 'magalu', tabs=3, limiter=RateLimiter({'magalu': 0})):
+            seen.append(url)
+    assert seen == [u[0]]
+    assert driver.window_handles == ['home'] and driver.current_window_handle == 'home'
+
+
+def test_waits_for_the_limiter_only_when_no_tab_is_open(clock, monkeypatch):
+    # Intervalo de 2 s e páginas que carregam e são extraídas em 0,5 s: a vazão
+    # fica presa ao intervalo, mas a espera só acontece sem nenhuma aba pronta
+    use_extractor(monkeypatch, seconds=0.5)
+    driver = FakeDriver(clock)
+    results = list(scrape_pipelined(urls(4), driver, 'magalu', tabs=3, limiter=RateLimiter({'magalu': 2.0})))
+    assert len(results) == 4
+    opened = [t for kind, _, t in driver.events if kind == 'abre']
+    assert opened == [1000.0, 1002.0, 1004.0, 1006.0]
+    assert clock.slept == [(1.5, 0)] * 3
+
+
+def test_slow_load_lets_try_acquire_open_the_next_tab(clock, monkeypatch):
+    # Carregamento de 2,5 s > intervalo de 2 s: enquanto espera a aba atual, a
+    # próxima já é aberta com try_acquire, sem nenhum sleep no limitador
+    use_extractor(monkeypatch, seconds=0.5)
+    driver = FakeDriver(clock, load_seconds=2.5)
+    u = urls(4)
+    limiter = RateLimiter({'magalu': 2.0})
+    assert len(list(scrape_pipelined(u, driver, 'magalu', tabs=2, limiter=limiter))) == 4
+    assert clock.slept == []
+    assert [(kind, url) for kind, url, _ in driver.events][:4] == [('abre', u[0]), ('abre', u[1]), ('extrai', u[0]), ('abre', u[2])]
+    opened = [t for kind, _, t in driver.events if kind == 'abre']
+    assert all(b - a >= 2.0 for a, b in zip(opened, opened[1:]))
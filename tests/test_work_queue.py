@@ -0,0 +1,109 @@
+import time
+
+from work_queue import DONE, FAILED, PENDING, RUNNING, LeaseHeartbeat, ResultSink, WorkQueue
+
+
+def status(queue, job_id):
+    return queue.conn.execute("SELECT status, attempts, available_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def test_lease_takes_highest_priority_and_dedupes(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'fila.sqlite'))
+    assert queue.enqueue('busca', 'magalu', {'termo': '664'}, priority=0, dedupe_key='busca:664')
+    assert not queue.enqueue('busca', 'magalu', {'termo': '664'}, priority=0, dedupe_key='busca:664')
+    queue.enqueue('produto', 'magalu', {'url': 'u1'}, priority=10)
+    job = queue.lease('w1')
+    assert (job['kind'], job['attempt']) == ('produto', 1)
+    assert queue.lease('w2')['kind'] == 'busca'
+    assert queue.lease('w3') is None
+    assert queue.has_unfinished()
+
+
+def test_max_per_platform_limits_concurrent_leases(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'fila.sqlite'))
+    for i in range(3):
+        queue.enqueue('produto', 'magalu', {'url': f'u{i}'})
+    queue.enqueue('produto', 'mercado_livre', {'url': 'ml'})
+    assert queue.lease('w1', max_per_platform=1)['plataforma'] == 'magalu'
+    assert queue.lease('w2', max_per_platform=1)['plataforma'] == 'mercado_livre'
+    assert queue.lease('w3', max_per_platform=1) is None
+
+
+def test_fail_backs_off_then_gives_up(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'fila.sqlite'), max_attempts=2)
+    queue.enqueue('produto', 'magalu', {'url': 'u'})
+    job = queue.lease('w1')
+    before = time.time()
+    queue.fail(job['id'], 'w1', 'timeout', retry_delay=30)
+    state, attempts, available_at = status(queue, job['id'])
+    assert (state, attempts) == (PENDING, 1)
+    assert available_at >= before + 30
+    assert queue.lease('w1') is None  # ainda no backoff
+
+    queue.conn.execute("UPDATE jobs SET available_at = 0")
+    job = queue.lease('w1')
+    queue.fail(job['id'], 'w1', 'timeout')
+    assert status(queue, job['id'])[0] == FAILED
+    assert not queue.has_unfinished()
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_cannot_complete(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'fila.sqlite'))
+    queue.enqueue('produto', 'magalu', {'url': 'u'})
+    job = queue.lease('w1', lease_seconds=-1)  # worker morreu: lease já vencido
+    again = queue.lease('w2')
+    assert again['id'] == job['id'] and again['attempt'] == 2
+    queue.complete(job['id'], 'w1')
+    assert status(queue, job['id'])[0] == RUNNING
+    queue.complete(job['id'], 'w2')
+    assert status(queue, job['id'])[0] == DONE
+
+
+def test_expired_lease_on_last_attempt_fails(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'fila.sqlite'), max_attempts=1)
+    queue.enqueue('produto', 'magalu', {'url': 'u'})
+    job = queue.lease('w1', lease_seconds=-1)
+    assert queue.lease('w2') is None
+    assert status(queue, job['id'])[0] == FAILED
+
+
+def test_release_without_attempt_does_not_count(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'fila.sqlite'), max_attempts=1)
+    queue.enqueue('produto', 'magalu', {'url': 'u'})
+    for _ in range(5):
+        job = queue.lease('w1')
+        queue.release(job['id'], 'w1')
+    assert status(queue, job['id'])[:2] == (PENDING, 0)
+
+
+def test_blocked_releases_count_until_the_job_fails(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'fila.sqlite'), max_attempts=3)
+    queue.enqueue('produto', 'magalu', {'url': 'u'})
+    leases = 0
+    while queue.has_unfinished():
+        job = queue.lease('w1')
+        leases += 1
+        queue.release(job['id'], 'w1', count_attempt=True, reason='bloqueio: bloqueado')
+    assert leases == 3
+    row = queue.conn.execute("SELECT status, last_error FROM jobs").fetchone()
+    assert row == (FAILED, 'bloqueio: bloqueado')
+
+
+def test_heartbeat_keeps_a_slow_job_leased(tmp_path):
+    db = str(tmp_path / 'fila.sqlite')
+    queue = WorkQueue(db)
+    queue.enqueue('produto', 'magalu', {'url': 'u'})
+    job = queue.lease('w1', lease_seconds=0.3)
+    with LeaseHeartbeat(db, job['id'], 'w1', lease_seconds=0.3):
+        time.sleep(0.8)
+        assert queue.lease('w2') is None
+    time.sleep(0.4)
+    assert queue.lease('w2')['id'] == job['id']
+
+
+def test_result_sink_replaces_rerun_jobs(tmp_path):
+    sink = ResultSink(str(tmp_path / 'fila.sqlite'))
+    sink.add(1, {'plataforma': 'magalu', 'preco': 10.0})
+    sink.add(1, {'plataforma': 'magalu', 'preco': 12.0})
+    assert sink.count() == 1
+    assert sink.records()[0]['preco'] == 12.0
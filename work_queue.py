@@ -0,0 +1,250 @@
+import json
+import sqlite3
+import threading
+import time
+
+# ========== Fila de trabalho durável (SQLite) ==========
+# Os jobs ficam em disco: se um worker morrer no meio de uma página, o lease
+# dele expira e outro worker pega o mesmo job de novo.
+
+PENDING, RUNNING, DONE, FAILED = 'pendente', 'em_execucao', 'concluido', 'falhou'
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class WorkQueue:
+    def __init__(self, db_path, max_attempts=3):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.conn = _connect(db_path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                plataforma TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                available_at REAL NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                last_error TEXT,
+                dedupe_key TEXT UNIQUE,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, priority DESC, id);
+        """)
+
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def enqueue(self, kind, plataforma, payload, priority=0, dedupe_key=None):
+        """Adiciona um job. Jobs com a mesma dedupe_key são ignorados. Retorna True se entrou na fila."""
+        now = time.time()
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO jobs (kind, plataforma, payload, priority, max_attempts, dedupe_key, created, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (kind, plataforma, json.dumps(payload, ensure_ascii=False), priority, self.max_attempts, dedupe_key, now, now)
+        )
+        return cur.rowcount > 0
+
+    def lease(self, worker_id, lease_seconds=300, platforms=None, max_per_platform=None):
+        """
+        Pega o próximo job disponível (maior prioridade primeiro) e o reserva para o worker.
+        Jobs cujo lease expirou voltam a ser elegíveis. Com max_per_platform, nenhuma
+        plataforma recebe mais workers simultâneos do que o limite.
+        Retorna um dict com o job ou None se não houver nada elegível agora.
+        """
+        self._transaction()
+        try:
+            now = time.time()
+            # Leases vencidos de jobs que já esgotaram as tentativas viram falha definitiva
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, last_error = 'lease expirado', updated = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts",
+                (FAILED, now, RUNNING, now)
+            )
+
+            busy = {}
+            if max_per_platform:
+                for plat, n in self.conn.execute(
+                        "SELECT plataforma, COUNT(*) FROM jobs WHERE status = ? AND lease_expires >= ? GROUP BY plataforma",
+                        (RUNNING, now)):
+                    busy[plat] = n
+
+            query = ("SELECT id, kind, plataforma, payload, attempts FROM jobs "
+                     "WHERE ((status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?))")
+            params = [PENDING, now, RUNNING, now]
+            if platforms:
+                query += f" AND plataforma IN ({','.join('?' * len(platforms))})"
+                params.extend(platforms)
+            query += " ORDER BY priority DESC, id LIMIT 50"
+
+            chosen = None
+            for row in self.conn.execute(query, params).fetchall():
+                if max_per_platform and busy.get(row[2], 0) >= max_per_platform:
+                    continue
+                chosen = row
+                break
+
+            if chosen is None:
+                self.conn.execute("COMMIT")
+                return None
+
+            job_id, kind, plataforma, payload, attempts = chosen
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                (RUNNING, worker_id, now + lease_seconds, now, job_id)
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return {'id': job_id, 'kind': kind, 'plataforma': plataforma,
+                'payload': json.loads(payload), 'attempt': attempts + 1}
+
+    def extend_lease(self, job_id, worker_id, lease_seconds=300):
+        self.conn.execute(
+            "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+            (time.time() + lease_seconds, time.time(), job_id, worker_id, RUNNING)
+        )
+
+    def complete(self, job_id, worker_id):
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, lease_expires = NULL, updated = ? WHERE id = ? AND lease_owner = ?",
+            (DONE, time.time(), job_id, worker_id)
+        )
+
+    def fail(self, job_id, worker_id, error, retry_delay=30.0):
+        """Devolve o job para a fila com backoff, ou marca como falha se acabaram as tentativas."""
+        self._transaction()
+        try:
+            row = self.conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ?",
+                                    (job_id, worker_id)).fetchone()
+            if row:
+                attempts, max_attempts = row
+                now = time.time()
+                if attempts >= max_attempts:
+                    self.conn.execute("UPDATE jobs SET status = ?, last_error = ?, lease_expires = NULL, updated = ? WHERE id = ?",
+                                      (FAILED, str(error)[:500], now, job_id))
+                else:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = ?, last_error = ?, lease_owner = NULL, lease_expires = NULL, "
+                        "available_at = ?, updated = ? WHERE id = ?",
+                        (PENDING, str(error)[:500], now + retry_delay * (2 ** (attempts - 1)), now, job_id)
+                    )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def release(self, job_id, worker_id, delay=0.0, count_attempt=False, reason=None):
+        """
+        Devolve o job para a fila depois de `delay` segundos. Sem count_attempt a tentativa
+        não conta (ex: outro worker está com a página de teste da plataforma). Com ela
+        (ex: página bloqueada) o job que esgotou as tentativas vira falha, senão uma
+        plataforma bloqueada de vez manteria a fila aberta para sempre.
+        """
+        self._transaction()
+        try:
+            now = time.time()
+            row = self.conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ?",
+                                    (job_id, worker_id)).fetchone()
+            if row and count_attempt and row[0] >= row[1]:
+                self.conn.execute("UPDATE jobs SET status = ?, last_error = ?, lease_expires = NULL, updated = ? WHERE id = ?",
+                                  (FAILED, (reason or 'devolvido')[:500], now, job_id))
+            elif row:
+                self.conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, last_error = COALESCE(?, last_error), lease_owner = NULL, "
+                    "lease_expires = NULL, available_at = ?, updated = ? WHERE id = ?",
+                    (PENDING, row[0] if count_attempt else max(row[0] - 1, 0), reason, now + delay, now, job_id)
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def has_unfinished(self):
+        """True enquanto houver job pendente ou em execução (mesmo que ainda não elegível)."""
+        row = self.conn.execute("SELECT 1 FROM jobs WHERE status IN (?, ?) LIMIT 1", (PENDING, RUNNING)).fetchone()
+        return row is not None
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
+
+
+class LeaseHeartbeat:
+    """
+    Renova o lease de um job enquanto ele roda (with LeaseHeartbeat(...): ...). Uma página
+    lenta não deixa o lease vencer no meio, o que faria outro worker pegar o mesmo job.
+    A thread usa conexão própria; se o processo morrer, as renovações param e o lease expira.
+    """
+
+    def __init__(self, db_path, job_id, worker_id, lease_seconds=300):
+        self.db_path = db_path
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        queue = WorkQueue(self.db_path)
+        try:
+            while not self.stopped.wait(self.lease_seconds / 3):
+                queue.extend_lease(self.job_id, self.worker_id, self.lease_seconds)
+        finally:
+            queue.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+
+class ResultSink:
+    """Destino comum dos registros coletados por todos os workers (mesmo arquivo SQLite da fila)."""
+
+    def __init__(self, db_path):
+        self.conn = _connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                job_id INTEGER PRIMARY KEY,
+                plataforma TEXT,
+                link_anuncio TEXT,
+                record TEXT NOT NULL,
+                worker TEXT,
+                created REAL NOT NULL
+            )
+        """)
+
+    def add(self, job_id, record, worker_id=None):
+        # Chave pelo job: se um job for reexecutado após lease expirado, o registro é substituído, não duplicado
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (job_id, plataforma, link_anuncio, record, worker, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, record.get('plataforma'), record.get('link_anuncio'),
+             json.dumps(record, ensure_ascii=False, default=str), worker_id, time.time())
+        )
+
+    def records(self):
+        return [json.loads(r[0]) for r in self.conn.execute("SELECT record FROM results ORDER BY job_id")]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        self.conn.close()